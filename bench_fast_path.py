@@ -0,0 +1,190 @@
+"""
+Directory fast path benchmark (utils/fast_path.py).
+
+Builds a synthetic directory (bench_lexical's names with founders and an
+office on most records) and runs scripted visitor conversations: plain
+lookups ("what does X do", "where is their office", "who founded them"), with
+the startup name STT-mangled in `--mangle` of them, mixed with questions only
+the LLM can answer, some of them naming a startup but not asking for a
+directory field ("who is the CEO of X", "what is X's valuation"). Two passes:
+
+    matcher    every question of `--visitors` conversations through FastPath:
+               share of lookups answered, wrong answers (another startup or
+               field, or an open question answered), time per question
+    pipeline   the first `--turns` questions through S2SPipeline with the local
+               stand-in services (services/local_services.py), fast path off
+               and on: TTFA overall and per answer path
+
+    python bench_fast_path.py --entries 500 --visitors 200 --turns 24
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import tempfile
+import time
+
+from bench_lexical import synthetic_directory, mangle
+from bench_prompt import FOUNDERS
+from main import S2SPipeline
+from services.local_services import LocalProfile, LocalServices
+from utils.audio_cache import AudioCache
+from utils.directory import load_directory
+from utils.fast_path import FastPath
+from utils.startup import Startup
+from utils.latency_stats import summarize
+from utils.lexical_index import LexicalIndex
+
+# (question, subject, expected intent); None = only the LLM can answer it
+SCRIPT = [
+    ("What does {name} do?", 0, "about"),
+    ("Where is their office?", 0, "location"),
+    ("Who founded them?", 0, "founders"),
+    ("Which startups here work on {sector}?", 0, None),
+    ("Tell me about {name}.", 1, "about"),
+    ("Can I get an internship at {name}?", 1, None),
+    ("How many people work there?", 1, None),
+    # a name in the slot, but not a lookup of a field the directory holds
+    ("Who is the CEO of {name}?", 1, None),
+    ("What is the revenue of {name}?", 0, None),
+    ("What is {name}'s valuation?", 1, None),
+    ("What is {name}'s latest launch?", 0, None),
+    ("What is the time?", 0, None),
+]
+
+
+def directory(n, missing, seed=0):
+    rng = random.Random(seed)
+    records = synthetic_directory(n, seed)
+    for record in records:
+        if rng.random() >= missing:
+            record["founders"] = rng.sample(FOUNDERS, rng.randint(1, 2))
+        if rng.random() >= missing:
+            record["office"] = {"block": rng.choice("ABCDE"),
+                                "floor": rng.choice(["ground", "first", "second", "third"])}
+    return records
+
+
+def conversations(entries, visitors, mangle_ratio, seed=1):
+    """[(question, subject row, expected intent or None)] for `visitors` scripted conversations."""
+    rng = random.Random(seed)
+    turns = []
+    for _ in range(visitors):
+        subjects = rng.sample(range(len(entries)), 2)
+        for template, subject, intent in SCRIPT:
+            row = subjects[subject]
+            name = entries[row].name
+            if rng.random() < mangle_ratio:
+                name = mangle(name, rng)
+            sector = entries[row].record["sector"]
+            turns.append((template.format(name=name, sector=sector), row, intent))
+    return turns
+
+
+def run_matcher(fast_path, turns):
+    lookups = answered = wrong = open_answered = 0
+    per_question_us, previous = [], []
+    for i, (question, row, intent) in enumerate(turns):
+        if i % len(SCRIPT) == 0:
+            previous = []  # a new visitor
+        started = time.perf_counter()
+        answer = fast_path.answer(question, previous[-2:])  # the questions the conversation memory keeps verbatim
+        per_question_us.append((time.perf_counter() - started) * 1e6)
+        previous.append(question)
+        if intent is None:
+            open_answered += answer is not None
+            continue
+        lookups += 1
+        if answer is not None:
+            answered += 1
+            wrong += answer.row != row or answer.intent != intent
+    stats = fast_path.stats()
+    return {"questions": len(turns), "lookups": lookups, "lookups_answered": answered / lookups,
+            "wrong_answers": wrong, "open_questions_answered": open_answered, "hit_rate": stats["hit_rate"],
+            "fallbacks": {k: stats[k] for k in ("no_intent", "no_name", "ambiguous", "no_field")},
+            "per_question_us": summarize(per_question_us)}
+
+
+async def run_pipeline(mode, index, turns, args):
+    logging.getLogger().setLevel(logging.WARNING)
+    profile = LocalProfile(speed=args.speed, seed=args.seed)
+    loop = asyncio.get_running_loop()
+    pipeline = S2SPipeline(loop, LocalServices(profile), startup=Startup())
+    pipeline.show_metrics = False
+    pipeline.answer_cache = None  # the LLM stand-in gives the same answer to every question
+    pipeline.tts.cache = AudioCache(tempfile.mkdtemp(prefix="bench_tts_"))
+    pipeline.fast_path = FastPath(index, args.min_score) if mode == "on" else None
+
+    runner = asyncio.create_task(pipeline.start())
+    while not pipeline.is_listening:
+        await asyncio.sleep(0.01)
+    await pipeline.wait_idle()  # the greeting
+
+    samples = []
+    for i, (question, _, _) in enumerate(turns):
+        if i % len(SCRIPT) == 0:
+            pipeline.memory.reset()  # a new visitor
+        await pipeline.handle_transcription(True, question, 0.99)
+        await pipeline.wait_idle()
+        samples.append(pipeline.turn_latencies())
+    pipeline.is_listening = False
+    await runner
+
+    by_path = {}
+    for sample in samples:
+        by_path.setdefault(sample["path"], []).append(sample["ttfa"])
+    return {"mode": mode, "ttfa_ms": summarize([s["ttfa"] for s in samples]),
+            "ttfa_by_path_ms": {path: summarize(values) for path, values in by_path.items()},
+            "fast_path": pipeline.fast_path.stats() if pipeline.fast_path else None}
+
+
+async def run_pipelines(index, turns, args):
+    return [await run_pipeline(mode, index, turns, args) for mode in ("off", "on")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--visitors", type=int, default=200, help="conversations for the matcher pass")
+    parser.add_argument("--turns", type=int, default=24, help="questions for the pipeline pass")
+    parser.add_argument("--mangle", type=float, default=0.3, help="share of names STT-mangled")
+    parser.add_argument("--missing", type=float, default=0.15, help="share of records without founders / office")
+    parser.add_argument("--min-score", type=float, default=0.85)
+    parser.add_argument("--speed", type=float, default=8.0, help="playback pace (x real time)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_results_fast_path.json")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_fast_path_")
+    path = os.path.join(workdir, "directory.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(directory(args.entries, args.missing), f)
+    entries = load_directory(path)
+    index = LexicalIndex(entries)
+    turns = conversations(entries, args.visitors, args.mangle)
+
+    matcher = run_matcher(FastPath(index, args.min_score), turns)
+    pipelines = asyncio.run(run_pipelines(index, turns[:args.turns], args))
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "args": vars(args), "matcher": matcher, "pipeline": pipelines}, f, indent=2)
+
+    print(f"\n{args.entries} entries, {args.visitors} visitors x {len(SCRIPT)} questions, "
+          f"{args.mangle * 100:.0f}% of names mangled")
+    print(f"Matcher : {matcher['lookups_answered'] * 100:.1f}% of lookups answered, {matcher['wrong_answers']} wrong, "
+          f"{matcher['open_questions_answered']} open questions answered | hit rate {matcher['hit_rate'] * 100:.1f}% "
+          f"| {matcher['per_question_us']['p50']:.0f} us p50, {matcher['per_question_us']['p99']:.0f} us p99")
+    print("Fallbacks: " + ", ".join(f"{k} {v}" for k, v in matcher["fallbacks"].items()))
+    print(f"\n{'fast path':>10}{'TTFA p50':>10}{'p95':>7}   per path (p50, n)")
+    for r in pipelines:
+        paths = "  ".join(f"{path} {s['p50']:.0f} ms n={s['count']}" for path, s in r["ttfa_by_path_ms"].items())
+        print(f"{r['mode']:>10}{r['ttfa_ms']['p50']:10.0f}{r['ttfa_ms']['p95']:7.0f}   {paths}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Hedged-request benchmark: tail TTFA with and without hedging.
+
+Runs turns against two local LLM and two local TTS providers (replicas of the
+stand-ins in services/local_services.py with independent delays). Each
+request has a uniform `--jitter-ms` on top of its base latency and, with
+probability `--slow-ratio`, hits a slow replica that adds 0.5-1.5 x
+`--slow-ms` before the first output. Per turn it measures TTFT and the first
+sentence's first audio chunk; their sum is the turn's critical-path TTFA.
+
+    off    one provider each (the old path)
+    llm    HedgedLLM, plain TTS
+    tts    plain LLM, HedgedTTS
+    both   both hedged
+
+Delays are divided by `--time-scale` while running and results multiplied
+back, so a few hundred turns take seconds. Also reports the extra requests
+hedging costs.
+
+    python bench_hedge.py --turns 400 --slow-ratio 0.05 --slow-ms 2000
+"""
+import argparse
+import asyncio
+import json
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.local_services import LocalProfile, LocalServices
+from services.provider_router import HedgedLLM, HedgedTTS, ProviderRouter
+from utils.latency_stats import summarize
+
+QUESTION = "What does Mindgrove Technologies do?"
+SENTENCE = "Mindgrove Technologies designs indigenous microcontroller chips."
+MODES = ("off", "llm", "tts", "both")
+
+
+async def run_mode(mode, args):
+    scale = args.time_scale
+    profile = LocalProfile(llm_ttft_ms=args.llm_ttft_ms / scale, tts_first_chunk_ms=args.tts_first_chunk_ms / scale,
+                           jitter_ms=args.jitter_ms / scale, slow_ratio=args.slow_ratio, slow_ms=args.slow_ms / scale,
+                           llm_tokens_per_sec=1e6, response="Mindgrove designs chips.", seed=args.seed)
+    services = LocalServices(profile)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def router():
+        return ProviderRouter(["primary", "alternate"], pct=args.pct, min_ms=args.min_ms / scale,
+                              initial_ms=args.initial_ms / scale)
+
+    first_token = []
+
+    async def on_token(token):
+        if not first_token:
+            first_token.append(time.perf_counter())
+
+    if mode in ("llm", "both"):
+        llm = HedgedLLM([("primary", services.llm), ("alternate", services.alternate_llm)], on_token, router())
+    else:
+        llm = services.llm(on_token)
+    if mode in ("tts", "both"):
+        tts = HedgedTTS([("primary", services.tts()), ("alternate", services.alternate_tts())], router())
+    else:
+        tts = services.tts()
+
+    def first_chunk():
+        started = time.perf_counter()
+        stream = tts.text_to_audio_stream(SENTENCE)
+        next(stream)
+        ms = (time.perf_counter() - started) * 1000
+        stream.close()
+        return ms
+
+    ttft, tts_first, ttfa = [], [], []
+    for _ in range(args.turns):
+        first_token.clear()
+        started = time.perf_counter()
+        await llm.process_text(QUESTION)
+        ttft.append((first_token[0] - started) * 1000 * scale)
+        tts_first.append(await loop.run_in_executor(executor, first_chunk) * scale)
+        ttfa.append(ttft[-1] + tts_first[-1])
+    executor.shutdown()
+
+    result = {"mode": mode, "ttft_ms": summarize(ttft), "tts_first_chunk_ms": summarize(tts_first),
+              "ttfa_ms": summarize(ttfa)}
+    for stage, client in (("llm", llm), ("tts", tts)):
+        if hasattr(client, "router"):
+            result[f"{stage}_hedging"] = client.stats()
+    return result
+
+
+async def run_all(args):
+    return [await run_mode(mode, args) for mode in MODES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--llm-ttft-ms", type=float, default=350)
+    parser.add_argument("--tts-first-chunk-ms", type=float, default=180)
+    parser.add_argument("--jitter-ms", type=float, default=100, help="uniform extra delay per request")
+    parser.add_argument("--slow-ratio", type=float, default=0.05, help="share of requests hitting a slow replica")
+    parser.add_argument("--slow-ms", type=float, default=2000, help="extra first-output delay on those (0.5-1.5x)")
+    parser.add_argument("--pct", type=float, default=90, help="hedge after this percentile of recent first outputs")
+    parser.add_argument("--min-ms", type=float, default=150)
+    parser.add_argument("--initial-ms", type=float, default=1000, help="hedge deadline before there is history")
+    parser.add_argument("--time-scale", type=float, default=10.0, help="run this many times faster than real time")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_results_hedge.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_all(args))
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "args": vars(args), "results": results}, f, indent=2)
+
+    print(f"\n{args.turns} turns; {args.slow_ratio * 100:.0f}% of requests +{args.slow_ms:.0f} ms (0.5-1.5x), "
+          f"hedge at p{args.pct:.0f}")
+    print(f"{'mode':>6}{'TTFT p50':>10}{'p99':>7}{'TTS 1st p50':>13}{'p99':>7}{'TTFA p50':>10}{'p95':>7}{'p99':>7}"
+          f"{'max':>7}{'extra requests':>16}")
+    for r in results:
+        extra = sum(r[k]["hedged"] for k in ("llm_hedging", "tts_hedging") if k in r)
+        print(f"{r['mode']:>6}{r['ttft_ms']['p50']:10.0f}{r['ttft_ms']['p99']:7.0f}"
+              f"{r['tts_first_chunk_ms']['p50']:13.0f}{r['tts_first_chunk_ms']['p99']:7.0f}"
+              f"{r['ttfa_ms']['p50']:10.0f}{r['ttfa_ms']['p95']:7.0f}{r['ttfa_ms']['p99']:7.0f}"
+              f"{r['ttfa_ms']['max']:7.0f}{extra / (2 * args.turns) * 100:15.1f}%")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
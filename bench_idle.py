@@ -0,0 +1,127 @@
+"""
+Idle-mode benchmark: upstream audio and first-question latency over a day in miniature.
+
+Runs S2SPipeline on the offline stand-ins through a compressed kiosk day: an
+empty room (silence on the mic), then a visitor arrives (vision reports the
+face at once and the greeting trigger `--hold-s` later), listens to the
+greeting, asks a question and leaves; repeated `--visits` times. Providers
+drop connections that sat unused for `--connection-idle-s`, so a question
+after a quiet spell pays LLM / TTS connection set-up again unless the
+pipeline warmed them when the face appeared.
+
+Per IDLE_MODE ("off", "pause", "disconnect") it reports the share of mic audio
+that never went upstream, time spent in each state, wake-up time and the TTFA
+of each visitor's first question.
+
+    python bench_idle.py --visits 3 --gap-s 15 --idle-after-s 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import tempfile
+import time
+
+from main import S2SPipeline
+from services.local_services import LocalProfile, LocalServices
+from utils.audio_cache import AudioCache
+from utils.idle_mode import IdleStateMachine
+from utils.latency_stats import summarize
+from utils.startup import Startup
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--visits", type=int, default=3)
+    parser.add_argument("--gap-s", type=float, default=15.0, help="empty room before each visit (wall s)")
+    parser.add_argument("--hold-s", type=float, default=1.0, help="face in view before the greeting trigger")
+    parser.add_argument("--idle-after-s", type=float, default=4.0)
+    parser.add_argument("--disconnect-after-s", type=float, default=3.0)
+    parser.add_argument("--connection-idle-s", type=float, default=10.0, help="provider drops unused connections")
+    parser.add_argument("--llm-connect-ms", type=float, default=300)
+    parser.add_argument("--tts-connect-ms", type=float, default=250)
+    parser.add_argument("--stt-connect-ms", type=float, default=400)
+    parser.add_argument("--wav", default="test_output.wav")
+    parser.add_argument("--speed", type=float, default=2.0, help="mic feed / playback pace (x real time)")
+    parser.add_argument("--output", default="bench_results_idle.json")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args()
+
+
+async def kiosk_day(args, profile, mode):
+    loop = asyncio.get_running_loop()
+    pipeline = S2SPipeline(loop, LocalServices(profile), startup=Startup(t0=time.perf_counter()))
+    pipeline.show_metrics = False
+    pipeline.answer_cache = None  # every visitor asks the same question; measure the full path
+    pipeline.tts.cache = AudioCache(tempfile.mkdtemp(prefix="bench_idle_tts_"))
+    pipeline.tts.admit_after = args.visits + 1  # only the pinned greeting is replayed from the cache
+    pipeline.idle_mode = mode
+    pipeline.idle = IdleStateMachine(args.idle_after_s, args.disconnect_after_s if mode == "disconnect" else 0)
+    runner = asyncio.create_task(pipeline.start())
+    while not pipeline.is_listening and not runner.done():
+        await asyncio.sleep(0.005)
+    stream = pipeline.audio_stream
+
+    visits = []
+    for _ in range(args.visits):
+        # Nobody around: the room's silence reaches the mic for gap_s of wall time
+        await loop.run_in_executor(None, stream.feed_silence, args.gap_s * 1000 * profile.speed)
+        state_before = pipeline.idle.state
+        pipeline.handle_presence(True)
+        await loop.run_in_executor(None, stream.feed_silence, args.hold_s * 1000 * profile.speed)
+        pipeline.handle_vision_trigger()
+        await asyncio.sleep(0.05)
+        await pipeline.wait_idle()  # greeting played
+
+        await loop.run_in_executor(None, stream.feed_wav, args.wav)
+        await pipeline.stt.finalize()
+        await pipeline.wait_idle()
+        visits.append({"state_before": state_before, "ttfa_ms": pipeline.turn_latencies().get("ttfa")})
+        pipeline.handle_presence(False)
+
+    pipeline.is_listening = False
+    await runner
+    stats = pipeline.idle.stats()
+    stats["llm_connects"] = pipeline.model.connection.connects
+    stats["tts_connects"] = pipeline.tts.tts.connection.connects
+    return {"visits": visits, "idle": stats}
+
+
+async def run_all(args, profile):
+    return {mode: await kiosk_day(args, profile, mode) for mode in ("off", "pause", "disconnect")}
+
+
+def main():
+    args = parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    profile = LocalProfile(speed=args.speed, llm_connect_ms=args.llm_connect_ms, tts_connect_ms=args.tts_connect_ms,
+                           stt_connect_ms=args.stt_connect_ms, connection_idle_s=args.connection_idle_s)
+    runs = asyncio.run(run_all(args, profile))
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "args": vars(args),
+        "modes": {mode: dict(r, first_question_ttfa_ms=summarize([v["ttfa_ms"] for v in r["visits"]]))
+                  for mode, r in runs.items()},
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{args.visits} visits, {args.gap_s:.0f} s empty room before each, idle after {args.idle_after_s:.0f} s, "
+          f"providers drop connections after {args.connection_idle_s:.0f} s")
+    print(f"{'mode':>11}{'audio avoided':>15}{'active':>9}{'idle':>8}{'waking':>8}{'wake ms':>9}"
+          f"{'1st-question TTFA p50':>23}{'max':>7}")
+    for mode, r in results["modes"].items():
+        idle, ttfa = r["idle"], r["first_question_ttfa_ms"]
+        share = idle["time_share"]
+        wake = f"{idle['last_wake_ms']:.0f}" if idle["last_wake_ms"] is not None else "-"
+        print(f"{mode:>11}{idle['avoided_ratio'] * 100:14.1f}%{share['active'] * 100:8.0f}%{share['idle'] * 100:7.0f}%"
+              f"{share['waking'] * 100:7.1f}%{wake:>9}{ttfa['p50']:23.0f}{ttfa['max']:7.0f}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Accuracy / latency benchmark for startup-name lookup (utils/lexical_index.py).
+
+Generates a synthetic directory of N startups with made-up, pronounceable names
+and a query set that mimics STT damage to proper nouns: names split or merged
+("agni cool"), sound-alike spellings (c/k, ph/f, v/f, ee/i), a dropped or doubled
+letter, the corporate suffix left out, each wrapped in a visitor question.
+Per N it reports top-1 / top-3 accuracy and per-query latency for:
+
+    keyword   the old token-overlap fallback (utils.directory.KeywordIndex)
+    scan      a naive fuzzy scan: edit-distance ratio against every name
+    semantic  hashed-embedding vector search alone (services/vector_index.py)
+    lexical   LexicalIndex.search (BM25 + trigram / phonetic name index)
+    fused     semantic hits fused with the lexical index, as AsyncRAGEngine does
+
+    python bench_lexical.py --entries 500 2000 10000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+from services.vector_index import HashedEmbedder, VectorIndex, build
+from utils.directory import KeywordIndex, load_directory, tokenize
+from utils.lexical_index import LexicalIndex, _ratio, name_keys
+from utils.latency_stats import summarize
+
+ONSETS = ["ag", "ath", "bha", "chak", "dhi", "ek", "gar", "har", "in", "jiv", "kal", "lum", "mi", "nav",
+          "or", "pra", "qua", "ra", "sam", "tej", "ur", "vay", "wex", "yan", "zen", "phi", "kri", "shu"]
+CODAS = ["ni", "kul", "vi", "tra", "mos", "nix", "lya", "ron", "dex", "sha", "ga", "tek", "pha", "vo",
+         "rix", "mind", "grove", "plane", "loop", "byte", "leaf", "cart", "volt", "nest", "wave", "core"]
+SECOND = ["Cosmos", "Energy", "Robotics", "Health", "Mobility", "Foods", "Aero", "Bio", "Grid", "Water"]
+SUFFIXES = ["Pvt Ltd", "Technologies", "Labs", "Solutions", "Innovations", "Private Limited", ""]
+SECTORS = ["space launch", "electric two-wheelers", "medical imaging", "drone inspection", "water purification",
+           "battery recycling", "agri sensors", "edtech content", "chip design", "payments"]
+QUESTIONS = ["tell me about {}", "what does {} do", "where is {} located", "who founded {}",
+             "i want to meet {}", "{}", "is {} here today"]
+SOUNDS = [("c", "k"), ("k", "c"), ("ph", "f"), ("f", "ph"), ("v", "w"), ("i", "ee"), ("ee", "i"),
+          ("sh", "s"), ("x", "ks"), ("q", "k"), ("th", "t"), ("y", "i")]
+
+
+def synthetic_directory(n, seed=0):
+    rng = random.Random(seed)
+    cores, records = set(), []
+    while len(records) < n:
+        core = (rng.choice(ONSETS) + rng.choice(ONSETS[:8] if rng.random() < 0.5 else [""]) + rng.choice(CODAS))
+        core = core.capitalize() + (" " + rng.choice(SECOND) if rng.random() < 0.4 else "")
+        if core.lower() in cores:  # one startup per core name, as in a real directory
+            continue
+        cores.add(core.lower())
+        name = f"{core} {rng.choice(SUFFIXES)}".strip()
+        sector = rng.choice(SECTORS)
+        records.append({"name": name, "sector": sector,
+                        "description": f"{core} works on {sector} for customers across India"})
+    return records
+
+
+def mangle(name, rng):
+    """One STT-style corruption of a startup name (suffix usually dropped)."""
+    words = tokenize(name)
+    key = name_keys(name)[0] if rng.random() < 0.8 else "".join(words)
+    op = rng.choice(["split", "sound", "drop", "double", "sound"])
+    if op == "split" and len(key) > 4:
+        cut = rng.randrange(2, len(key) - 2)
+        return key[:cut] + " " + key[cut:]
+    if op == "sound":
+        options = [(a, b) for a, b in SOUNDS if a in key]
+        if options:
+            a, b = rng.choice(options)
+            return key.replace(a, b, 1)
+    if op == "drop" and len(key) > 5:
+        i = rng.randrange(1, len(key) - 1)
+        return key[:i] + key[i + 1:]
+    i = rng.randrange(len(key))
+    return key[:i] + key[i] + key[i:]
+
+
+def query_set(records, count, seed=1):
+    rng = random.Random(seed)
+    picks = [rng.randrange(len(records)) for _ in range(count)]
+    return [(rng.choice(QUESTIONS).format(mangle(records[i]["name"], rng)), records[i]["name"]) for i in picks]
+
+
+def naive_scan(entries):
+    keys = [name_keys(e.name)[0] if name_keys(e.name) else "" for e in entries]
+
+    def search(query, k=3):
+        words = tokenize(query)
+        windows = ["".join(words[i:i + s]) for s in (1, 2, 3) for i in range(len(words) - s + 1)]
+        scored = sorted(((max((_ratio(w, key) for w in windows), default=0.0), row) for row, key in enumerate(keys)),
+                        reverse=True)[:k]
+        return [{"name": entries[row].name, "score": s} for s, row in scored]
+    return search
+
+
+def evaluate(search, queries, limit=None):
+    top1 = top3 = 0
+    ms = []
+    for query, expected in queries[:limit]:
+        t0 = time.perf_counter()
+        hits = search(query)
+        ms.append((time.perf_counter() - t0) * 1000)
+        names = [h["name"] for h in hits]
+        top1 += bool(names) and names[0] == expected
+        top3 += expected in names[:3]
+    n = len(ms)
+    return {"queries": n, "top1": top1 / n, "top3": top3 / n, "latency_ms": summarize(ms)}
+
+
+def run_level(args, n, workdir):
+    records = synthetic_directory(n)
+    path = os.path.join(workdir, f"directory_{n}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    entries = load_directory(path)
+    queries = query_set(records, args.queries)
+
+    t0 = time.perf_counter()
+    lexical = LexicalIndex(entries)
+    build_ms = (time.perf_counter() - t0) * 1000
+    embedder = HashedEmbedder()
+    build(path, os.path.join(workdir, f"index_{n}"), embedder)
+    vectors = VectorIndex.load(os.path.join(workdir, f"index_{n}"))
+    keyword = KeywordIndex(entries)
+
+    def semantic(query, k=3):
+        return vectors.hits(embedder.encode([query]), k)[0]
+
+    def fused(query, k=3):
+        return lexical.fuse(semantic(query, k), query, k)
+
+    return {
+        "entries": n,
+        "lexical_build_ms": build_ms,
+        "methods": {
+            "keyword": evaluate(keyword.search, queries),
+            "scan": evaluate(naive_scan(entries), queries, args.scan_queries),
+            "semantic": evaluate(semantic, queries),
+            "lexical": evaluate(lexical.search, queries),
+            "fused": evaluate(fused, queries),
+        },
+        "examples": [q for q, _ in queries[:5]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="+", default=[500, 2000, 10000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--scan-queries", type=int, default=100, help="the naive scan is slow; time fewer queries")
+    parser.add_argument("--output", default="bench_results_lexical.json")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_lexical_")
+    try:
+        levels = [run_level(args, n, workdir) for n in args.entries]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "levels": levels}, f, indent=2)
+
+    for level in levels:
+        print(f"\n{level['entries']} entries (lexical index built in {level['lexical_build_ms']:.0f} ms), "
+              f"e.g. {level['examples'][:3]}")
+        print(f"{'method':>10}{'top-1':>8}{'top-3':>8}{'p50 ms':>9}{'p99 ms':>9}")
+        for method, r in level["methods"].items():
+            print(f"{method:>10}{r['top1'] * 100:7.1f}%{r['top3'] * 100:7.1f}%"
+                  f"{r['latency_ms']['p50']:9.3f}{r['latency_ms']['p99']:9.3f}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Offline end-to-end latency benchmark for S2SPipeline.
+
+Feeds a recorded WAV (default: test_output.wav) through the pipeline using the
+deterministic stand-ins in services/local_services.py, then writes p50/p95/p99
+for the per-turn stages the tracer reports (VAD -> final, RAG, TTFT, TTS first
+chunk, TTFA, playout) to a JSON results file.
+
+The scripted utterance repeats every turn, so the answer cache, the TTS
+audio cache and the RAG result / embedding caches would turn every turn after
+the first into a replay; they are off (RAG: cleared before each turn) unless
+--answer-cache / --tts-cache / --rag-cache turn them on, and TTFA is also reported
+per answer path (llm, answer_cache, ...). The answer cache keys on the
+conversation history too, so with --answer-cache every turn is a new visitor.
+
+--false-barge-in plays a noise burst (a cough) over each answer and then only
+silence, with no transcript: it reports how long the pipeline takes to mute
+the mic for playback again (the barge-in timeout, or VAD speech end).
+
+    python bench_pipeline.py --turns 30 --speed 4 --output bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import platform
+import tempfile
+import time
+from dataclasses import asdict
+
+import numpy as np
+
+import main as pipeline_module
+from main import S2SPipeline
+from services.local_services import LocalProfile, LocalServices
+from utils.audio_cache import AudioCache
+from utils.barge_in import BargeInDetector
+from utils.latency_stats import summarize
+from utils.segmenter import SentenceSegmenter
+from utils.speculation import SpeculativePrefetcher
+from utils.tracing import Tracer
+from utils.vad import EnergyVAD
+
+STAGES = ("vad_to_final", "rag", "ttft", "tts_first_chunk", "ttfa", "playout")
+
+
+def parse_args():
+    defaults = LocalProfile()
+    parser = argparse.ArgumentParser(description="Offline S2S pipeline latency benchmark")
+    parser.add_argument("--wav", default="test_output.wav", help="mono 16 kHz recording used as mic input")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=1, help="turns run before sampling starts")
+    parser.add_argument("--speed", type=float, default=defaults.speed, help="mic feed / playback pace (x real time)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--label", default="", help="free-form tag stored with the results")
+    parser.add_argument("--stt-final-ms", type=float, default=defaults.stt_final_ms)
+    parser.add_argument("--rag-ms", type=float, default=defaults.rag_ms)
+    parser.add_argument("--llm-ttft-ms", type=float, default=defaults.llm_ttft_ms)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=defaults.llm_tokens_per_sec)
+    parser.add_argument("--tts-first-chunk-ms", type=float, default=defaults.tts_first_chunk_ms)
+    parser.add_argument("--tts-realtime-factor", type=float, default=defaults.tts_realtime_factor)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--first-chunk-words", type=int, default=0, help="early first chunk after N words (0 = off)")
+    parser.add_argument("--first-chunk-clause", action="store_true", help="early first chunk at the first clause break")
+    parser.add_argument("--speculation", choices=("off", "rag", "llm"), default="off",
+                        help="speculative RAG / LLM prefetch on interim transcripts")
+    parser.add_argument("--tts-cache", action="store_true", help="admit repeated sentences to the TTS audio cache")
+    parser.add_argument("--tts-cache-dir", default=None,
+                        help="audio cache directory (default: a fresh temp dir per run, so runs start cold)")
+    parser.add_argument("--answer-cache", action="store_true", help="enable the semantic answer cache")
+    parser.add_argument("--rag-cache", action="store_true", help="keep RAG results and query embeddings across turns")
+    parser.add_argument("--barge-in-after-ms", type=float, default=0,
+                        help="start the next turn this long after the LLM finishes, talking over the answer (0 = off)")
+    parser.add_argument("--false-barge-in", action="store_true",
+                        help="interrupt each answer with a noise burst and no speech after it")
+    parser.add_argument("--barge-in-timeout-s", type=float, default=1.0,
+                        help="BARGE_IN_TIMEOUT_S for the run (shorter than the default, to keep the bench quick)")
+    parser.add_argument("--vad", choices=("off", "measure", "gate"), default="off",
+                        help="local VAD on the mic path (adds trailing silence so end of speech is seen)")
+    parser.add_argument("--trailing-silence-ms", type=float, default=800)
+    parser.add_argument("--mic-frame-ms", type=float, default=20,
+                        help="mic callback size; 500 reproduces the old 8000-sample chunks")
+    parser.add_argument("--trace-file", default=None, help="also write the per-turn JSONL trace here")
+    parser.add_argument("--metrics-file", default=None, help="also write Prometheus-style stage percentiles here")
+    parser.add_argument("--diagnostics", choices=("off", "stalls", "profile"), default="off",
+                        help="loop-stall monitor (and sampling profiler) while the bench runs")
+    parser.add_argument("--profile-file", default="bench_profile.folded", help="folded stacks for --diagnostics profile")
+    parser.add_argument("--verbose", action="store_true", help="keep pipeline logs and per-sentence reports")
+    return parser.parse_args()
+
+
+def build_profile(args):
+    return LocalProfile(
+        stt_final_ms=args.stt_final_ms,
+        rag_ms=args.rag_ms,
+        llm_ttft_ms=args.llm_ttft_ms,
+        llm_tokens_per_sec=args.llm_tokens_per_sec,
+        tts_first_chunk_ms=args.tts_first_chunk_ms,
+        tts_realtime_factor=args.tts_realtime_factor,
+        jitter_ms=args.jitter_ms,
+        seed=args.seed,
+        speed=args.speed,
+    )
+
+
+async def run_benchmark(args, profile):
+    loop = asyncio.get_running_loop()
+    services = LocalServices(profile)
+    pipeline = S2SPipeline(loop, services)
+    pipeline.show_metrics = args.verbose
+    pipeline.tracer = Tracer(args.trace_file, args.metrics_file)
+    pipeline.diagnostics = args.diagnostics
+    pipeline.profile_file = args.profile_file
+    pipeline.mic_frame_samples = int(profile.sample_rate * args.mic_frame_ms / 1000)
+    pipeline.vad = EnergyVAD() if args.vad != "off" else None
+    pipeline.vad_gate = args.vad == "gate"
+    trailing_silence_ms = args.trailing_silence_ms if pipeline.vad else 0
+    if args.barge_in_after_ms or args.false_barge_in:
+        pipeline_module.BARGE_IN_TIMEOUT_S = args.barge_in_timeout_s
+        pipeline.barge_in = BargeInDetector()
+        pipeline.answer_cache = None  # cached replays would end before the interruption
+    if not args.answer_cache:
+        pipeline.answer_cache = None
+    pipeline.tts.cache = AudioCache(args.tts_cache_dir or tempfile.mkdtemp(prefix="bench_tts_"))
+    if not args.tts_cache:
+        pipeline.tts.admit_after = math.inf  # every sentence is synthesized (pinned phrases still replay)
+    pipeline.segmenter = SentenceSegmenter(first_chunk_words=args.first_chunk_words,
+                                           first_chunk_clause=args.first_chunk_clause)
+    if args.speculation != "off":
+        pipeline.speculation = SpeculativePrefetcher(
+            pipeline.retrieve,
+            llm_factory=(lambda callback: pipeline.configure_llm(services.llm(callback)))
+            if args.speculation == "llm" else None,
+        )
+
+    runner = asyncio.create_task(pipeline.start())
+    while not pipeline.is_listening:
+        await asyncio.sleep(0.01)
+
+    samples, false_barge_ins = [], []
+    started = time.perf_counter()
+    for turn in range(args.warmup + args.turns):
+        if args.answer_cache:
+            pipeline.memory.reset()  # a new visitor each turn: the cache only matches the same history
+        if not args.rag_cache:
+            pipeline.rag.result_cache.clear()
+            pipeline.rag.embedding_cache.clear()
+        await loop.run_in_executor(None, pipeline.audio_stream.feed_wav, args.wav, trailing_silence_ms)
+        await pipeline.stt.finalize()
+        if args.false_barge_in:
+            false_barge_ins.append(await false_barge_in(pipeline, args))
+        elif args.barge_in_after_ms:
+            # Leave the answer playing; the next turn's audio interrupts it
+            await asyncio.sleep(args.barge_in_after_ms / 1000)
+        else:
+            await pipeline.wait_idle()
+        if turn >= args.warmup:
+            samples.append(pipeline.turn_latencies())
+    await pipeline.wait_idle()
+    elapsed = time.perf_counter() - started
+
+    pipeline.is_listening = False
+    await runner
+    counters = collect_counters(pipeline)
+    if args.false_barge_in:
+        cleared = [ms for ms in false_barge_ins if ms is not None]
+        counters["false_barge_in"] = {"bursts": len(false_barge_ins),
+                                      "still_unmuted": len(false_barge_ins) - len(cleared),
+                                      "remuted_after_ms": summarize(cleared)}
+    return samples, elapsed, counters
+
+
+async def false_barge_in(pipeline, args, burst_ms=500, level=6000.0):
+    """A cough over the answer: loud noise, then silence and no transcript. Returns ms from the trigger
+    until playback mutes the mic again, or None if it still hasn't after the timeout plus 2 s."""
+    loop = asyncio.get_running_loop()
+    deadline = time.time() + 10
+    while not pipeline.is_speaking and time.time() < deadline:
+        await asyncio.sleep(0.005)
+    samples = int(pipeline.audio_stream.profile.sample_rate * burst_ms / 1000)
+    noise = np.clip(np.random.default_rng(args.seed).normal(0, level, samples), -32768, 32767).astype(np.int16)
+    await loop.run_in_executor(None, pipeline.audio_stream.feed_pcm, noise.tobytes())
+    if not pipeline.barged_in:
+        return None
+    detected_at = pipeline.barge_in.detected_at
+    deadline = time.time() + args.barge_in_timeout_s + 2
+    while pipeline.barged_in and time.time() < deadline:
+        await loop.run_in_executor(None, pipeline.audio_stream.feed_silence, 100 * args.speed)  # ~100 ms wall
+    return None if pipeline.barged_in else (time.time() - detected_at) * 1000
+
+
+def collect_counters(pipeline):
+    """Non-latency counters from optional pipeline stages, stored alongside the percentiles."""
+    counters = {"rag": pipeline.rag.stats(), "tts_cache": pipeline.tts.cache.stats()}
+    counters["mic"] = pipeline.mic_stats()
+    if pipeline.loop_monitor:
+        counters["loop"] = pipeline.loop_monitor.stats()
+    if pipeline.profiler:
+        counters["profile_by_stage"] = pipeline.profiler.by_stage()
+    counters["tracing"] = pipeline.tracer.stats()  # rolling-histogram percentiles, for comparison with summary_ms
+    if pipeline.vad:
+        counters["vad"] = pipeline.vad.stats()
+    if pipeline.barge_in_latencies:
+        counters["barge_in_ms"] = summarize(list(pipeline.barge_in_latencies))
+    if pipeline.answer_cache:
+        counters["answer_cache"] = pipeline.answer_cache.stats()
+    if pipeline.speculation:
+        counters["speculation"] = pipeline.speculation.stats()
+    if pipeline.fast_path:
+        counters["fast_path"] = pipeline.fast_path.stats()
+    return counters
+
+
+def main():
+    args = parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    profile = build_profile(args)
+
+    samples, elapsed, counters = asyncio.run(run_benchmark(args, profile))
+    summary = {stage: summarize([s[stage] for s in samples]) for stage in STAGES}
+    # Cache hits and cold turns have very different TTFA; report them separately too
+    paths = sorted({s["path"] for s in samples})
+    ttfa_by_path = {p: summarize([s["ttfa"] for s in samples if s["path"] == p]) for p in paths}
+
+    results = {
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "wav": args.wav,
+        "turns": args.turns,
+        "wall_time_s": elapsed,
+        "profile": asdict(profile),
+        "summary_ms": summary,
+        "ttfa_by_path_ms": ttfa_by_path,
+        "counters": counters,
+        "samples_ms": samples,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'stage':<22}{'p50':>10}{'p95':>10}{'p99':>10}   (ms, {args.turns} turns)")
+    for stage in STAGES:
+        s = summary[stage]
+        print(f"{stage:<22}{s.get('p50', 0):10.1f}{s.get('p95', 0):10.1f}{s.get('p99', 0):10.1f}")
+    for path, s in ttfa_by_path.items():
+        print(f"{'ttfa[' + path + ']':<22}{s.get('p50', 0):10.1f}{s.get('p95', 0):10.1f}{s.get('p99', 0):10.1f}   n={s['count']}")
+    if "false_barge_in" in counters:
+        fb = counters["false_barge_in"]
+        print(f"False barge-ins: {fb['bursts']}, mic re-muted after p50 {fb['remuted_after_ms'].get('p50', 0):.0f} ms, "
+              f"{fb['still_unmuted']} left unmuted")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
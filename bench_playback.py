@@ -0,0 +1,157 @@
+"""
+Output jitter buffer benchmark: audible stutter under TTS chunk jitter.
+
+Streams answers (a few sentences of local stand-in TTS audio, like the
+pipeline's TTS thread: sentence after sentence, a silence gap between them)
+into PlaybackWorker over a device that blocks for each chunk's play time, and
+records every write on the device's timeline. A gap between two writes of the
+same answer is an underrun the listener hears. Chunk arrival gets an
+exponential extra delay (`--jitter-ms` means) on top of the provider's pace
+(`--realtime-factor` x real time, near 1 for a streaming voice over the
+network).
+
+    direct       no prebuffer: every chunk is written as soon as it arrives (the old path)
+    fixed-N      prebuffer N ms before each answer and after each underrun
+    adaptive     target from recent answers' arrival pattern (utils/jitter_buffer.py)
+
+Reports underruns and starved time per answer (from the device timeline, not
+the worker's own counters), the start delay the prebuffer adds, and the cost of
+format conversion (24 kHz PCM -> 16 kHz with gain) per chunk.
+
+    python bench_playback.py --answers 12 --jitter-ms 0 10 20 --speed 4
+"""
+import argparse
+import json
+import platform
+import queue
+import threading
+import time
+
+import numpy as np
+
+from services.local_services import LocalProfile, LocalTTSService
+from utils.jitter_buffer import FormatConverter, PlayoutBuffer
+from utils.latency_stats import summarize
+from utils.playback import PlaybackWorker, silence
+
+SENTENCES = [
+    "Mindgrove Technologies designs indigenous microcontroller chips.",
+    "Their Secure IoT SoC is built right here at the IITM Research Park.",
+    "You can find their office in the D block, second floor.",
+]
+GAP_MS = 5.0  # longer silences between writes of one answer are audible
+
+
+class TimelineOutput:
+    """Blocks for each chunk's play time, like a sound card, and records when audio was playing."""
+
+    def __init__(self, sample_rate, speed):
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.writes = []  # (answer, start, end) in wall time
+        self.answer = 0
+
+    def write(self, data):
+        start = time.monotonic()
+        time.sleep(len(data) / (self.sample_rate * 2) / self.speed)
+        with self.lock:
+            self.writes.append((self.answer, start, time.monotonic()))
+
+    def gaps(self, answer):
+        spans = [(s, e) for a, s, e in self.writes if a == answer]
+        return [(s - prev_end) * 1000 * self.speed for (_, prev_end), (s, _) in zip(spans, spans[1:])
+                if (s - prev_end) * 1000 * self.speed > GAP_MS]
+
+
+def run_mode(mode, args, jitter_ms):
+    speed = args.speed
+    # Provider pace and delays are given in device time; the stand-in sleeps wall time
+    profile = LocalProfile(speed=speed, tts_first_chunk_ms=args.first_chunk_ms / speed,
+                           tts_realtime_factor=args.realtime_factor * speed, tts_chunk_jitter_ms=jitter_ms / speed,
+                           seed=args.seed)
+    tts = LocalTTSService(profile)
+    device = TimelineOutput(profile.sample_rate, speed)
+    if mode == "direct":
+        jitter = PlayoutBuffer(0, 0, margin_ms=0)
+    elif mode.startswith("fixed-"):
+        jitter = PlayoutBuffer(float(mode[6:]), float(mode[6:]))
+    else:
+        jitter = PlayoutBuffer(args.min_ms, args.max_ms)
+    audio_queue = queue.Queue(maxsize=64)
+    player = PlaybackWorker(device, audio_queue, converter=FormatConverter("", profile.sample_rate),
+                            jitter=jitter, speed=speed)
+    player.start()
+    gap = silence(200, profile.sample_rate)
+
+    start_delays, underruns, starved = [], [], []
+    for answer in range(args.answers):
+        device.answer = answer
+        first_put = None
+        for sentence in SENTENCES:
+            for chunk in tts.text_to_audio_stream(sentence):
+                first_put = first_put or time.monotonic()
+                player.put(chunk)
+            player.put(gap)
+        player.end_stream()
+        audio_queue.join()
+        first_write = min(s for a, s, _ in device.writes if a == answer)
+        start_delays.append((first_write - first_put) * 1000 * speed)
+        gaps = device.gaps(answer)
+        underruns.append(len(gaps))
+        starved.append(sum(gaps))
+    player.stop()
+    stats = player.stats()
+    return {"mode": mode, "jitter_ms": jitter_ms, "underruns_per_answer": sum(underruns) / len(underruns),
+            "answers_with_stutter": sum(1 for n in underruns if n) / len(underruns),
+            "starved_ms_per_answer": sum(starved) / len(starved), "start_delay_ms": summarize(start_delays),
+            "final_target_ms": stats["target_ms"], "worker_underruns": stats["underruns"]}
+
+
+def conversion_cost(chunks=2000, chunk_bytes=2048):
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(chunks * chunk_bytes // 2) * 2000).astype(np.int16).tobytes()
+    converter = FormatConverter("pcm_24000", 16000, target_rms=3000)
+    started = time.perf_counter()
+    for i in range(chunks):
+        converter.convert(audio[i * chunk_bytes:(i + 1) * chunk_bytes])
+    per_chunk_us = (time.perf_counter() - started) / chunks * 1e6
+    return {"chunk_ms": chunk_bytes / 2 / 24000 * 1000, "per_chunk_us": per_chunk_us}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=12)
+    parser.add_argument("--jitter-ms", type=float, nargs="+", default=[0, 10, 20])
+    parser.add_argument("--realtime-factor", type=float, default=1.5, help="provider audio per wall second")
+    parser.add_argument("--first-chunk-ms", type=float, default=180)
+    parser.add_argument("--fixed-ms", type=float, default=200)
+    parser.add_argument("--min-ms", type=float, default=40)
+    parser.add_argument("--max-ms", type=float, default=600)
+    parser.add_argument("--speed", type=float, default=4.0, help="device pace (x real time)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_results_playback.json")
+    args = parser.parse_args()
+
+    modes = ["direct", f"fixed-{args.fixed_ms:.0f}", "adaptive"]
+    results = [run_mode(mode, args, jitter) for jitter in args.jitter_ms for mode in modes]
+    conversion = conversion_cost()
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "args": vars(args), "results": results, "conversion": conversion}, f, indent=2)
+
+    print(f"\n{args.answers} answers x {len(SENTENCES)} sentences, provider at {args.realtime_factor}x real time")
+    print(f"{'jitter':>7}{'mode':>11}{'underruns/answer':>18}{'answers stuttering':>20}{'starved ms/answer':>19}"
+          f"{'start delay p50':>17}{'target':>8}")
+    for r in results:
+        print(f"{r['jitter_ms']:6.0f} {r['mode']:>11}{r['underruns_per_answer']:18.2f}"
+              f"{r['answers_with_stutter'] * 100:19.0f}%{r['starved_ms_per_answer']:19.0f}"
+              f"{r['start_delay_ms']['p50']:17.0f}{r['final_target_ms']:8.0f}")
+    print(f"\nFormat conversion (24 kHz -> 16 kHz, gain): {conversion['per_chunk_us']:.0f} us per "
+          f"{conversion['chunk_ms']:.0f} ms chunk")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
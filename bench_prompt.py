@@ -0,0 +1,136 @@
+"""
+Prompt size / follow-up benchmark for utils/prompt_builder.py.
+
+Builds a synthetic directory (bench_lexical's names, with descriptions from two
+to fourteen sentences long, like real entries) and runs scripted visitor
+conversations through the lexical retriever: a question about a startup,
+follow-ups that only say "they" / "their", then a second startup. For each
+mode it reports prompt tokens per turn, the share of prompts within the
+budget, modelled time to first token (services.local_services.LocalLLMService:
+fixed TTFT plus prefill per uncached prompt token, cached system prefix) and
+how often a follow-up's prompt still contains the startup it refers to:
+
+    raw-k3 / raw-k8   retriever context joined as-is (the old path), no history
+    budget-N          PromptBuilder with an N-token budget over the top 8 hits
+
+    python bench_prompt.py --entries 500 --visitors 40 --budgets 600 1200
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+from bench_lexical import synthetic_directory
+from services.local_services import LocalLLMService, LocalProfile
+from utils.directory import format_context, load_directory
+from utils.latency_stats import summarize
+from utils.lexical_index import LexicalIndex
+from utils.prompt_builder import PERSONA, ConversationMemory, Prompt, PromptBuilder
+
+SENTENCES = [
+    "{core} was incubated at the IITM Research Park in {year}.",
+    "Their office is in {block} block, {floor} floor.",
+    "The company was founded by {founder} and a team of IIT Madras alumni.",
+    "{core} has raised a seed round and employs about {staff} people.",
+    "Their flagship product serves {sector} customers in {cities} cities.",
+    "They partner with IIT Madras labs on research in {sector}.",
+    "{core} won a national innovation award for its work on {sector}.",
+    "Visitors can book a demo at the reception or on the company website.",
+]
+FOUNDERS = ["Priya Raman", "Arjun Mehta", "Kavya Iyer", "Rahul Nair", "Sneha Pillai", "Vikram Rao"]
+SCRIPT = [
+    ("what does {name} do", 0, False),
+    ("where is their office", 0, True),
+    ("who founded them", 0, True),
+    ("tell me about {name}", 1, False),
+    ("how many people work there", 1, True),
+]
+
+
+def directory(n, seed=0):
+    rng = random.Random(seed)
+    records = synthetic_directory(n, seed)
+    for record in records:
+        core = record["description"].split(" works on ")[0]
+        extra = [s.format(core=core, year=rng.randint(2010, 2024), block=rng.choice("ABCDE"),
+                          floor=rng.choice(["ground", "first", "second", "third"]), founder=rng.choice(FOUNDERS),
+                          staff=rng.randint(5, 200), sector=record["sector"], cities=rng.randint(2, 40))
+                 for s in rng.sample(SENTENCES, rng.randint(1, len(SENTENCES)))]
+        record["description"] = " ".join([record["description"] + "."] + extra * rng.choice([1, 1, 2]))
+    return records
+
+
+def run_mode(mode, entries, index, visitors, llm, rng_seed):
+    rng = random.Random(rng_seed)
+    raw_k = int(mode.split("-k")[1]) if mode.startswith("raw") else None
+    builder = None if raw_k else PromptBuilder(int(mode.split("-")[1]))
+    memory = ConversationMemory()
+    persona = PromptBuilder().prefix_tokens  # the old path sends the persona too (from the LLM client)
+    tokens, ttft, followups, grounded, in_budget = [], [], 0, 0, 0
+    for _ in range(visitors):
+        memory.reset()
+        subjects = rng.sample(entries, 2)
+        for template, subject, is_followup in SCRIPT:
+            entry = subjects[subject]
+            question = template.format(name=entry.name)
+            hits = index.search(question, raw_k or 8)
+            prompt = Prompt.raw(question, format_context(hits)) if raw_k else builder.build(question, hits, memory)
+            total = prompt.tokens["total"] + (persona if raw_k else 0)
+            tokens.append(total)
+            ttft.append(llm.profile.llm_ttft_ms + llm.prefill_s(question, prompt.context) * 1000)
+            in_budget += builder is not None and total <= builder.budget_tokens
+            if is_followup:
+                followups += 1
+                grounded += any(entry.text[:40] in hit["text"] for hit in prompt.entries)
+            answer = prompt.entries[0]["text"].split(". ")[0] + "." if prompt.entries else "I don't know."
+            memory.add(question, answer, prompt.entries)
+    turns = len(tokens)
+    return {"mode": mode, "turns": turns, "prompt_tokens": summarize(tokens), "ttft_ms": summarize(ttft),
+            "within_budget": in_budget / turns if builder else None,
+            "followups_grounded": grounded / followups}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--visitors", type=int, default=40)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[600, 1200])
+    parser.add_argument("--ttft-ms", type=float, default=250.0, help="TTFT for an empty prompt")
+    parser.add_argument("--ms-per-token", type=float, default=0.4, help="prefill cost per uncached prompt token")
+    parser.add_argument("--output", default="bench_results_prompt.json")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_prompt_")
+    path = os.path.join(workdir, "directory.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(directory(args.entries), f)
+    entries = load_directory(path)
+    index = LexicalIndex(entries)
+
+    profile = LocalProfile(llm_ttft_ms=args.ttft_ms, llm_ms_per_prompt_token=args.ms_per_token)
+    llm = LocalLLMService(None, profile)
+    llm.system_prompt = PERSONA
+    modes = ["raw-k3", "raw-k8"] + [f"budget-{b}" for b in args.budgets]
+    results = [run_mode(mode, entries, index, args.visitors, llm, rng_seed=1) for mode in modes]
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "args": vars(args), "results": results}, f, indent=2)
+
+    print(f"\n{args.entries} entries, {args.visitors} visitors x {len(SCRIPT)} turns; TTFT {args.ttft_ms:.0f} ms "
+          f"+ {args.ms_per_token} ms per uncached prompt token")
+    print(f"{'mode':>12}{'tokens p50':>12}{'p95':>7}{'max':>7}{'in budget':>11}{'TTFT p50':>10}{'p95':>7}"
+          f"{'follow-ups grounded':>21}")
+    for r in results:
+        t, ms = r["prompt_tokens"], r["ttft_ms"]
+        budget = f"{r['within_budget'] * 100:.0f}%" if r["within_budget"] is not None else "-"
+        print(f"{r['mode']:>12}{t['p50']:12.0f}{t['p95']:7.0f}{t['max']:7.0f}{budget:>11}{ms['p50']:10.0f}"
+              f"{ms['p95']:7.0f}{r['followups_grounded'] * 100:20.0f}%")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
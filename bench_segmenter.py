@@ -0,0 +1,116 @@
+"""
+Microbenchmark: incremental SentenceSegmenter vs. the old regex re-scan.
+
+Generates long LLM-style responses, splits them into streamed tokens and times
+both approaches token by token. The legacy loop re-ran re.search/re.split over
+the whole accumulated buffer after every token (and broke on every '.').
+
+    python bench_segmenter.py --sentences 50 200 1000
+"""
+import argparse
+import random
+import re
+import time
+
+from utils.segmenter import SentenceSegmenter
+
+FRAGMENTS = [
+    "Mindgrove Technologies builds RISC-V chips at the IITM Research Park.",
+    "Dr. Kamakoti advised the founders in the early days.",
+    "They raised 3.5 crore in their seed round, and more since.",
+    "You can read more at iitmrp.org or visit their office.",
+    "Well... the cafeteria is on the ground floor, next to the lobby!",
+    "Is there anything else you'd like to know?",
+    "The company, e.g. its Secure IoT SoC team, works with Pvt. Ltd. partners.",
+]
+
+
+def make_response(sentences, seed=7):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(FRAGMENTS) for _ in range(sentences))
+
+
+def make_run_on(words, seed=7):
+    """A long answer with no sentence terminator (lists, code-like text): worst case for re-scanning."""
+    rng = random.Random(seed)
+    vocab = "startup chip sensor office floor lab team founder, product, campus, block,".split()
+    return " ".join(rng.choice(vocab) for _ in range(words)) + "."
+
+
+def tokenize(text):
+    # Roughly what Gemini streams: words with trailing spaces, sometimes split mid-word
+    tokens = []
+    for word in re.findall(r"\S+\s*", text):
+        if len(word) > 8:
+            tokens.extend([word[:4], word[4:]])
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def legacy_segment(tokens):
+    """The pre-segmenter logic from S2SPipeline.process_tts_queue."""
+    out = []
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        if re.search(r'[.!?]', buffer):
+            parts = re.split(r'([.!?])', buffer)
+            for i in range(0, len(parts) - 1, 2):
+                sentence = (parts[i] + parts[i + 1]).strip()
+                if sentence:
+                    out.append(sentence)
+            remainder = parts[-1]
+            buffer = "" if remainder.strip() == "" else remainder
+    return out
+
+
+def incremental_segment(tokens, **policy):
+    seg = SentenceSegmenter(**policy)
+    out = []
+    for token in tokens:
+        out.extend(seg.feed(token))
+    out.extend(seg.flush())
+    return out
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentence segmenter microbenchmark")
+    parser.add_argument("--sentences", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--run-on-words", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [(f"{n} sent", make_response(n)) for n in args.sentences]
+    cases += [(f"run-on {n}w", make_run_on(n)) for n in args.run_on_words]
+
+    print(f"{'case':>14}{'chars':>9}{'tokens':>8}{'legacy us/tok':>15}{'incr us/tok':>13}{'legacy segs':>13}{'incr segs':>11}")
+    for name, text in cases:
+        tokens = tokenize(text)
+        legacy_t, legacy_out = best_of(lambda: legacy_segment(tokens), args.repeat)
+        incr_t, incr_out = best_of(lambda: incremental_segment(tokens), args.repeat)
+        print(f"{name:>14}{len(text):>9}{len(tokens):>8}"
+              f"{legacy_t / len(tokens) * 1e6:>15.2f}{incr_t / len(tokens) * 1e6:>13.2f}"
+              f"{len(legacy_out):>13}{len(incr_out):>11}")
+
+    sample = tokenize(" ".join(FRAGMENTS))
+    print("\nLegacy split of the sample fragments:")
+    for s in legacy_segment(sample)[:8]:
+        print(f"  | {s}")
+    print("\nIncremental split (first chunk at clause break):")
+    for s in incremental_segment(sample, first_chunk_clause=True)[:8]:
+        print(f"  | {s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Load generator for server.py: N simulated kiosks against one server process.
+
+For each session count it starts a fresh in-process KioskServer on the offline
+stand-ins (or targets --port of a running server), connects N clients that each
+stream test_output.wav in 20 ms frames, mark the end of the utterance, and wait
+for the answer audio to finish before the next turn. Reported per N: turns/s,
+server-side TTFA percentiles, the client-observed end-of-utterance -> first
+answer byte latency, the spread between sessions and time spent waiting for
+LLM/TTS slots.
+
+    python bench_server.py --sessions 1 2 4 8 16 --turns 3 --speed 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import tempfile
+import time
+import wave
+
+from server import KioskServer, read_frame, write_frame
+from services.local_services import LocalProfile, LocalServices
+from utils.latency_stats import summarize
+
+
+def parse_args():
+    defaults = LocalProfile()
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for server.py")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--turns", type=int, default=3, help="turns per session")
+    parser.add_argument("--wav", default="test_output.wav")
+    parser.add_argument("--speed", type=float, default=4.0, help="mic feed / playback pace (x real time)")
+    parser.add_argument("--frame-ms", type=float, default=20)
+    parser.add_argument("--stagger-ms", type=float, default=250, help="spread session start times over this window")
+    parser.add_argument("--llm-slots", type=int, default=4)
+    parser.add_argument("--tts-slots", type=int, default=4)
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="share the answer cache (every client asks the same question, so each session's "
+                             "first turn hits it; later turns carry history and miss)")
+    parser.add_argument("--rag-ms", type=float, default=defaults.rag_ms)
+    parser.add_argument("--llm-ttft-ms", type=float, default=defaults.llm_ttft_ms)
+    parser.add_argument("--tts-first-chunk-ms", type=float, default=defaults.tts_first_chunk_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="target a running server instead of an in-process one")
+    parser.add_argument("--output", default="bench_results_server.json")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args()
+
+
+def load_frames(path, frame_ms):
+    with wave.open(path, "rb") as wf:
+        rate = wf.getframerate()
+        audio = wf.readframes(wf.getnframes())
+    step = int(rate * frame_ms / 1000) * 2
+    return [audio[i:i + step] for i in range(0, len(audio), step)], rate
+
+
+class KioskClient:
+    """One simulated kiosk: streams the WAV each turn and times the answer."""
+
+    def __init__(self, name, frames, rate, speed, frame_ms):
+        self.name = name
+        self.frames = frames
+        self.frame_s = frame_ms / 1000.0 / speed
+        self.quiet_s = 0.2
+        self.events = asyncio.Queue()
+        self.last_audio = 0.0
+        self.first_audio = None
+        self.audio_bytes = 0
+        self.turns = []  # (server stages, client ms)
+
+    async def run(self, host, port, turns, delay):
+        await asyncio.sleep(delay)
+        reader, writer = await asyncio.open_connection(host, port)
+        write_frame(writer, b"H", json.dumps({"kiosk": self.name}).encode("utf-8"))
+        kind, payload = await read_frame(reader)
+        if kind != b"R":
+            writer.close()
+            raise RuntimeError(f"{self.name}: refused ({payload.decode()})")
+        receiver = asyncio.create_task(self.receive(reader))
+        try:
+            for _ in range(turns):
+                await self.turn(writer)
+            write_frame(writer, b"Q")
+            await writer.drain()
+        finally:
+            receiver.cancel()
+            writer.close()
+
+    async def turn(self, writer):
+        start = time.perf_counter()
+        for i, frame in enumerate(self.frames):
+            write_frame(writer, b"A", frame)
+            await writer.drain()
+            # Pace against the start so timer overshoot does not accumulate
+            await asyncio.sleep(max(0.0, start + (i + 1) * self.frame_s - time.perf_counter()))
+        self.first_audio = None
+        end_of_speech = time.perf_counter()
+        write_frame(writer, b"E")
+        await writer.drain()
+        event = await self.events.get()
+        client_ms = (self.first_audio - end_of_speech) * 1000 if self.first_audio else None
+        self.turns.append((event.get("stages_ms", {}), client_ms))
+        # Let the answer finish playing before the next utterance (the server mutes the mic meanwhile)
+        while time.perf_counter() - self.last_audio < self.quiet_s:
+            await asyncio.sleep(0.05)
+
+    async def receive(self, reader):
+        while True:
+            kind, payload = await read_frame(reader)
+            if kind == b"A":
+                now = time.perf_counter()
+                self.last_audio = now
+                self.audio_bytes += len(payload)
+                if self.first_audio is None:
+                    self.first_audio = now
+            elif kind == b"J":
+                event = json.loads(payload)
+                if event.get("event") == "turn":
+                    await self.events.put(event)
+
+
+def missing_system_prompt(pipeline):
+    """The innermost LLM client's class name if the persona prefix stopped at a wrapper around it."""
+    llm = pipeline.model
+    while "llm" in vars(llm):
+        llm = vars(llm)["llm"]
+    if pipeline.prompts and vars(llm).get("system_prompt") != pipeline.prompts.prefix:
+        return type(llm).__name__
+    return None
+
+
+async def run_level(args, sessions, frames, rate):
+    server = None
+    unprompted = set()  # LLM clients that never got the persona as their system prompt
+    port = args.port
+    if not port:
+        profile = LocalProfile(speed=args.speed, rag_ms=args.rag_ms, llm_ttft_ms=args.llm_ttft_ms,
+                               tts_first_chunk_ms=args.tts_first_chunk_ms, jitter_ms=args.jitter_ms)
+        server = KioskServer(LocalServices(profile), max_sessions=sessions, llm_slots=args.llm_slots,
+                             tts_slots=args.tts_slots, speed=args.speed, answer_cache=args.answer_cache,
+                             tts_cache_dir=tempfile.mkdtemp(prefix="bench_server_tts_"))
+        port = await server.start(args.host, 0)
+        turn_finished = server.turn_finished
+
+        def checked_turn(session, trace):
+            client = missing_system_prompt(session.pipeline)
+            if client:
+                unprompted.add(client)
+            turn_finished(session, trace)
+        server.turn_finished = checked_turn
+
+    clients = [KioskClient(f"kiosk-{i + 1}", frames, rate, args.speed, args.frame_ms) for i in range(sessions)]
+    started = time.perf_counter()
+    stagger = args.stagger_ms / 1000.0
+    await asyncio.gather(*(c.run(args.host, port, args.turns, stagger * i / max(1, sessions))
+                           for i, c in enumerate(clients)))
+    elapsed = time.perf_counter() - started
+    stats = server.stats() if server else {}
+    if server:
+        await server.close()
+    if unprompted:
+        raise AssertionError(f"system prompt never reached {', '.join(sorted(unprompted))}")
+
+    ttfa = [stages.get("ttfa") for c in clients for stages, _ in c.turns]
+    client_ms = [ms for c in clients for _, ms in c.turns]
+    per_session_p50 = [summarize([stages.get("ttfa") for stages, _ in c.turns]).get("p50", 0) for c in clients]
+    pools = stats.get("pools", {})
+    return {
+        "sessions": sessions,
+        "turns": len(ttfa),
+        "wall_time_s": elapsed,
+        "turns_per_s": len(ttfa) / elapsed if elapsed else 0.0,
+        "ttfa_ms": summarize(ttfa),
+        "client_first_audio_ms": summarize(client_ms),
+        "session_p50_spread_ms": max(per_session_p50) - min(per_session_p50) if per_session_p50 else 0.0,
+        "llm_wait_ms_per_call": pools.get("llm_wait_ms", 0) / pools["llm_calls"] if pools.get("llm_calls") else 0.0,
+        "tts_wait_ms_per_call": pools.get("tts_wait_ms", 0) / pools["tts_calls"] if pools.get("tts_calls") else 0.0,
+        "server": stats,
+    }
+
+
+async def run_all(args):
+    frames, rate = load_frames(args.wav, args.frame_ms)
+    return [await run_level(args, n, frames, rate) for n in args.sessions]
+
+
+def main():
+    args = parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    levels = asyncio.run(run_all(args))
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "wav": args.wav,
+        "speed": args.speed,
+        "turns_per_session": args.turns,
+        "pools": {"llm_slots": args.llm_slots, "tts_slots": args.tts_slots},
+        "levels": levels,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'sessions':>8}{'turns/s':>9}{'ttfa p50':>10}{'p95':>8}{'p99':>8}{'client p50':>12}{'p99':>8}"
+          f"{'spread':>8}{'llm wait':>10}{'tts wait':>10}   (ms)")
+    for level in levels:
+        t, c = level["ttfa_ms"], level["client_first_audio_ms"]
+        print(f"{level['sessions']:>8}{level['turns_per_s']:9.2f}{t.get('p50', 0):10.1f}{t.get('p95', 0):8.1f}"
+              f"{t.get('p99', 0):8.1f}{c.get('p50', 0):12.1f}{c.get('p99', 0):8.1f}"
+              f"{level['session_p50_spread_ms']:8.1f}{level['llm_wait_ms_per_call']:10.1f}{level['tts_wait_ms_per_call']:10.1f}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
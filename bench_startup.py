@@ -0,0 +1,109 @@
+"""
+Cold-start benchmark: serial vs. parallel service start-up.
+
+Builds and starts S2SPipeline on the offline stand-ins with start-up costs
+that mimic a kiosk after a reboot (embedding model + directory load, SDK
+imports, STT socket, camera open), once with the steps run one after another
+and once with utils.startup running independent steps concurrently. Reports
+time-to-ready (mic listening) against the budget, the per-step timeline and
+the TTFA of the first question asked right after start-up.
+
+    python bench_startup.py --runs 3 --budget-s 5 --rag-load-ms 2500
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import tempfile
+import time
+
+from main import S2SPipeline
+from services.local_services import LocalProfile, LocalServices
+from utils.audio_cache import AudioCache
+from utils.latency_stats import summarize
+from utils.startup import Startup
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per mode")
+    parser.add_argument("--budget-s", type=float, default=5.0)
+    parser.add_argument("--wav", default="test_output.wav")
+    parser.add_argument("--speed", type=float, default=4.0, help="mic feed / playback pace (x real time)")
+    parser.add_argument("--audio-init-ms", type=float, default=150)
+    parser.add_argument("--rag-load-ms", type=float, default=2500)
+    parser.add_argument("--llm-init-ms", type=float, default=400)
+    parser.add_argument("--tts-init-ms", type=float, default=200)
+    parser.add_argument("--stt-connect-ms", type=float, default=600)
+    parser.add_argument("--vision-init-ms", type=float, default=900)
+    parser.add_argument("--output", default="bench_results_startup.json")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args()
+
+
+async def cold_start(args, profile, parallel):
+    loop = asyncio.get_running_loop()
+    startup = Startup(args.budget_s, parallel=parallel, t0=time.perf_counter())
+    pipeline = S2SPipeline(loop, LocalServices(profile), startup=startup)
+    pipeline.show_metrics = False
+    pipeline.tts.cache = AudioCache(tempfile.mkdtemp(prefix="bench_startup_tts_"))
+    runner = asyncio.create_task(pipeline.start())
+    while not pipeline.is_listening and not runner.done():
+        await asyncio.sleep(0.005)
+
+    # First question right after start-up
+    await loop.run_in_executor(None, pipeline.audio_stream.feed_wav, args.wav)
+    await pipeline.stt.finalize()
+    await pipeline.wait_idle()
+    first_ttfa = pipeline.turn_latencies().get("ttfa")
+
+    pipeline.is_listening = False
+    await runner
+    if args.verbose:
+        print(startup.report())
+    return dict(startup.summary(), first_ttfa_ms=first_ttfa)
+
+
+async def run_all(args, profile):
+    return {mode: [await cold_start(args, profile, mode == "parallel") for _ in range(args.runs)]
+            for mode in ("serial", "parallel")}
+
+
+def main():
+    args = parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    profile = LocalProfile(speed=args.speed, audio_init_ms=args.audio_init_ms, rag_load_ms=args.rag_load_ms,
+                           llm_init_ms=args.llm_init_ms, tts_init_ms=args.tts_init_ms,
+                           stt_connect_ms=args.stt_connect_ms, vision_init_ms=args.vision_init_ms)
+    runs = asyncio.run(run_all(args, profile))
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "budget_s": args.budget_s,
+        "profile": {k: getattr(profile, k) for k in ("audio_init_ms", "rag_load_ms", "llm_init_ms", "tts_init_ms",
+                                                     "stt_connect_ms", "vision_init_ms")},
+        "modes": {mode: {"ready_ms": summarize([r["ready_ms"] for r in rs]),
+                         "first_ttfa_ms": summarize([r["first_ttfa_ms"] for r in rs]),
+                         "within_budget": sum(r["ready_ms"] <= args.budget_s * 1000 for r in rs) / len(rs),
+                         "runs": rs}
+                  for mode, rs in runs.items()},
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'mode':>10}{'ready p50':>11}{'max':>9}{'in budget':>11}{'first ttfa':>12}   (ms, budget {args.budget_s:.1f} s)")
+    for mode, r in results["modes"].items():
+        print(f"{mode:>10}{r['ready_ms']['p50']:11.0f}{r['ready_ms']['max']:9.0f}{r['within_budget'] * 100:10.0f}%"
+              f"{r['first_ttfa_ms']['p50']:12.1f}")
+    last = runs["parallel"][-1]
+    print(f"\nParallel timeline (last run), critical path: {' -> '.join(last['critical_path'])}")
+    for step in last["steps"]:
+        print(f"   {step['phase']:<6}{step['name']:<14}{step['start_ms']:8.0f} -> {step['end_ms']:8.0f} ms")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
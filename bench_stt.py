@@ -0,0 +1,302 @@
+"""
+STT fail-over benchmark against a local fake Deepgram server.
+
+FakeDeepgram speaks the parts of /v1/listen the client uses (binary audio in;
+Results JSON with is_final / speech_final / start / duration out; KeepAlive,
+Finalize and CloseStream messages) and injects faults: every stream is cut
+(TCP abort, no close frame) after a random 4-10 s of audio, streams without
+data for `--idle-timeout-s` are closed like Deepgram's NET-0001, handshakes
+take `--connect-ms` and some are refused with 503, results arrive
+`--result-ms` late.
+
+The audio is synthetic so nothing is guessed: every "word" is 200 ms of a
+constant sample value that encodes its id, and the server "transcribes" by
+decoding it. A run sends `--utterances` six-word utterances (with pauses of
+`--pause-s` wall time and no audio every tenth, like the VAD gate), and counts
+which words come back in final transcripts: lost words (audio that went into a
+dead socket or arrived during a reconnect) and duplicated words (audio
+transcribed twice). Each final's callback takes `--answer-ms`, like the
+pipeline answering it; interims that arrive meanwhile are counted (the
+connection has to keep reading while a turn runs).
+
+    baseline   one connection, no keepalives, no reconnect (the original client)
+    reconnect  keepalives + reconnect on drop, no standby, no replay
+    resilient  keepalives + hot standby + replay since the last final
+
+    python bench_stt.py --utterances 40 --speed 4
+"""
+import argparse
+import asyncio
+import http
+import json
+import logging
+import platform
+import random
+import time
+
+import numpy as np
+
+from services.resilient_stt import ResilientSTTService, deepgram_connector
+
+FRAME = 320            # 20 ms at 16 kHz
+WORD_FRAMES = 10       # 200 ms per word
+GAP_FRAMES = 5         # between words
+MIN_WORD_FRAMES = 5    # shorter fragments (a word cut by a drop) aren't recognized
+ENDPOINT_FRAMES = 15   # 300 ms of silence ends an utterance
+WORDS_PER_UTTERANCE = 6
+BASE, STEP = 1000, 40
+
+
+def word_audio(word_id):
+    return np.full(FRAME * WORD_FRAMES, BASE + STEP * word_id, dtype=np.int16).tobytes()
+
+
+def utterance_audio(index):
+    silence = b"\x00" * (FRAME * 2 * GAP_FRAMES)
+    ids = [index * WORDS_PER_UTTERANCE + i for i in range(WORDS_PER_UTTERANCE)]
+    audio = b"".join(word_audio(i) + silence for i in ids)
+    return audio + b"\x00" * (FRAME * 2 * (ENDPOINT_FRAMES + 10)), [f"w{i}" for i in ids]
+
+
+class WordDecoder:
+    """Streaming "recognizer" for the synthetic words of one connection."""
+
+    def __init__(self):
+        self.buffer = b""
+        self.frames = 0
+        self.word, self.word_frames = None, 0
+        self.words = []
+        self.silence = 0
+        self.final_frame = 0  # end of the last final segment
+
+    def feed(self, data):
+        self.buffer += data
+        results = []
+        while len(self.buffer) >= FRAME * 2:
+            frame, self.buffer = np.frombuffer(self.buffer[:FRAME * 2], dtype=np.int16), self.buffer[FRAME * 2:]
+            self.frames += 1
+            value = int(frame[0])
+            if value != 0 and (frame == value).all():
+                word = (value - BASE) // STEP
+                if word != self.word:
+                    results += self.end_word()
+                    self.word, self.word_frames = word, 0
+                self.word_frames += 1
+                self.silence = 0
+            else:
+                results += self.end_word()
+                self.silence += 1
+                if self.silence == ENDPOINT_FRAMES and self.words:
+                    results.append(self.final(speech_final=True))
+        return results
+
+    def end_word(self):
+        if self.word is None:
+            return []
+        word, frames = self.word, self.word_frames
+        self.word = None
+        if frames < MIN_WORD_FRAMES:
+            return []
+        self.words.append(f"w{word}")
+        if len(self.words) == 4:  # long utterances come back in is_final segments
+            return [self.final(speech_final=False)]
+        return [self.result(" ".join(self.words), False, False)]
+
+    def final(self, speech_final, from_finalize=False):
+        result = self.result(" ".join(self.words), True, speech_final)
+        result["from_finalize"] = from_finalize
+        self.words = []
+        self.final_frame = self.frames
+        return result
+
+    def result(self, transcript, is_final, speech_final):
+        start = self.final_frame * FRAME / 16000
+        return {"type": "Results", "is_final": is_final, "speech_final": speech_final, "start": start,
+                "duration": self.frames * FRAME / 16000 - start,
+                "channel": {"alternatives": [{"transcript": transcript, "confidence": 0.99}]}}
+
+
+class FakeDeepgram:
+    def __init__(self, connect_ms=300, result_ms=150, drop_after_s=(4.0, 10.0), idle_timeout_s=2.0,
+                 refuse_ratio=0.2, seed=7):
+        self.connect_ms = connect_ms
+        self.result_ms = result_ms
+        self.drop_after_s = drop_after_s
+        self.idle_timeout_s = idle_timeout_s
+        self.refuse_ratio = refuse_ratio
+        self.rng = random.Random(seed)
+        self.counters = {"connections": 0, "refused": 0, "drops": 0, "idle_timeouts": 0, "keepalives": 0}
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        from websockets.asyncio.server import serve
+        self.server = await serve(self.handle, "127.0.0.1", 0, process_request=self.handshake, compression=None,
+                                  ping_interval=None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{self.port}/v1/listen"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handshake(self, connection, request):
+        await asyncio.sleep(self.connect_ms / 1000)
+        if self.rng.random() < self.refuse_ratio:
+            self.counters["refused"] += 1
+            return connection.respond(http.HTTPStatus.SERVICE_UNAVAILABLE, "busy\n")
+        return None
+
+    async def handle(self, ws):
+        self.counters["connections"] += 1
+        decoder = WordDecoder()
+        drop_at = self.rng.uniform(*self.drop_after_s) if self.drop_after_s else None
+
+        async def deliver(result):
+            await asyncio.sleep(self.result_ms / 1000)
+            try:
+                await ws.send(json.dumps(result))
+            except Exception:
+                pass
+
+        while True:
+            try:
+                message = await asyncio.wait_for(ws.recv(), self.idle_timeout_s)
+            except asyncio.TimeoutError:
+                self.counters["idle_timeouts"] += 1
+                await ws.close(1011, "NET-0001: no audio received")
+                return
+            except Exception:
+                return
+            if isinstance(message, str):
+                kind = json.loads(message).get("type")
+                if kind == "KeepAlive":
+                    self.counters["keepalives"] += 1
+                elif kind == "Finalize" and decoder.words:
+                    asyncio.ensure_future(deliver(decoder.final(speech_final=False, from_finalize=True)))
+                elif kind == "CloseStream":
+                    await ws.close()
+                    return
+                continue
+            for result in decoder.feed(message):
+                asyncio.ensure_future(deliver(result))
+            if drop_at is not None and decoder.frames * FRAME / 16000 >= drop_at:
+                self.counters["drops"] += 1
+                ws.transport.abort()
+                return
+
+
+MODES = {
+    "baseline": dict(standby=False, replay=False, reconnect=False, keepalive_s=float("inf")),
+    "reconnect": dict(standby=False, replay=False, reconnect=True),
+    "resilient": dict(standby=True, replay=True, reconnect=True),
+}
+
+
+async def run_mode(name, args):
+    fake = FakeDeepgram(args.connect_ms, args.result_ms, (args.drop_min_s, args.drop_max_s), args.idle_timeout_s,
+                        args.refuse_ratio, seed=args.seed)
+    url = await fake.start()
+    finals = []
+    answering = [0, 0]  # finals being answered, interims received meanwhile
+
+    async def on_transcript(is_final, text, confidence):
+        if not is_final:
+            answering[1] += answering[0] > 0
+            return
+        finals.append(text)
+        answering[0] += 1
+        try:
+            await asyncio.sleep(args.answer_ms / 1000)  # retrieval + LLM
+        finally:
+            answering[0] -= 1
+
+    options = dict(MODES[name])
+    options.setdefault("keepalive_s", args.keepalive_s)
+    stt = ResilientSTTService(on_transcript, asyncio.get_running_loop(), deepgram_connector("", url=url, options={}),
+                              backoff_s=0.1, **options)
+    if not await stt.start():
+        raise SystemExit("could not connect to the fake server")
+
+    expected = []
+    chunk = FRAME * 2
+    frame_s = FRAME / 16000 / args.speed
+    started = time.perf_counter()
+    sent_s = 0.0
+    for index in range(args.utterances):
+        audio, words = utterance_audio(index)
+        expected += words
+        for offset in range(0, len(audio), chunk):
+            await stt.send_audio(audio[offset:offset + chunk])
+            sent_s += frame_s
+            await asyncio.sleep(max(0.0, sent_s - (time.perf_counter() - started)))
+        if index % 10 == 9:
+            await asyncio.sleep(args.pause_s)  # VAD gate: nothing goes upstream
+            started, sent_s = time.perf_counter(), 0.0
+    await asyncio.sleep(args.result_ms / 1000 + 1.0)
+    await stt.stop()
+    await fake.stop()
+
+    heard = " ".join(finals).split()
+    counts = {word: heard.count(word) for word in set(heard)}
+    recognized = sum(1 for word in expected if counts.get(word))
+    stats = stt.stats()
+    return {
+        "mode": name,
+        "words": len(expected),
+        "recall": recognized / len(expected),
+        "lost_words": len(expected) - recognized,
+        "duplicated_words": sum(c - 1 for c in counts.values() if c > 1),
+        "interims_while_answering": answering[1],
+        "stt": stats,
+        "server": fake.counters,
+    }
+
+
+async def run_all(args):
+    return [await run_mode(name, args) for name in MODES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--utterances", type=int, default=40)
+    parser.add_argument("--speed", type=float, default=4.0, help="audio pace (x real time)")
+    parser.add_argument("--pause-s", type=float, default=3.0, help="silence without audio every 10 utterances")
+    parser.add_argument("--connect-ms", type=float, default=300)
+    parser.add_argument("--result-ms", type=float, default=150)
+    parser.add_argument("--drop-min-s", type=float, default=4.0, help="stream cut after this much audio ...")
+    parser.add_argument("--drop-max-s", type=float, default=10.0, help="... up to this much")
+    parser.add_argument("--idle-timeout-s", type=float, default=2.0, help="server closes streams without data")
+    parser.add_argument("--keepalive-s", type=float, default=1.0)
+    parser.add_argument("--answer-ms", type=float, default=1000, help="time the callback spends on each final")
+    parser.add_argument("--refuse-ratio", type=float, default=0.2, help="share of handshakes refused with 503")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_results_stt.json")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.ERROR)
+
+    results = asyncio.run(run_all(args))
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "args": vars(args), "results": results}, f, indent=2)
+
+    print(f"\n{args.utterances} utterances ({results[0]['words']} words) at {args.speed:.0f}x, streams cut after "
+          f"{args.drop_min_s:.0f}-{args.drop_max_s:.0f} s of audio, {args.connect_ms:.0f} ms handshakes "
+          f"({args.refuse_ratio * 100:.0f}% refused)")
+    print(f"{'mode':>10}{'recall':>8}{'lost':>6}{'dup':>5}{'drops':>7}{'standby':>9}{'cold':>6}"
+          f"{'reconnect p50':>15}{'max':>7}{'replayed KB':>13}{'keepalives':>12}{'mid-answer':>12}")
+    for r in results:
+        s = r["stt"]
+        rec = s["reconnect_ms"]
+        p50 = f"{rec['p50']:.0f}" if rec["count"] else "-"
+        worst = f"{rec['max']:.0f}" if rec["count"] else "-"
+        print(f"{r['mode']:>10}{r['recall'] * 100:7.1f}%{r['lost_words']:>6}{r['duplicated_words']:>5}{s['drops']:>7}"
+              f"{s['promotions']:>9}{s['reconnects']:>6}{p50:>15}{worst:>7}{s['replayed_bytes'] / 1024:13.0f}"
+              f"{s['keepalives']:>12}{r['interims_while_answering']:>12}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Offline check of the local VAD on a recorded WAV.
+
+Pads the recording with silence (optionally mixed with white noise) on both
+sides, runs it through EnergyVAD in mic-sized buffers with a simulated clock,
+and prints the detected speech segments, the share of upstream audio the gate
+would have saved, and the per-frame processing cost.
+
+    python bench_vad.py --wav test_output.wav --pad-ms 2000 --noise 60
+"""
+import argparse
+import time
+import wave
+
+import numpy as np
+
+from utils.vad import EnergyVAD
+
+
+def load_padded(path, pad_ms, noise, seed=7):
+    with wave.open(path, "rb") as wf:
+        rate = wf.getframerate()
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected mono 16-bit audio")
+        speech = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    pad = np.zeros(int(rate * pad_ms / 1000), dtype=np.int16)
+    audio = np.concatenate([pad, speech, pad]).astype(np.float32)
+    if noise:
+        audio += np.random.default_rng(seed).normal(0, noise, len(audio))
+    return np.clip(audio, -32768, 32767).astype(np.int16).tobytes(), rate, len(pad) / rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", default="test_output.wav")
+    parser.add_argument("--pad-ms", type=float, default=2000, help="silence added before and after the speech")
+    parser.add_argument("--noise", type=float, default=0.0, help="white noise RMS mixed into the whole signal")
+    parser.add_argument("--chunk", type=int, default=8000, help="samples per mic buffer")
+    parser.add_argument("--hangover-ms", type=int, default=600)
+    args = parser.parse_args()
+
+    audio, rate, speech_start = load_padded(args.wav, args.pad_ms, args.noise)
+    vad = EnergyVAD(sample_rate=rate, hangover_ms=args.hangover_ms)
+    step = args.chunk * 2
+    segments = []
+    started = None
+    cost = 0.0
+    for offset in range(0, len(audio), step):
+        buf = audio[offset:offset + step]
+        clock = (offset + len(buf)) / 2 / rate  # audio time at the end of this buffer
+        t0 = time.perf_counter()
+        vad.process(buf, now=clock)
+        cost += time.perf_counter() - t0
+        if vad.in_speech and started is None:
+            started = vad.speech_started_at
+        elif not vad.in_speech and started is not None:
+            segments.append((started, vad.speech_ended_at))
+            started = None
+    if started is not None:
+        segments.append((started, None))
+
+    frames = len(audio) // vad.frame_bytes
+    stats = vad.stats()
+    print(f"audio: {len(audio) / 2 / rate:.2f} s, speech starts at {speech_start:.2f} s, noise rms {args.noise:g}")
+    for start, end in segments:
+        end_txt = f"{end:6.2f} s" if end is not None else "   (open)"
+        print(f"  speech {start:6.2f} s -> {end_txt}")
+    print(f"upstream bytes: {stats['bytes_in']} in, {stats['bytes_sent']} sent, "
+          f"{stats['saved_ratio'] * 100:.1f}% saved")
+    print(f"cost: {cost / max(1, frames) * 1e6:.1f} us per {vad.frame_s * 1000:.0f} ms frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark of the memory-mapped directory vector index (services/vector_index.py).
+
+Writes a synthetic directory of N startup records to a temp dir and measures,
+per N: full build time, incremental rebuild after ~1% of entries change,
+cold-start load time (meta.json + mmap), query latency for single queries and
+batches of 16, index size, process RSS, and int8 top-3 agreement with float32.
+If chromadb is importable the same vectors go into an in-memory collection for
+a load/query comparison; otherwise that part is skipped.
+
+Uses the hashed embedder by default so it runs without a model; --model runs
+the sentence-transformers model instead (query embedding time is then excluded,
+both paths get the same precomputed query vectors).
+
+    python bench_vector_index.py --entries 500 5000 50000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from services.vector_index import HashedEmbedder, SentenceTransformerEmbedder, VectorIndex, build
+from utils.latency_stats import summarize
+
+SECTORS = ["healthcare", "energy", "robotics", "drones", "fintech", "agritech", "battery", "semiconductors",
+           "water", "mobility", "edtech", "biotech", "climate", "logistics", "manufacturing", "space"]
+WORDS = ["sensor", "platform", "analytics", "vision", "storage", "charging", "diagnostics", "imaging",
+         "satellite", "grid", "learning", "wearable", "inspection", "irrigation", "payments", "materials"]
+
+
+def synthetic_directory(n, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        sector = rng.choice(SECTORS)
+        records.append({
+            "name": f"Startup {i:05d}",
+            "sector": sector,
+            "description": f"{sector} company building {' '.join(rng.sample(WORDS, 4))} products",
+            "founders": [f"Founder {rng.randrange(10000)}"],
+        })
+    return records
+
+
+def write_json(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def timed_queries(fn, queries, batch):
+    ms = []
+    for i in range(0, len(queries) - batch + 1, batch):
+        t0 = time.perf_counter()
+        fn(queries[i:i + batch])
+        ms.append((time.perf_counter() - t0) * 1000)
+    return summarize(ms)
+
+
+def recall_at_k(reference, candidate):
+    agree = [len({r for r, _ in a} & {r for r, _ in b}) / max(1, len(a)) for a, b in zip(reference, candidate)]
+    return sum(agree) / len(agree) if agree else 0.0
+
+
+def bench_chroma(vectors, queries, k):
+    try:
+        import chromadb
+    except ImportError:
+        return {"skipped": "chromadb not installed"}
+    t0 = time.perf_counter()
+    client = chromadb.Client()
+    collection = client.create_collection(f"bench_{time.time_ns()}", metadata={"hnsw:space": "cosine"})
+    ids = [str(i) for i in range(len(vectors))]
+    for start in range(0, len(ids), 5000):
+        collection.add(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000].tolist())
+    load_ms = (time.perf_counter() - t0) * 1000
+    query = lambda batch: collection.query(query_embeddings=batch.tolist(), n_results=k)
+    return {"load_ms": load_ms, "query_1_ms": timed_queries(query, queries, 1),
+            "query_16_ms": timed_queries(query, queries, 16)}
+
+
+def run_level(args, n, embedder, workdir):
+    directory = os.path.join(workdir, f"directory_{n}.json")
+    index_dir = os.path.join(workdir, f"index_{n}")
+    records = synthetic_directory(n)
+    write_json(directory, records)
+
+    full = build(directory, index_dir, embedder, int8=True)
+
+    changed = max(1, n // 100)
+    for i in random.Random(1).sample(range(n), changed):
+        records[i]["description"] += " (updated)"
+    write_json(directory, records)
+    incremental = build(directory, index_dir, embedder, int8=True)
+
+    t0 = time.perf_counter()
+    index = VectorIndex.load(index_dir)
+    load_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    index8 = VectorIndex.load(index_dir, int8=True)
+    load8_ms = (time.perf_counter() - t0) * 1000
+
+    query_texts = [f"{random.Random(q).choice(SECTORS)} {' '.join(random.Random(q).sample(WORDS, 2))}"
+                   for q in range(args.queries)]
+    queries = embedder.encode(query_texts)
+    index.search(queries[:1], args.k)  # page the vectors in before timing
+    index8.search(queries[:1], args.k)
+    exact = index.search(queries, args.k)
+
+    return {
+        "entries": n,
+        "build_s": full["seconds"],
+        "incremental": {"changed": changed, "embedded": incremental["embedded"], "seconds": incremental["seconds"]},
+        "float32": {"load_ms": load_ms, "mb": index.nbytes / 1e6,
+                    "query_1_ms": timed_queries(lambda b: index.search(b, args.k), queries, 1),
+                    "query_16_ms": timed_queries(lambda b: index.search(b, args.k), queries, 16)},
+        "int8": {"load_ms": load8_ms, "mb": index8.nbytes / 1e6,
+                 "query_1_ms": timed_queries(lambda b: index8.search(b, args.k), queries, 1),
+                 "query_16_ms": timed_queries(lambda b: index8.search(b, args.k), queries, 16),
+                 f"recall_at_{args.k}": recall_at_k(exact, index8.search(queries, args.k))},
+        "chroma": bench_chroma(np.asarray(index.vectors), queries, args.k) if not args.no_chroma else {"skipped": "--no-chroma"},
+        "rss_mb": rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="+", default=[500, 5000, 50000])
+    parser.add_argument("--queries", type=int, default=320)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--model", default=None, help="sentence-transformers model (default: hashed embeddings)")
+    parser.add_argument("--no-chroma", action="store_true")
+    parser.add_argument("--output", default="bench_results_vector_index.json")
+    args = parser.parse_args()
+
+    embedder = SentenceTransformerEmbedder(name=args.model) if args.model else HashedEmbedder()
+    workdir = tempfile.mkdtemp(prefix="bench_vector_index_")
+    try:
+        levels = [run_level(args, n, embedder, workdir) for n in args.entries]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "embedder": embedder.name, "levels": levels}, f, indent=2)
+
+    print(f"\nEmbedder: {embedder.name}")
+    print(f"{'entries':>8}{'build s':>9}{'incr s':>8}{'load ms':>9}{'MB':>7}{'q1 p50':>8}{'p99':>7}"
+          f"{'q16 p50':>9}{'p99':>7}   int8:{'MB':>6}{'q1 p50':>8}{'recall':>8}")
+    for level in levels:
+        f32, i8 = level["float32"], level["int8"]
+        print(f"{level['entries']:>8}{level['build_s']:9.2f}{level['incremental']['seconds']:8.2f}"
+              f"{f32['load_ms']:9.2f}{f32['mb']:7.1f}{f32['query_1_ms']['p50']:8.3f}{f32['query_1_ms']['p99']:7.3f}"
+              f"{f32['query_16_ms']['p50']:9.3f}{f32['query_16_ms']['p99']:7.3f}        "
+              f"{i8['mb']:6.1f}{i8['query_1_ms']['p50']:8.3f}{i8[f'recall_at_{args.k}']:8.3f}")
+        chroma = level["chroma"]
+        if "skipped" in chroma:
+            print(f"{'':>8}Chroma comparison skipped ({chroma['skipped']})")
+        else:
+            print(f"{'':>8}Chroma: load {chroma['load_ms']:.1f} ms, q1 p50 {chroma['query_1_ms']['p50']:.3f} ms, "
+                  f"q16 p50 {chroma['query_16_ms']['p50']:.3f} ms")
+    print(f"Peak RSS {levels[-1]['rss_mb']:.0f} MB\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
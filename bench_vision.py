@@ -0,0 +1,208 @@
+"""
+Offline benchmark of the webcam presence trigger (utils/presence.py).
+
+Replays a recorded video (--video, needs OpenCV; the Haar cascade is used) or,
+by default, a synthetic 640x480 scene: a static, noisy room; a visitor's face
+appears at 3 s and leaves at 9 s, comes back from 13 s to 17 s, and a
+non-face object moves across the frame from 20 s to 22 s. The synthetic scene
+uses a small integral-image face stand-in whose cost grows with pixel count
+like a cascade's does.
+
+Per mode it reports CPU time per frame (this thread's only, detection + resize),
+detector calls, trigger times, trigger latency from the face's first frame
+(ground truth for the synthetic scene, the first full-resolution detection
+for a video) and false triggers:
+
+    baseline   full-resolution detection on every frame (the original loop)
+    downscale  320 px grayscale, detection every frame
+    adaptive   320 px + motion gate + ROI tracking + CPU budget
+
+    python bench_vision.py                       # synthetic scene
+    python bench_vision.py --video lobby.mp4     # recorded video, Haar cascade
+"""
+import argparse
+import json
+import platform
+import time
+
+import numpy as np
+
+from utils.presence import AdaptivePresenceDetector, MotionGate, PresenceDebouncer, downscale_gray
+
+VISITS = [(3.0, 9.0), (13.0, 17.0)]   # synthetic face on screen (s)
+DISTRACTOR = (20.0, 22.0)             # synthetic non-face motion (s)
+
+
+class SyntheticFaceDetector:
+    """Bright square with two dark "eyes", found like a cascade scans: every window size from
+    `min_size` up to the image, growing by `scale_factor`, over an integral image."""
+
+    def __init__(self, min_size=24, scale_factor=1.1, stride=0.05):
+        self.min_size = min_size
+        self.scale_factor = scale_factor
+        self.stride = stride  # step as a share of the window
+
+    def detect(self, gray):
+        h, w = gray.shape
+        ii = np.pad(gray.astype(np.int64).cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+
+        def box_sums(y, x, size_y, size_x):
+            return ii[y + size_y, x + size_x] - ii[y, x + size_x] - ii[y + size_y, x] + ii[y, x]
+
+        best = None
+        s = self.min_size
+        while s <= min(h, w):
+            step = max(1, int(s * self.stride))
+            ys, xs = np.meshgrid(np.arange(0, h - s + 1, step), np.arange(0, w - s + 1, step), indexing="ij")
+            face = box_sums(ys, xs, s, s) / (s * s)
+            e = s // 5
+            left = box_sums(ys + s // 4, xs + s // 5, e, e) / (e * e)
+            right = box_sums(ys + s // 4, xs + 3 * s // 5, e, e) / (e * e)
+            hits = np.argwhere((face > 140) & (left < 90) & (right < 90))
+            if len(hits):
+                i, j = hits[0]
+                best = (int(xs[i, j]), int(ys[i, j]), s, s)
+            s = int(s * self.scale_factor) + 1
+        return [best] if best else []
+
+
+def synthetic_frames(seconds, fps, width=640, height=480, seed=3):
+    rng = np.random.default_rng(seed)
+    room = rng.integers(30, 110, (height // 16, width // 16), dtype=np.uint8)
+    room = np.kron(room, np.ones((16, 16), dtype=np.uint8))
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        frame = room + rng.integers(0, 6, room.shape, dtype=np.uint8)  # sensor noise
+        face = any(a <= t < b for a, b in VISITS)
+        if face:
+            s = 150
+            x = int(width / 2 - s / 2 + 20 * np.sin(t * 2))  # visitors sway a little
+            y = height // 3 - s // 2
+            frame[y:y + s, x:x + s] = 200
+            e = s // 5
+            frame[y + s // 4:y + s // 4 + e, x + s // 5:x + s // 5 + e] = 40
+            frame[y + s // 4:y + s // 4 + e, x + 3 * s // 5:x + 3 * s // 5 + e] = 40
+        if DISTRACTOR[0] <= t < DISTRACTOR[1]:
+            x = int((t - DISTRACTOR[0]) / (DISTRACTOR[1] - DISTRACTOR[0]) * (width - 120))
+            frame[300:420, x:x + 120] = 230
+        yield t, np.repeat(frame[..., None], 3, axis=2), face
+
+
+def video_frames(path, fps_override=None):
+    import cv2
+    capture = cv2.VideoCapture(path)
+    fps = fps_override or capture.get(cv2.CAP_PROP_FPS) or 15.0
+    i = 0
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        yield i / fps, frame, None
+        i += 1
+    capture.release()
+
+
+class Baseline:
+    """The original loop: full-resolution grayscale detection on every frame."""
+
+    def __init__(self, detector, width=10_000):
+        self.detector = detector
+        self.width = width
+        self.counters = {"frames": 0, "detections": 0, "frame_ms": 0.0}
+
+    def process(self, frame):
+        started = time.thread_time()
+        gray, _ = downscale_gray(frame, self.width)
+        present = len(self.detector.detect(gray)) > 0
+        self.counters["frames"] += 1
+        self.counters["detections"] += 1
+        self.counters["frame_ms"] += (time.thread_time() - started) * 1000
+        return present
+
+    def stats(self):
+        return {"cpu_ms_per_frame": self.counters["frame_ms"] / max(1, self.counters["frames"]),
+                "detections": self.counters["detections"]}
+
+
+def run_mode(name, detector_factory, frames, args):
+    if name == "baseline":
+        model = Baseline(detector_factory())
+    elif name == "downscale":
+        model = AdaptivePresenceDetector(detector_factory(), width=args.width, fps=args.fps, cpu_budget=0,
+                                         motion=MotionGate(threshold=0.0))
+    else:
+        model = AdaptivePresenceDetector(detector_factory(), width=args.width, fps=args.fps,
+                                         cpu_budget=args.cpu_budget)
+    debouncer = PresenceDebouncer(args.hold_s, args.leave_s)
+    triggers, first_seen = [], None
+    for t, frame, _ in frames():
+        present = model.process(frame)
+        if present and first_seen is None:
+            first_seen = t
+        if debouncer.update(present, t):
+            triggers.append(t)
+    stats = model.stats()
+    detections = stats.get("detections", stats.get("full_detections", 0) + stats.get("roi_detections", 0))
+    return {"mode": name, "cpu_ms_per_frame": stats["cpu_ms_per_frame"], "detections": detections,
+            "frames": model.counters["frames"], "triggers": triggers, "first_seen": first_seen,
+            "stats": stats}
+
+
+def score(result, onsets, frame_s):
+    """Trigger latency per visit from its onset, and triggers that fall outside any visit."""
+    latencies, false = [], 0
+    for t in result["triggers"]:
+        visit = [a for a, b in onsets if a <= t <= b + frame_s]
+        if visit:
+            latencies.append((t - visit[-1]) * 1000)
+        else:
+            false += 1
+    result["trigger_latency_ms"] = latencies
+    result["false_triggers"] = false
+    result["missed_visits"] = len(onsets) - len(latencies)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=None, help="recorded video (needs OpenCV); default: synthetic scene")
+    parser.add_argument("--seconds", type=float, default=25.0, help="length of the synthetic scene")
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--width", type=int, default=320, help="detection resolution for the downscaled modes")
+    parser.add_argument("--cpu-budget", type=float, default=0.1, help="share of one core for detection")
+    parser.add_argument("--hold-s", type=float, default=2.0)
+    parser.add_argument("--leave-s", type=float, default=3.0)
+    parser.add_argument("--output", default="bench_results_vision.json")
+    args = parser.parse_args()
+
+    if args.video:
+        from services.vision_service import HaarFaceDetector
+        detector_factory = HaarFaceDetector
+        frames = lambda: video_frames(args.video, args.fps)
+    else:
+        detector_factory = SyntheticFaceDetector
+        frames = lambda: synthetic_frames(args.seconds, args.fps)
+
+    results = [run_mode(name, detector_factory, frames, args) for name in ("baseline", "downscale", "adaptive")]
+    # Ground truth: the synthetic script, or the baseline's first detection for a recorded video
+    onsets = VISITS if not args.video else [(results[0]["first_seen"], float("inf"))] if results[0]["first_seen"] is not None else []
+    for result in results:
+        score(result, onsets, 1.0 / args.fps)
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "source": args.video or "synthetic", "fps": args.fps, "results": results}, f, indent=2)
+
+    frame_ms = 1000.0 / args.fps
+    print(f"\nSource: {args.video or 'synthetic scene'} at {args.fps:.0f} fps "
+          f"({len(onsets)} visit(s), hold {args.hold_s:.1f} s)")
+    print(f"{'mode':>10}{'CPU ms/frame':>14}{'% core':>8}{'detections':>12}{'trigger latency ms':>22}{'false':>7}{'missed':>8}")
+    for r in results:
+        latency = ", ".join(f"{ms:.0f}" for ms in r["trigger_latency_ms"]) or "-"
+        print(f"{r['mode']:>10}{r['cpu_ms_per_frame']:14.3f}{r['cpu_ms_per_frame'] / frame_ms * 100:7.1f}%"
+              f"{r['detections']:>12}{latency:>22}{r['false_triggers']:>7}{r['missed_visits']:>8}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,316 @@
 import asyncio
 import logging
+import os
 import time
 import queue
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-from utils.audio_utils import AudioStream
-from services.stt_service import STTService
-from services.rag_engine import RAGEngine
-from services.llm_service import LLMService
-from services.tts_service import TTSService
-from services.vision_service import VisionService
+from services.async_rag import AsyncRAGEngine
+from services.provider_router import HedgedLLM, HedgedTTS, ProviderRouter
+from utils.answer_cache import AnswerCache, context_key
+from utils.audio_cache import AudioCache, CachedTTSService
+from utils.barge_in import BargeInDetector
+from utils.diagnostics import LoopMonitor, SamplingProfiler
+from utils.fast_path import FastPath
+from utils.idle_mode import ACTIVE, IDLE, WAKING, IdleStateMachine
+from utils.jitter_buffer import FormatConverter, PlayoutBuffer, parse_format
+from utils.playback import END_OF_STREAM, PlaybackWorker, silence
+from utils.prompt_builder import ConversationMemory, Prompt, PromptBuilder
+from utils.ring_buffer import AudioRingBuffer
+from utils.segmenter import SentenceSegmenter
+from utils.speculation import SpeculativePrefetcher
+from utils.startup import Startup, StartupError
+from utils.tracing import Tracer
+from utils.vad import EnergyVAD
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("Main")
 
+# Playback tuning
+OUTPUT_SAMPLE_RATE = int(os.getenv("OUTPUT_SAMPLE_RATE", "16000"))
+SENTENCE_GAP_MS = int(os.getenv("SENTENCE_GAP_MS", "200"))    # silence inserted between sentences
+SPEAKING_TAIL_MS = int(os.getenv("SPEAKING_TAIL_MS", "500"))  # mic stays muted this long after playback
+PLAYBACK_QUEUE_CHUNKS = 64  # bound on how far synthesis may run ahead of the speaker
+TTS_OUTPUT_FORMAT = os.getenv("TTS_OUTPUT_FORMAT", "")  # pcm_<rate> / ulaw_<rate>; "" = the TTS client's format
+# Output jitter buffer: the prebuffer adapts to how unevenly TTS chunks arrive
+JITTER_MIN_MS = int(os.getenv("JITTER_MIN_MS", "40"))
+JITTER_MAX_MS = int(os.getenv("JITTER_MAX_MS", "600"))
+OUTPUT_TARGET_RMS = float(os.getenv("OUTPUT_TARGET_RMS", "0"))  # opt-in gain normalization toward this RMS, e.g. 3000 (0 = off)
+
+# Sentence segmentation: optionally cut the first chunk of each answer early to reduce TTFA
+FIRST_CHUNK_WORDS = int(os.getenv("FIRST_CHUNK_WORDS", "0"))          # 0 = off
+FIRST_CHUNK_CLAUSE = os.getenv("FIRST_CHUNK_CLAUSE", "0") == "1"     # cut at the first , ; :
+
+# Synthesized-audio cache for fixed/frequent utterances
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("cache", "tts"))
+TTS_CACHE_MB = int(os.getenv("TTS_CACHE_MB", "64"))
+TTS_PREWARM_FILE = os.getenv("TTS_PREWARM_FILE", os.path.join("data", "tts_prewarm.txt"))  # one phrase per line
+
+GREETING_TEXT = "Hello! Welcome to the IITM Research Park. I am the Director's AI assistant. How can I guide you today?"
+
+# Semantic answer cache: replay stored answers for near-identical questions over the same entries
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL_S = int(os.getenv("ANSWER_CACHE_TTL_S", "3600"))
+
+# Precomputed, memory-mapped directory embeddings (python -m services.vector_index build); rebuilt if stale.
+# Opt-in: RAGEngine loads its ChromaDB collection regardless, so turning this on keeps both in memory
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "")  # "" = engine's ChromaDB search; e.g. cache/vector_index
+VECTOR_INDEX_INT8 = os.getenv("VECTOR_INDEX_INT8", "0") == "1"  # 4x smaller vectors, ~same top-3
+# Fuse semantic hits with BM25 + fuzzy startup-name matches (STT mangles proper nouns)
+LEXICAL_SEARCH = os.getenv("LEXICAL_SEARCH", "1") == "1"
+
+# Directory fast path: "what does X do" / "who founded X" / "where is X's office" answered from the record,
+# without the LLM, when exactly one startup name matches this confidently (needs LEXICAL_SEARCH)
+FAST_PATH = os.getenv("FAST_PATH", "1") == "1"
+FAST_PATH_MIN_SCORE = float(os.getenv("FAST_PATH_MIN_SCORE", "0.85"))
+
+# Prompt assembly: stable persona prefix + per-turn history and entries packed into a token budget
+PROMPT_BUDGET_TOKENS = int(os.getenv("PROMPT_BUDGET_TOKENS", "1200"))  # 0 = raw retriever context, no history
+PROMPT_HISTORY_TOKENS = int(os.getenv("PROMPT_HISTORY_TOKENS", "250"))  # share of the budget for the conversation
+PROMPT_HISTORY_TURNS = int(os.getenv("PROMPT_HISTORY_TURNS", "2"))      # exchanges kept verbatim; older ones folded
+
+# Mic ingress: small PortAudio frames into a ring buffer, drained by one async task
+INPUT_SAMPLE_RATE = 16000
+MIC_FRAME_MS = int(os.getenv("MIC_FRAME_MS", "20"))        # 20-40 ms; test_mic.py's 8000-sample chunk was 500 ms
+MIC_RING_MS = int(os.getenv("MIC_RING_MS", "2000"))        # audio the ring holds before overwriting the oldest
+MIC_COALESCE_MS = int(os.getenv("MIC_COALESCE_MS", "200"))  # max audio per STT send when catching up
+
+# Local VAD on the mic path: "off", "measure" (timestamp end of speech only) or "gate" (drop silence before STT)
+VAD_MODE = os.getenv("VAD_MODE", "measure")
+STT_KEEPALIVE_S = 5.0  # while gating, send a short silence frame this often so the STT socket stays open
+
+# STT client: "resilient" (Deepgram WebSocket with hot standby, keepalives and replay after a drop) or "sdk"
+STT_CLIENT = os.getenv("STT_CLIENT", "resilient")
+STT_STANDBY = os.getenv("STT_STANDBY", "1") == "1"            # second connection kept open for fail-over
+STT_REPLAY_S = float(os.getenv("STT_REPLAY_S", "30"))         # max audio kept since the last final transcript
+
+# Per-turn latency tracing: JSONL trace per turn, rolling p50/p95/p99 per stage in Prometheus text format
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join("logs", "turns.jsonl"))    # "" = off
+METRICS_FILE = os.getenv("METRICS_FILE", os.path.join("logs", "metrics.prom"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))                           # 0 = no HTTP endpoint
+TRACE_WINDOW_S = int(os.getenv("TRACE_WINDOW_S", "3600"))                    # rolling percentile window
+
+# Diagnostics: "off", "stalls" (loop-lag monitor with stack capture) or "profile" (stalls + sampling profiler)
+DIAGNOSTICS = os.getenv("DIAGNOSTICS", "off")
+LOOP_STALL_MS = int(os.getenv("LOOP_STALL_MS", "100"))     # loop blocked this long -> capture the stack
+PROFILE_INTERVAL_MS = int(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_FILE = os.getenv("PROFILE_FILE", os.path.join("logs", "profile.folded"))  # flamegraph.pl / speedscope input
+
+# Start-up: build services and open connections concurrently; warn if the kiosk isn't ready within the budget
+STARTUP_PARALLEL = os.getenv("STARTUP_PARALLEL", "1") == "1"
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_S", "15"))
+WARMUP_QUERY = "Which startups are at the IITM Research Park?"
+TTS_WARMUP_TEXT = "Hi."  # synthesized (first chunk only) to open the TTS connection on wake-up
+
+# Webcam presence trigger: downscaled frames, motion gating and ROI tracking within a CPU budget
+VISION_WIDTH = int(os.getenv("VISION_WIDTH", "320"))                 # detection resolution (px wide)
+VISION_FPS = float(os.getenv("VISION_FPS", "10"))
+VISION_CPU_BUDGET = float(os.getenv("VISION_CPU_BUDGET", "0.1"))     # share of one core for face detection
+VISION_PROCESS = os.getenv("VISION_PROCESS", "0") == "1"             # run OpenCV in a separate process
+
+# Presence-driven idle mode: "off", "pause" (no mic audio upstream while nobody is at the kiosk; STT kept
+# alive) or "disconnect" (also close the STT socket). A face, or local speech (needs VAD_MODE), wakes it.
+IDLE_MODE = os.getenv("IDLE_MODE", "off")
+IDLE_AFTER_S = float(os.getenv("IDLE_AFTER_S", "30"))            # nobody seen, nothing said this long -> idle
+IDLE_DISCONNECT_S = float(os.getenv("IDLE_DISCONNECT_S", "60"))  # "disconnect": time idle before closing STT
+IDLE_PREROLL_MS = int(os.getenv("IDLE_PREROLL_MS", "1500"))      # idle audio kept for the first words
+VISION_IDLE_FPS = float(os.getenv("VISION_IDLE_FPS", "2"))
+
+# Barge-in: let the visitor interrupt a long answer
+BARGE_IN = os.getenv("BARGE_IN", "0") == "1"
+# A barge-in (maybe a cough or a door) that no transcript follows for this long re-mutes the mic during playback
+BARGE_IN_TIMEOUT_S = float(os.getenv("BARGE_IN_TIMEOUT_S", "4"))
+
+# Speculative work on interim transcripts: "off", "rag" (retrieval only) or "llm" (retrieval + generation)
+SPECULATION = os.getenv("SPECULATION", "off")
+
+# Hedged requests: "off", "llm", "tts" or "both". A second request goes to the alternate provider when the
+# first hasn't produced a token / audio chunk by its recent HEDGE_PCT-th percentile; the slower one is cancelled
+HEDGE = os.getenv("HEDGE", "off")
+HEDGE_PCT = float(os.getenv("HEDGE_PCT", "90"))
+HEDGE_MIN_MS = float(os.getenv("HEDGE_MIN_MS", "150"))  # never hedge sooner than this
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL", "")      # alternate model ("" = a second request to the same one)
+
+class LiveServices:
+    """Builds the real mic/speaker/network services.
+    Imports are local so benchmark mode (services.local_services) runs without PyAudio or API SDKs."""
+
+    def audio_stream(self):
+        from utils.audio_utils import AudioStream
+        return AudioStream()
+
+    def rag_engine(self):
+        from services.rag_engine import RAGEngine
+        return RAGEngine()
+
+    def llm(self, token_callback):
+        from services.llm_service import LLMService
+        return LLMService(token_callback)
+
+    def tts(self):
+        from services.tts_service import TTSService
+        return TTSService()
+
+    def alternate_llm(self, token_callback):
+        from services.llm_service import LLMService
+        if LLM_HEDGE_MODEL:
+            try:
+                return LLMService(token_callback, model_name=LLM_HEDGE_MODEL)
+            except TypeError:
+                logger.warning("LLMService takes no model_name; hedging to the same model")
+        return LLMService(token_callback)
+
+    def alternate_tts(self):
+        from services.tts_service import TTSService
+        return TTSService()  # its own connection, same voice and output format
+
+    def stt(self, transcription_callback, loop):
+        if STT_CLIENT == "resilient":
+            from services.resilient_stt import ResilientSTTService, deepgram_connector
+            return ResilientSTTService(transcription_callback, loop, deepgram_connector(os.getenv("DEEPGRAM_API_KEY")),
+                                       standby=STT_STANDBY, keepalive_s=STT_KEEPALIVE_S, replay_limit_s=STT_REPLAY_S)
+        from services.stt_service import STTService
+        return STTService(transcription_callback, loop)
+
+    def vision(self, trigger_callback, presence_callback=None):
+        from services.vision_service import VisionService
+        return VisionService(trigger_callback, width=VISION_WIDTH, fps=VISION_FPS, cpu_budget=VISION_CPU_BUDGET,
+                             process=VISION_PROCESS, presence_callback=presence_callback)
+
 class S2SPipeline:
-    def __init__(self, loop):
+    def __init__(self, loop, services=None, shared=None, startup=None):
+        """`shared` (server mode) supplies process-wide .rag, .tts_cache and .answer_cache instead of per-pipeline ones.
+        `startup` replaces the default Startup (timeline measured from process start)."""
         self.loop = loop
-        self.audio_stream = AudioStream()
-        self.rag_engine = RAGEngine()
-        self.model = LLMService(self.handle_llm_token)
-        self.tts = TTSService()
-        self.stt = STTService(self.handle_transcription, self.loop)
+        services = services or LiveServices()
+        
+        # Independent services are built concurrently (model load, SDK imports and clients overlap)
+        self.startup = startup or Startup(STARTUP_BUDGET_S, parallel=STARTUP_PARALLEL)
+        init = self.startup
+        init.add("audio", services.audio_stream)
+        init.add("rag_engine", services.rag_engine)
+        # batched, off-loop front end with caches (opens the vector index, builds the lexical index)
+        init.add("rag", lambda: shared.rag if shared else AsyncRAGEngine(
+            init.results["rag_engine"], vector_index_dir=VECTOR_INDEX_DIR or None, int8=VECTOR_INDEX_INT8,
+            lexical=LEXICAL_SEARCH), after=["rag_engine"])
+        init.add("llm", lambda: self.build_llm(services, self.handle_llm_token))
+        tts_cache = shared.tts_cache if shared else AudioCache(TTS_CACHE_DIR, TTS_CACHE_MB * 1024 * 1024)
+        init.add("tts", lambda: CachedTTSService(self.build_tts(services), tts_cache))
+        init.add("stt", lambda: services.stt(self.handle_transcription, self.loop))
+        init.add("vision", lambda: services.vision(self.handle_vision_trigger, self.handle_presence))
+        built = init.run_sync("init")
+        self.audio_stream = built["audio"]
+        self.rag_engine = built["rag_engine"]
+        self.rag = built["rag"]
+        self.owns_rag = shared is None
+        
+        # Prompt assembly: the persona prefix goes to the LLM client once (and stays cacheable)
+        self.prompts = PromptBuilder(PROMPT_BUDGET_TOKENS, PROMPT_HISTORY_TOKENS) if PROMPT_BUDGET_TOKENS > 0 else None
+        self.memory = ConversationMemory(PROMPT_HISTORY_TURNS)
+        self.fast_path = None
+        if FAST_PATH and self.rag.lexical is not None:
+            self.fast_path = FastPath(self.rag.lexical, FAST_PATH_MIN_SCORE)
+        self.model = self.configure_llm(built["llm"])
+        self.tts = built["tts"]
+        self.stt = built["stt"]
+        self.vision = built["vision"]
         
-        # Vision Service
-        self.vision = VisionService(self.handle_vision_trigger)
+        self.speculation = None
+        if SPECULATION in ("rag", "llm"):
+            self.speculation = SpeculativePrefetcher(
+                self.retrieve,
+                llm_factory=(lambda callback: self.configure_llm(self.build_llm(services, callback)))
+                if SPECULATION == "llm" else None,
+            )
         
         self.tts_queue = asyncio.Queue()
-        self.playback_queue = queue.Queue()
+        self.segmenter = SentenceSegmenter(first_chunk_words=FIRST_CHUNK_WORDS, first_chunk_clause=FIRST_CHUNK_CLAUSE)
+        self.sentence_queue = asyncio.Queue()
+        self.playback_queue = queue.Queue(maxsize=PLAYBACK_QUEUE_CHUNKS)
+        self.tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="TTS")
+        self.player = None
+        self.output_stream = None
+        self.pending_sentences = 0
         
-        # Latency Metrics
-        self.metrics = {
-            "vad_detected": 0,
-            "stt_final": 0,
-            "ttft": 0, # Time to First Token
-            "ttfa": 0  # Time to First Audio
-        }
+        # Answer cache: finished answers (text + audio) of the current turn
+        if shared:
+            self.answer_cache = shared.answer_cache
+        else:
+            self.answer_cache = AnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_S) if ANSWER_CACHE else None
+        self.answer_key = None
+        self.turn_text = []
+        self.turn_audio = []
+        
+        # Local VAD / endpointing
+        self.vad = EnergyVAD() if VAD_MODE in ("measure", "gate") else None
+        self.vad_gate = VAD_MODE == "gate"
+        self.last_audio_sent = time.time()
+        self.keepalive_frame = silence(20, INPUT_SAMPLE_RATE)
+        
+        # Idle mode: while nobody is around, mic audio stays local (only the pre-roll is kept)
+        self.idle_mode = IDLE_MODE if IDLE_MODE in ("pause", "disconnect") else "off"
+        self.idle = IdleStateMachine(IDLE_AFTER_S, IDLE_DISCONNECT_S if self.idle_mode == "disconnect" else 0)
+        self.idle_preroll = deque()
+        self.idle_preroll_bytes = 0
+        self.idle_preroll_limit = int(INPUT_SAMPLE_RATE * IDLE_PREROLL_MS / 1000) * 2
+        self.wake_task = None
+        if self.idle_mode != "off" and self.vad is None:
+            logger.warning("IDLE_MODE without VAD_MODE: only a detected face wakes the kiosk")
+        
+        # Mic ingress: the PortAudio callback only writes into the ring; drain_mic does the rest
+        self.mic_frame_samples = int(INPUT_SAMPLE_RATE * MIC_FRAME_MS / 1000)
+        self.mic_ring = AudioRingBuffer(int(INPUT_SAMPLE_RATE * MIC_RING_MS / 1000) * 2)
+        self.mic_coalesce_bytes = int(INPUT_SAMPLE_RATE * MIC_COALESCE_MS / 1000) * 2
+        self.mic_ready = asyncio.Event()
+        self.mic_wakeup_pending = False
+        self.mic_callbacks = 0
+        self.mic_device_overflows = 0  # callbacks PortAudio flagged with a non-zero status
+        self.mic_sends = 0
+        self.tasks = []  # long-running consumer tasks, cancelled by stop()
+        
+        # Barge-in: turn_epoch invalidates everything queued for an interrupted answer
+        self.barge_in = BargeInDetector() if BARGE_IN else None
+        self.barged_in = False  # set from the mic thread; cleared by the next final, speech end or timeout
+        self.turn_epoch = 0
+        self.response_task = None
+        self.barge_in_latencies = deque(maxlen=1000)
+        self.tts_format = TTS_OUTPUT_FORMAT or self.tts.fmt or ""
+        try:
+            encoding, rate = parse_format(self.tts_format, OUTPUT_SAMPLE_RATE)
+        except ValueError as e:
+            logger.warning(f"{e}; playing TTS audio as-is")
+            self.tts_format, encoding, rate = "", "pcm", OUTPUT_SAMPLE_RATE
+        self.sentence_gap = silence(SENTENCE_GAP_MS, rate, encoding=encoding)  # same format as the TTS audio
+        
+        # Latency tracing: pending_trace collects mic/STT marks until the final transcript,
+        # trace is the turn being answered, last_trace the most recently finished one
+        self.tracer = Tracer(TRACE_FILE or None, METRICS_FILE or None, window_s=TRACE_WINDOW_S)
+        self.pending_trace = None
+        self.trace = None
+        self.last_trace = None
+        self.metrics_port = METRICS_PORT
+        if hasattr(self.stt, "on_reconnect"):
+            self.stt.on_reconnect = lambda ms: self.tracer.observe("stt_reconnect", ms)
+        self.on_turn = None  # optional callback(trace) for every finished turn (server mode forwards it)
+        
+        # Diagnostics (started in start() so they observe the running loop)
+        self.diagnostics = DIAGNOSTICS
+        self.profile_file = PROFILE_FILE
+        self.loop_monitor = None
+        self.profiler = None
         
         self.is_listening = False
-        self.is_speaking = False
+        self.show_metrics = True  # bench_pipeline.py turns the per-turn report off
     def handle_vision_trigger(self):
         """Called when a face is detected for 2+ seconds."""
         logger.info("Vision Trigger! Scheduling greeting.")
+        self.loop.call_soon_threadsafe(self.on_presence, True)
+        self.loop.call_soon_threadsafe(self.memory.reset)  # a new visitor: no earlier conversation
         
         # Verify we aren't already listening/speaking to avoid double trigger
         if self.is_speaking or self.is_listening_active_conversation: 
@@ -55,58 +322,139 @@ class S2SPipeline:
             lambda: asyncio.create_task(self.play_greeting())
         )
             
+    def handle_presence(self, present):
+        """Vision thread: a face first appeared (True) or the visitor left (False)."""
+        self.loop.call_soon_threadsafe(self.on_presence, present)
+
+    def on_presence(self, present):
+        self.idle.seen(present)
+        if present:
+            self.request_wake("face")
+
+    def request_wake(self, reason):
+        if self.idle_mode != "off" and self.idle.state == IDLE:
+            self.idle.enter(WAKING)
+            self.wake_task = asyncio.ensure_future(self.wake(reason))
+
+    async def wake(self, reason):
+        """Leaves idle: STT socket, LLM session (if the client has warmup()) and TTS connection are warmed
+        concurrently, so the first question after the greeting doesn't pay for connection set-up."""
+        started = time.perf_counter()
+        warm = Startup(parallel=True, t0=started)
+        if self.idle.stt_closed:
+            warm.add("stt_connect", self.stt.start)
+        if hasattr(self.model, "warmup"):
+            warm.add("llm_warmup", self.model.warmup, required=False)
+        if hasattr(self.tts, "warmup"):
+            warm.add("tts_warmup", self.tts.warmup, required=False)
+        else:
+            warm.add("tts_warmup", self.warm_tts_connection, required=False)
+        if hasattr(self.vision, "set_fps"):
+            self.vision.set_fps(VISION_FPS)
+        try:
+            await warm.run("wake")
+        except StartupError as e:
+            logger.error(f"Wake-up failed, staying idle: {e}")
+            self.idle.enter(IDLE)  # the next face or utterance retries
+            return
+        self.idle.stt_closed = False
+        ms = (time.perf_counter() - started) * 1000
+        self.idle.woke(reason, ms)
+        self.idle.enter(ACTIVE)
+        logger.info(f"Awake ({reason}) in {ms:.0f} ms")
+
+    def go_idle(self):
+        self.idle.enter(IDLE)
+        self.memory.reset()
+        if hasattr(self.vision, "set_fps"):
+            self.vision.set_fps(VISION_IDLE_FPS)
+        logger.info(f"Idle: nobody seen for {self.idle.idle_after_s:.0f} s, mic audio stays local")
+
+    async def watch_idle(self):
+        """Moves to idle when the kiosk has been unused long enough, and closes the STT socket later on."""
+        while self.is_listening:
+            await asyncio.sleep(0.25)
+            busy = self.is_speaking or (self.response_task is not None and not self.response_task.done())
+            if busy:
+                self.idle.activity()
+            if self.idle.should_idle(busy):
+                self.go_idle()
+            elif self.idle.should_disconnect():
+                self.idle.stt_closed = True
+                self.idle.counters["disconnects"] += 1
+                await self.stt.stop()
+                logger.info("Idle: STT connection closed")
+
     # Add a flag for 'active conversation' (listening is always true in loop, but we mean semantic listening)
     # For now, simplistic check:
     @property
     def is_listening_active_conversation(self):
         return self.is_speaking # Rough proxy to prevent self-interruption from greeting
 
+    @property
+    def is_speaking(self):
+        """True while sentences are being synthesized or audio is still playing."""
+        return self.pending_sentences > 0 or (self.player is not None and self.player.is_active())
+
     async def play_greeting(self):
         """Plays the welcome message."""
         if self.is_speaking:
             return
 
-        greeting_text = "Hello! Welcome to the IITM Research Park. I am the Director's AI assistant. How can I guide you today?"
+        greeting_text = GREETING_TEXT
         logger.info(f"Greeting User: {greeting_text}")
         
         try:
-            audio_generator = self.tts.text_to_audio_stream(greeting_text)
-            
-            self.is_speaking = True
-            # Open output stream if not already handled generally (it's opened in start())
-            
-            try:
-                for audio_chunk in audio_generator:
-                     if self.output_stream:
-                        self.output_stream.write(audio_chunk)
-            finally:
-                await asyncio.sleep(1.0)
-                self.is_speaking = False
+            # Synthesized on the TTS thread and played by the playback thread, like any reply
+            await self.queue_sentence(greeting_text, track_metrics=False)
         except Exception as e:
             logger.error(f"Error playing greeting: {e}")
 
     async def start(self):
         logger.info("Starting S2S Pipeline...")
         
-        # Start Output Stream (Running in background thread handled by PyAudio, feed via queue)
-        self.output_stream = self.audio_stream.start_output_stream()
-        
-        # Start STT
-        if not await self.stt.start():
+        # Speaker, STT socket, webcam and model warm-up open concurrently
+        self.startup.add("output", self.start_output)
+        self.startup.add("stt_connect", self.stt.start)
+        self.startup.add("vision_start", self.vision.start, required=False)
+        self.startup.add("rag_warmup", self.warm_rag, required=False)
+        if hasattr(self.model, "warmup"):
+            self.startup.add("llm_warmup", self.model.warmup, required=False)
+        try:
+            opened = await self.startup.run("start")
+        except StartupError as e:
+            logger.error(f"Start-up failed: {e}")
+            opened = {}
+        if not opened.get("stt_connect"):
             logger.error("Could not start STT. Exiting.")
             return
-            
-        # Start Vision
-        self.vision.start()
+        
+        # Pre-warm the audio cache in the background (greeting first, so it is instant on the first visitor)
+        self.loop.run_in_executor(None, self.tts.prewarm, self.prewarm_phrases())
+        
+        if self.metrics_port:
+            self.tracer.serve(self.metrics_port)
+        self.start_diagnostics()
 
         # Start Mic Input
-        self.audio_stream.start_input_stream(self.mic_callback)
-        
         self.is_listening = True
-        logger.info("Listening... (Press Ctrl+C to stop)")
+        self.tasks.append(asyncio.create_task(self.drain_mic()))
+        try:
+            self.audio_stream.start_input_stream(self.mic_callback, frames_per_buffer=self.mic_frame_samples)
+        except TypeError:
+            logger.warning("Audio stream does not accept frames_per_buffer; using its default chunk size")
+            self.audio_stream.start_input_stream(self.mic_callback)
+        logger.info(f"Listening with {self.mic_frame_samples * 1000 // INPUT_SAMPLE_RATE} ms mic frames... (Press Ctrl+C to stop)")
+        if self.idle_mode != "off":
+            self.idle.activity()
+            self.tasks.append(asyncio.create_task(self.watch_idle()))
+        self.startup.ready()
+        if self.show_metrics:
+            print(self.startup.report())
         
-        # Start TTS consumer task
-        asyncio.create_task(self.process_tts_queue())
+        # Start TTS consumer tasks: sentence splitting, then synthesis (playback runs in its own thread)
+        self.tasks.append(asyncio.create_task(self.process_tts_queue()))
+        self.tasks.append(asyncio.create_task(self.process_sentence_queue()))
 
         try:
             while self.is_listening:
@@ -116,174 +464,656 @@ class S2SPipeline:
         finally:
             self.stop()
 
+    def start_output(self):
+        """Opens the speaker (PyAudio runs it on its own thread; we feed it through the playback queue)."""
+        self.output_stream = self.audio_stream.start_output_stream()
+        device_rate = getattr(self.output_stream, "sample_rate", OUTPUT_SAMPLE_RATE)
+        converter = FormatConverter(self.tts_format, device_rate, target_rms=OUTPUT_TARGET_RMS)
+        self.player = PlaybackWorker(self.output_stream, self.playback_queue, tail_ms=SPEAKING_TAIL_MS,
+                                     track_level=self.barge_in is not None, converter=converter,
+                                     jitter=PlayoutBuffer(JITTER_MIN_MS, JITTER_MAX_MS),
+                                     speed=getattr(self.output_stream, "speed", 1.0))
+        self.player.start()
+
+    @staticmethod
+    def build_llm(services, token_callback):
+        """The LLM client; with HEDGE, raced against the services' alternate."""
+        if HEDGE not in ("llm", "both") or not hasattr(services, "alternate_llm"):
+            return services.llm(token_callback)
+        router = ProviderRouter(["primary", "alternate"], pct=HEDGE_PCT, min_ms=HEDGE_MIN_MS)
+        return HedgedLLM([("primary", services.llm), ("alternate", services.alternate_llm)], token_callback, router)
+
+    @staticmethod
+    def build_tts(services):
+        if HEDGE not in ("tts", "both") or not hasattr(services, "alternate_tts"):
+            return services.tts()
+        router = ProviderRouter(["primary", "alternate"], pct=HEDGE_PCT, min_ms=HEDGE_MIN_MS)
+        return HedgedTTS([("primary", services.tts()), ("alternate", services.alternate_tts())], router)
+
+    def configure_llm(self, llm):
+        """Hands the persona prefix to the client as its system instruction, or (a client without one)
+        has the prompt builder lead every context with it."""
+        if self.prompts:
+            if hasattr(llm, "system_prompt"):
+                llm.system_prompt = self.prompts.prefix
+            else:
+                self.prompts.prefix_in_context = True
+        return llm
+
+    async def retrieve(self, text):
+        """Retrieval and prompt assembly: the Prompt the LLM gets for `text` (speculation runs it on interims)."""
+        if self.prompts is None:
+            return Prompt.raw(text, await self.rag.search(text))
+        return self.prompts.build(text, await self.rag.search_hits(text), self.memory)
+
+    async def warm_rag(self):
+        """Runs one embedding so the first visitor doesn't pay for lazy model / index initialization."""
+        await self.rag.embed(WARMUP_QUERY)
+
+    def warm_tts_connection(self):
+        """Opens the TTS provider's connection for a client without warmup(): one short synthesis,
+        first chunk only, past the audio cache and never played."""
+        stream = getattr(self.tts, "tts", self.tts).text_to_audio_stream(TTS_WARMUP_TEXT)
+        next(stream, None)
+        stream.close()
+
+    def start_diagnostics(self):
+        if self.diagnostics not in ("stalls", "profile"):
+            return
+        self.loop_monitor = LoopMonitor(self.loop, LOOP_STALL_MS, on_lag=lambda ms: self.tracer.observe("loop_lag", ms))
+        self.loop_monitor.start()
+        if self.diagnostics == "profile":
+            self.profiler = SamplingProfiler(PROFILE_INTERVAL_MS)
+            # Label the TTS thread's work explicitly; loop work is attributed from the stack
+            self.synthesize_sentence = self.profiler.wrap("tts", self.synthesize_sentence)
+            self.replay_audio = self.profiler.wrap("tts", self.replay_audio)
+            self.profiler.start()
+        logger.info(f"Diagnostics: {self.diagnostics} (stall threshold {LOOP_STALL_MS} ms)")
+
+    def prewarm_phrases(self):
+        phrases = [GREETING_TEXT]
+        if os.path.exists(TTS_PREWARM_FILE):
+            with open(TTS_PREWARM_FILE, encoding="utf-8") as f:
+                phrases += [line.strip() for line in f if line.strip()]
+        return phrases
+
     def stop(self):
         self.is_listening = False
         self.vision.stop()
+        if self.player:
+            self.player.stop()
+        self.tts_executor.shutdown(wait=False)
+        if self.owns_rag:
+            self.rag.close()
+        if self.loop_monitor:
+            self.loop_monitor.stop()
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler.dump(self.profile_file)
+        self.tracer.close()
         self.audio_stream.stop_streams()
+        for task in self.tasks:
+            task.cancel()
         asyncio.run_coroutine_threadsafe(self.stt.stop(), self.loop)
         logger.info("Pipeline stopped.")
 
     def mic_callback(self, in_data, frame_count, time_info, status):
-        """Pushes audio to STT"""
-        # Echo Cancellation: Don't listen if we are speaking
-        if self.is_speaking:
-            return (None, 0)
-            
-        # debug print every ~1 second (assuming 16k rate, 8k chunk = 0.5s)
-        print(".", end="", flush=True) 
-        asyncio.run_coroutine_threadsafe(self.stt.send_audio(in_data), self.loop)
+        """PortAudio thread: copy the frame into the ring buffer and wake the drain task."""
+        self.mic_callbacks += 1
+        if status:
+            self.mic_device_overflows += 1
+        self.mic_ring.write(in_data)
+        if not self.mic_wakeup_pending:
+            # One wakeup per drain pass, not per frame
+            self.mic_wakeup_pending = True
+            self.loop.call_soon_threadsafe(self.mic_ready.set)
         return (None, 0) # Continue
 
+    async def drain_mic(self):
+        """Single consumer of the mic ring: reads everything buffered (up to MIC_COALESCE_MS) and sends it.
+        Awaiting each send is the backpressure; while STT is slow, frames pile up in the ring and go out coalesced."""
+        while self.is_listening:
+            await self.mic_ready.wait()
+            self.mic_ready.clear()
+            self.mic_wakeup_pending = False
+            while True:
+                data = self.mic_ring.read(self.mic_coalesce_bytes)
+                if not data:
+                    break
+                # Wall time of the end of this block (newer audio may still be waiting in the ring)
+                captured_at = self.mic_ring.last_write - self.mic_ring.size / (INPUT_SAMPLE_RATE * 2)
+                try:
+                    await self.process_mic_audio(data, captured_at)
+                except Exception as e:
+                    logger.error(f"Mic ingress error: {e}")
+
+    async def process_mic_audio(self, data, captured_at):
+        """Idle hold-back, barge-in / echo muting and VAD gating, then pushes audio to STT."""
+        if self.idle_mode != "off":
+            if self.idle.state != ACTIVE:
+                await self.hold_idle_audio(data, captured_at)
+                return
+            while self.idle_preroll:
+                # Just woke up: what was said meanwhile goes first
+                chunk = self.idle_preroll.popleft()
+                self.idle_preroll_bytes -= len(chunk)
+                await self.send_mic_audio(chunk)
+        
+        if self.barged_in and captured_at - self.barge_in.detected_at > BARGE_IN_TIMEOUT_S and not (
+                self.vad and self.vad.in_speech):
+            self.end_barge_in()  # nothing was said after all
+        
+        # Echo Cancellation: Don't listen if we are speaking (unless the visitor has barged in)
+        if self.is_speaking and not self.barged_in:
+            if not (self.barge_in and self.barge_in.process(data, self.player.output_level, captured_at)):
+                return
+            # Visitor is talking over the answer: cancel it and forward what they said so far
+            self.barged_in = True
+            self.interrupt()
+            for chunk in self.barge_in.take_preroll():
+                await self.send_mic_audio(chunk)
+            return
+            
+        if self.vad:
+            was_speech, last_end = self.vad.in_speech, self.vad.speech_ended_at
+            frames = self.vad.process(data, now=captured_at)
+            if self.vad.in_speech and not was_speech:
+                trace = self.turn_trace()
+                trace.mark("speech_start", self.vad.speech_started_at)
+                trace.mark("speech_detected")
+            if self.vad.speech_ended_at != last_end:
+                self.turn_trace().mark("speech_end", self.vad.speech_ended_at)
+                if self.barged_in:
+                    self.end_barge_in()  # the interruption is over; its final (if any) is on its way
+            if self.vad_gate:
+                now = time.time()
+                if frames:
+                    data = b"".join(frames)
+                elif now - self.last_audio_sent >= STT_KEEPALIVE_S:
+                    data = self.keepalive_frame
+                else:
+                    return  # silence: nothing goes upstream
+                self.last_audio_sent = now
+        await self.send_mic_audio(data)
+
+    def end_barge_in(self):
+        """Playback mutes the mic again (until the next barge-in)."""
+        self.barged_in = False
+        if self.barge_in:
+            self.barge_in.reset()
+
+    async def send_mic_audio(self, data):
+        self.mic_sends += 1
+        self.idle.count_audio(len(data), forwarded=True)
+        await self.stt.send_audio(data)
+
+    async def hold_idle_audio(self, data, captured_at):
+        """Idle / waking: keeps the last IDLE_PREROLL_MS locally instead of streaming it; local speech wakes
+        the kiosk. An open STT socket gets a keepalive frame every STT_KEEPALIVE_S."""
+        self.idle_preroll.append(data)
+        self.idle_preroll_bytes += len(data)
+        while self.idle_preroll_bytes > self.idle_preroll_limit and len(self.idle_preroll) > 1:
+            dropped = self.idle_preroll.popleft()
+            self.idle_preroll_bytes -= len(dropped)
+            self.idle.count_audio(len(dropped), forwarded=False)
+        if self.idle.state != IDLE:
+            return
+        if self.vad:
+            self.vad.process(data, now=captured_at)
+            if self.vad.in_speech:
+                self.request_wake("speech")
+                return
+        now = time.time()
+        if not self.idle.stt_closed and now - self.last_audio_sent >= STT_KEEPALIVE_S:
+            self.last_audio_sent = now
+            self.idle.counters["keepalives"] += 1
+            await self.send_mic_audio(self.keepalive_frame)
+
+    def mic_stats(self):
+        return dict(
+            self.mic_ring.stats(),
+            frame_ms=self.mic_frame_samples * 1000 / INPUT_SAMPLE_RATE,
+            callbacks=self.mic_callbacks,
+            device_overflows=self.mic_device_overflows,
+            sends=self.mic_sends,
+        )
+
+    def turn_trace(self):
+        """The trace collecting marks for the utterance in progress (before its final transcript)."""
+        if self.pending_trace is None:
+            self.pending_trace = self.tracer.start_turn()
+        return self.pending_trace
+
+    def finish_turn(self, trace, status="ok"):
+        """Closes a turn's trace (histograms + JSONL) and prints the per-turn report."""
+        if trace is None or trace.finished:
+            return
+        self.tracer.finish(trace, status)
+        self.last_trace = trace
+        if self.on_turn:
+            self.on_turn(trace)
+        if self.show_metrics:
+            self.print_metrics(trace)
+
     async def handle_transcription(self, is_final, text, confidence=0.0):
         """Called when deepgram returns a transcript"""
-        if is_final:
-            logger.info(f"User: {text} (Confidence: {confidence:.2f})")
-            self.metrics["stt_final"] = time.time()
-            self.metrics["stt_confidence"] = confidence
-            self.metrics["input_text"] = text
-            
-            # 1. RAG Search
-            self.metrics["rag_start"] = time.time()
-            context = self.rag_engine.search(text)
-            self.metrics["rag_end"] = time.time()
-            if context:
-                logger.info(f"RAG Context Found: {context[:50]}...")
-            
-            # 2. Send to LLM
-            logger.info("Sending to LLM...")
-            # Reset metrics for new turn
-            self.metrics["ttft"] = 0
-            self.metrics["ttfa"] = 0
-            self.metrics["llm_start"] = time.time()
-            self.metrics["llm_tokens"] = 0
-            self.metrics["llm_end"] = 0
-            
-            await self.model.process_text(text, context)
+        if text:
+            self.idle.activity()
+        if not is_final:
+            if text:
+                self.turn_trace().first("first_interim")
+                if self.speculation:
+                    self.speculation.on_interim(text)
+            return
+
+        self.end_barge_in()
+        if not text:
+            return  # an utterance with no words (e.g. the noise that triggered a barge-in)
+        logger.info(f"User: {text} (Confidence: {confidence:.2f})")
+        
+        # New turn: this utterance's trace becomes the one being answered
+        trace = self.turn_trace()
+        self.pending_trace = None
+        self.finish_turn(self.trace, "abandoned")  # previous answer never reached its end marker
+        self.trace = trace
+        trace.mark("stt_final")
+        if trace.get("stt_final") - trace.get("speech_end") > 10:
+            trace.marks.pop("speech_end", None)  # end of an earlier utterance that never got a final
+        trace.attrs.update(confidence=confidence, input_chars=len(text), path="llm", llm_tokens=0)
+        
+        # 0. Directory fast path: a plain lookup is answered from the record; no retrieval, no LLM
+        if self.fast_path:
+            answer = self.fast_path.answer(text, [question for question, _ in self.memory.turns])
+            if answer is not None:
+                await self.play_fast_answer(text, answer, trace)
+                return
+        
+        # 1. RAG Search + prompt assembly (promoted from the speculative run on interim transcripts when it matches)
+        trace.mark("rag_start")
+        prompt, prefetched_tokens = None, None
+        if self.speculation:
+            prompt, prefetched_tokens = await self.speculation.resolve(text)
+        if prompt is None:
+            prompt = await self.retrieve(text)
+        trace.mark("rag_end")
+        if prompt.entries:
+            logger.info(f"RAG Context Found: {prompt.entries_text[:50]}...")
+        trace.attrs.update(prompt_tokens=prompt.tokens["total"], prompt_prefix_tokens=prompt.tokens["prefix"],
+                           prompt_history_tokens=prompt.tokens["history"],
+                           prompt_entry_tokens=prompt.tokens["entries"], prompt_entries=len(prompt.entries),
+                           prompt_entries_dropped=prompt.dropped)
+        self.turn_text = []
+        
+        # 2. Answer cache: a near-identical question over the same entries and conversation history replays
+        # the stored answer (keyed on the whole context, so a follow-up never gets another visitor's answer)
+        self.answer_key = None
+        if self.answer_cache:
+            vector = await self.rag.embed(text)
+            ctx_key = context_key(prompt.context)
+            cached = self.answer_cache.lookup(vector, ctx_key)
+            if cached:
+                logger.info(f"Answer cache hit: {cached.text[:50]}...")
+                trace.attrs["path"] = "answer_cache"
+                if prefetched_tokens is not None:
+                    self.speculation.discard_promoted()
+                await self.play_cached_answer(cached, trace)
+                self.memory.add(text, cached.text, prompt.entries)
+                return
+            self.answer_key = (vector, ctx_key)
+            self.turn_audio = []
+        
+        # 3. Send to LLM (as a task, so a barge-in can cancel it)
+        logger.info("Sending to LLM...")
+        trace.mark("llm_start")
+        
+        epoch = self.turn_epoch
+        self.response_task = asyncio.create_task(self.generate_response(text, prompt, prefetched_tokens))
+        try:
+            await self.response_task
+            self.memory.add(text, "".join(self.turn_text), prompt.entries)
+        except asyncio.CancelledError:
+            if self.turn_epoch == epoch:
+                raise
+            logger.info("Response cancelled by barge-in")
+        finally:
+            self.response_task = None
+
+    async def play_fast_answer(self, question, answer, trace):
+        """Speaks a fast-path answer: its sentences go straight to synthesis, then the end-of-turn marker."""
+        logger.info(f"Fast path ({answer.intent}, {answer.name}, score {answer.score:.2f}): {answer.text}")
+        trace.attrs.update(path="fast_path", fast_path_intent=answer.intent)
+        if self.speculation:
+            self.speculation.abandon()
+        self.answer_key = None  # the TTS cache keeps the audio of repeated answers
+        self.turn_text = [answer.text]
+        for sentence in answer.sentences:
+            await self.queue_sentence(sentence)
+        await self.queue_sentence(None)
+        self.memory.add(question, answer.text, [self.fast_path.hit(answer)])
+
+    async def generate_response(self, text, prompt, prefetched_tokens=None):
+        """Streams the LLM answer into tts_queue."""
+        if prefetched_tokens is not None:
+            # Answer was already being generated from the interim transcript; replay and follow it
+            while (token := await prefetched_tokens.get()) is not None:
+                await self.handle_llm_token(token)
+            self.speculation.consumed()
+        else:
+            await self.model.process_text(text, prompt.context)
+        await self.tts_queue.put(None)  # end of response
+
+    def interrupt(self):
+        """Barge-in: drop the current answer everywhere it is queued and give the mic back to STT."""
+        self.turn_epoch += 1
+        if self.response_task and not self.response_task.done():
+            self.response_task.cancel()
+        if self.speculation:
+            self.speculation.discard_promoted()
+        
+        while not self.tts_queue.empty():
+            self.tts_queue.get_nowait()
+            self.tts_queue.task_done()
+        self.segmenter.reset()
+        while not self.sentence_queue.empty():
+            self.sentence_queue.get_nowait()
+            self.pending_sentences -= 1
+            self.sentence_queue.task_done()
+        self.answer_key = None  # never cache a partial answer
+        trace, self.trace = self.trace, None
+        
+        # The TTS thread notices the epoch change at its next chunk and closes its generator
+        onset_at = self.barge_in.onset_at if self.barge_in else 0.0
+        detected_at = self.barge_in.detected_at if self.barge_in else 0.0
+
+        def silent(at):
+            # Onset of the visitor's speech -> the last audio write returned (playback thread or here)
+            self.loop.call_soon_threadsafe(lambda: self.barge_in_done(trace, onset_at, detected_at, at, dropped))
+
+        dropped = 0
+        if self.player:
+            dropped = self.player.flush(reset_tail=True, on_silent=silent)
+        else:
+            silent(time.time())
+
+    def barge_in_done(self, trace, onset_at, detected_at, silent_at, dropped):
+        """Records an interruption once the answer's audio has actually stopped."""
+        detect_ms = (detected_at - onset_at) * 1000 if onset_at else 0.0
+        stop_ms = (silent_at - detected_at) * 1000 if detected_at else 0.0
+        latency = detect_ms + stop_ms
+        self.barge_in_latencies.append(latency)
+        if trace is not None:
+            trace.attrs.update(barge_in_ms=latency, barge_in_detect_ms=detect_ms, barge_in_stop_ms=stop_ms)
+            self.finish_turn(trace, "interrupted")
+        logger.info(f"Barge-in: audio stopped {latency:.1f} ms after the visitor started talking "
+                    f"(detection {detect_ms:.1f} ms, stop {stop_ms:.1f} ms; {dropped} bytes of audio dropped)")
 
     async def handle_llm_token(self, text):
         """Called when LLM generates a token"""
-        if self.metrics["ttft"] == 0:
-            self.metrics["ttft"] = time.time()
-            latency = (self.metrics["ttft"] - self.metrics["stt_final"]) * 1000
-            logger.info(f"Time to First Token (TTFT): {latency:.2f}ms")
-
-        self.metrics["llm_tokens"] += 1
-        self.metrics["llm_end"] = time.time() # Continually update last token time
+        trace = self.trace
+        if trace is not None:
+            if "llm_first_token" not in trace.marks:
+                trace.mark("llm_first_token")
+                latency = (trace.get("llm_first_token") - trace.get("stt_final")) * 1000
+                logger.info(f"Time to First Token (TTFT): {latency:.2f}ms")
+            trace.mark("llm_last_token") # Continually update last token time
+            trace.attrs["llm_tokens"] += 1
+        self.turn_text.append(text)  # the answer, for the conversation memory and the answer cache
 
         # Accumulate text for TTS?
         await self.tts_queue.put(text)
 
     async def process_tts_queue(self):
-        """Consumes text from queue and sends to TTS"""
-        buffer = ""
-        import re
-        
+        """Consumes LLM tokens, cuts them into sentences and queues them for TTS.
+        A None item marks the end of a response and flushes any unterminated tail."""
         while self.is_listening:
+            # Wait for next chunk
+            text_chunk = await self.tts_queue.get()
             try:
-                # Wait for next chunk
-                text_chunk = await self.tts_queue.get()
-                buffer += text_chunk
-                
-                # Check for sentence terminators
-                # We want to find the last punctuation mark that ends a sentence.
-                # Regex looking for [.!?] followed by space or end of string? 
-                # Actually simpler: just split by [.!?] and keep the delimiters.
+                if text_chunk is None:
+                    sentences = self.segmenter.flush()
+                else:
+                    sentences = self.segmenter.feed(text_chunk)
                 
-                # If buffer has complex structure: "Hello! How are you. I am fine"
-                # We want to send "Hello!" then "How are you."
-                # and keep "I am fine" in buffer.
-                
-                if re.search(r'[.!?]', buffer):
-                    # Smart split: Look for punctuation followed by space or end of string
-                    parts = re.split(r'([.!?])', buffer)
-                    
-                    # parts will look like: ['Hello', '!', ' How are you', '.', ' I am fine']
-                    # We want to combine them back into sentences.
-                    
-                    to_speak_list = []
-                    remainder = ""
-                    
-                    # Iterate in pairs (text + punct)
-                    for i in range(0, len(parts) - 1, 2):
-                        sentence = parts[i] + parts[i+1]
-                        to_speak_list.append(sentence)
-                    
-                    # The last part is the remainder (it didn't have a following punctuation group)
-                    remainder = parts[-1]
-                    
-                    # If the last character of buffer WAS a punctuation, then remainder is empty,
-                    # EXCEPT split behavior might leave an empty string at end if separator is at end.
-                    # 'Hello.'.split -> ['Hello', '.', '']
-                    
-                    if remainder.strip() == "":
-                        remainder = ""
-                    
-                    # Now send complete sentences
-                    for sentence in to_speak_list:
-                        sentence = sentence.strip()
-                        if not sentence: continue
-                        
-                        logger.info(f"Generating TTS for: {sentence}")
-                        
-                        self.metrics["tts_start"] = time.time()
-                        self.metrics["tts_chars"] = len(sentence)
-                        
-                        audio_generator = self.tts.text_to_audio_stream(sentence)
-                        
-                        self.is_speaking = True
-                        first_chunk = True
-                        try:
-                            for audio_chunk in audio_generator:
-                                if first_chunk:
-                                    self.metrics["tts_audio_start"] = time.time()
-                                    if self.metrics["ttfa"] == 0:
-                                        self.metrics["ttfa"] = time.time()
-                                        latency = (self.metrics["ttfa"] - self.metrics["stt_final"]) * 1000
-                                        logger.info(f"Time to First Audio (TTFA): {latency:.2f}ms")
-                                    first_chunk = False
-                                
-                                if self.output_stream:
-                                    self.output_stream.write(audio_chunk)
-                            
-                            self.metrics["tts_end"] = time.time()
-                            self.print_metrics()
-                            
-                        finally:
-                            # Small breather between sentences is natural
-                            await asyncio.sleep(0.5) 
-                            self.is_speaking = False
-                    
-                    # Update buffer with what's left
-                    buffer = remainder
+                # Hand complete sentences to the synthesis task; this loop never waits on audio
+                for sentence in sentences:
+                    await self.queue_sentence(sentence)
+                if text_chunk is None:
+                    await self.queue_sentence(None)  # end-of-turn marker for the synthesis task
 
             except Exception as e:
                 logger.error(f"TTS Consumer Error: {e}")
+            finally:
+                self.tts_queue.task_done()
+
+    async def queue_sentence(self, sentence, track_metrics=True):
+        """Schedules a sentence for synthesis. track_metrics=False for non-turn audio (greeting)."""
+        self.pending_sentences += 1
+        await self.sentence_queue.put((sentence, self.trace if track_metrics else None, self.turn_epoch))
+
+    async def process_sentence_queue(self):
+        """Synthesizes sentences in order on the TTS thread.
+        Sentence N+1 is synthesized while the playback thread is still playing sentence N."""
+        while self.is_listening:
+            sentence, trace, epoch = await self.sentence_queue.get()
+            try:
+                if sentence is None:
+                    # The answer's audio is complete: the playback thread stops waiting for more
+                    await self.loop.run_in_executor(self.tts_executor, self.enqueue_audio, END_OF_STREAM, epoch)
+                    self.finish_turn_audio()
+                    if trace is self.trace:
+                        self.trace = None
+                    self.finish_turn(trace)
+                    continue
+                await self.loop.run_in_executor(self.tts_executor, self.synthesize_sentence, sentence, trace, epoch)
+            except Exception as e:
+                logger.error(f"TTS Synthesis Error: {e}")
+            finally:
+                self.pending_sentences -= 1
+                self.sentence_queue.task_done()
+
+    def synthesize_sentence(self, sentence, trace=None, epoch=None):
+        """Runs on the TTS thread: streams one sentence into the playback queue, then a silence gap.
+        `trace` is the turn being answered (None for the greeting).
+        Stops (closing the TTS stream) as soon as a barge-in moves turn_epoch past `epoch`."""
+        if epoch is not None and epoch != self.turn_epoch:
+            return
+        logger.info(f"Generating TTS for: {sentence}")
+        
+        span = trace.start_sentence(len(sentence)) if trace else None
+        first_chunk = True
+        audio_generator = self.tts.text_to_audio_stream(sentence)
+        for audio_chunk in audio_generator:
+            if epoch is not None and epoch != self.turn_epoch:
+                audio_generator.close()
+                return
+            if first_chunk and span is not None:
+                span["first_chunk"] = time.time()
+                if "first_audio" not in trace.marks:
+                    self.mark_first_audio(trace, span["first_chunk"])
+            first_chunk = False
+            
+            if trace and self.answer_key:
+                self.turn_audio.append(bytes(audio_chunk))
+            if not self.enqueue_audio(audio_chunk, epoch):
+                audio_generator.close()
+                return
+        
+        # Natural pause between sentences, played as audio instead of sleeping the loop
+        self.enqueue_audio(self.sentence_gap)
+        if trace and self.answer_key:
+            self.turn_audio.append(self.sentence_gap)
+        if trace is None:
+            self.enqueue_audio(END_OF_STREAM)  # the greeting is a stream of its own
+        if span is not None:
+            span["end"] = time.time()
+
+    def mark_first_audio(self, trace, t):
+        """First audio of the turn is about to be queued; the playback thread marks when it is written."""
+        trace.mark("first_audio", t)
+        if self.player is not None:
+            self.player.on_next_write = lambda written: trace.first("first_audio_written", written)
+        latency = (t - trace.get("stt_final")) * 1000
+        logger.info(f"Time to First Audio (TTFA){' (cached answer)' if trace.attrs.get('path') == 'answer_cache' else ''}: {latency:.2f}ms")
+
+    def finish_turn_audio(self):
+        """All sentences of the turn are synthesized: remember the answer for the answer cache."""
+        if self.answer_key and self.turn_audio:
+            vector, ctx_key = self.answer_key
+            self.answer_cache.store(vector, ctx_key, "".join(self.turn_text), self.turn_audio)
+        self.answer_key = None
+        self.turn_audio = []
+
+    async def play_cached_answer(self, cached, trace=None):
+        """Replays a cached answer's audio through the playback thread."""
+        self.pending_sentences += 1
+        try:
+            await self.loop.run_in_executor(self.tts_executor, self.replay_audio, cached.audio, self.turn_epoch, trace,
+                                            len(cached.text))
+        finally:
+            self.pending_sentences -= 1
+        if trace is self.trace:
+            self.trace = None
+        self.finish_turn(trace)
+
+    def replay_audio(self, chunks, epoch=None, trace=None, chars=0):
+        """Runs on the TTS thread so cached audio stays ordered with any sentence still synthesizing."""
+        span = trace.start_sentence(chars, cached=True) if trace else None
+        for i, chunk in enumerate(chunks):
+            if i == 0 and span is not None:
+                span["first_chunk"] = time.time()
+                self.mark_first_audio(trace, span["first_chunk"])
+            if not self.enqueue_audio(chunk, epoch):
+                return
+        self.enqueue_audio(END_OF_STREAM, epoch)
+        if span is not None:
+            span["end"] = time.time()
+
+    def enqueue_audio(self, chunk, epoch=None):
+        """Blocking put into the bounded playback queue (this is the run-ahead backpressure).
+        Returns False once playback has been stopped or the turn was interrupted."""
+        while self.player is not None and self.player.running:
+            if epoch is not None and epoch != self.turn_epoch:
+                return False
+            try:
+                self.player.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def wait_idle(self):
+        """Waits until every queued LLM token has been synthesized and played."""
+        await self.tts_queue.join()
+        await self.sentence_queue.join()
+        await self.loop.run_in_executor(None, self.playback_queue.join)
+
+    def turn_latencies(self):
+        """Per-stage latencies (ms) of the turn being answered (else the last finished one)."""
+        trace = self.trace or self.last_trace
+        stages = trace.stages() if trace else {}
+        latencies = {stage: stages.get(stage, 0.0) for stage in ("vad_to_final", "rag", "ttft", "tts_first_chunk", "ttfa", "playout")}
+        latencies["path"] = trace.attrs.get("path", "llm") if trace else "llm"
+        return latencies
 
-    def print_metrics(self):
-        """Prints a nicely formatted performance report."""
+    def print_metrics(self, trace):
+        """Prints a nicely formatted performance report for one finished turn."""
         try:
-            rag_lat = (self.metrics.get("rag_end", 0) - self.metrics.get("rag_start", 0)) * 1000
-            llm_lat = (self.metrics.get("ttft", 0) - self.metrics.get("llm_start", 0)) * 1000
-            tts_lat = (self.metrics.get("tts_audio_start", 0) - self.metrics.get("tts_start", 0)) * 1000
-            total_lat = (self.metrics.get("ttfa", 0) - self.metrics.get("stt_final", 0)) * 1000
+            stages = trace.stages()
+            rag_lat = stages.get("rag", 0)
+            llm_lat = stages.get("ttft", 0)
+            tts_lat = stages.get("tts_first_chunk", 0)
+            total_lat = stages.get("ttfa", 0)
             
             # Throughput
-            llm_dur = self.metrics.get("llm_end", 0) - self.metrics.get("llm_start", 0)
-            llm_tps = self.metrics.get("llm_tokens", 0) / llm_dur if llm_dur > 0 else 0
+            llm_dur = trace.get("llm_last_token") - trace.get("llm_start")
+            llm_tps = trace.attrs.get("llm_tokens", 0) / llm_dur if llm_dur > 0 else 0
             
-            tts_dur = self.metrics.get("tts_end", 0) - self.metrics.get("tts_start", 0)
-            tts_cps = self.metrics.get("tts_chars", 0) / tts_dur if tts_dur > 0 else 0
+            spans = [span for span in trace.sentences if "end" in span and not span["cached"]]
+            tts_dur = sum(span["end"] - span["start"] for span in spans)
+            tts_cps = sum(span["chars"] for span in spans) / tts_dur if tts_dur > 0 else 0
+            ttfa = self.tracer.percentiles("ttfa")
             
             print("\n" + "="*60)
-            print(f"📊 PERFORMANCE METRICS REPORT")
+            print(f"📊 PERFORMANCE METRICS REPORT (turn {trace.turn_id}, {trace.attrs.get('status', 'ok')})")
             print("="*60)
-            print(f"🎤 Input: '{self.metrics.get('input_text', '...')[:50]}...' (Conf: {self.metrics.get('stt_confidence', 0):.2f})")
+            print(f"🎤 Input: {trace.attrs.get('input_chars', 0)} chars (Conf: {trace.attrs.get('confidence', 0):.2f})")
             print("-" * 60)
+            if self.vad:
+                vad_lat = stages.get("vad_to_final", 0)
+                vad = self.vad.stats()
+                print(f"0. VAD -> STT Final : {vad_lat:8.2f} ms | Upstream audio saved: {vad['saved_ratio'] * 100:5.1f}%")
             print(f"1. RAG Retrieval    : {rag_lat:8.2f} ms")
-            print(f"2. LLM Time to 1st  : {llm_lat:8.2f} ms | Speed: {llm_tps:6.2f} tokens/s")
-            print(f"3. TTS Generation   : {tts_lat:8.2f} ms | Speed: {tts_cps:6.2f} chars/s")
+            prompt = {k: trace.attrs.get(f"prompt_{k}", 0) for k in ("tokens", "prefix_tokens", "history_tokens",
+                                                                      "entry_tokens", "entries")}
+            print(f"2. LLM Time to 1st  : {llm_lat:8.2f} ms | Speed: {llm_tps:6.2f} tokens/s | "
+                  f"Prompt: {prompt['tokens']} tokens (prefix {prompt['prefix_tokens']}, history "
+                  f"{prompt['history_tokens']}, {prompt['entries']} entries {prompt['entry_tokens']})")
+            print(f"3. TTS Generation   : {tts_lat:8.2f} ms | Speed: {tts_cps:6.2f} chars/s ({len(spans)} sentences)")
             print("-" * 60)
-            print(f"⚡ TOTAL LATENCY    : {total_lat:8.2f} ms")
+            print(f"⚡ TOTAL LATENCY    : {total_lat:8.2f} ms  ({trace.attrs.get('path', 'llm')} path)")
+            if "playout" in stages:
+                print(f"🔈 Queued -> speaker: {stages['playout']:8.2f} ms")
+            if self.player:
+                out = self.player.stats()
+                print(f"🎧 Jitter buffer    : target {out['target_ms']:.0f} ms | depth p50 {out['depth_ms_p50']:.0f} ms "
+                      f"| underruns {out['underruns']} ({out['starved_ms']:.0f} ms starved) | "
+                      f"{out['source_rate']} -> {out['device_rate']} Hz, gain {out['gain']:.2f}")
+            print(f"📈 TTFA rolling     : p50 {ttfa['p50']:.0f} | p95 {ttfa['p95']:.0f} | p99 {ttfa['p99']:.0f} ms "
+                  f"({ttfa['count']} turns)")
+            if self.fast_path:
+                fast = self.fast_path.stats()
+                fast_ttfa = self.tracer.percentiles("ttfa_fast_path")
+                llm_ttfa = self.tracer.percentiles("ttfa_llm")
+                print(f"📇 Fast path        : {fast['hit_rate'] * 100:5.1f}% hits ({fast['hits']}/{fast['questions']}) | "
+                      f"TTFA p50 {fast_ttfa['p50']:.0f} ms vs LLM {llm_ttfa['p50']:.0f} ms | "
+                      f"fallbacks: no intent {fast['no_intent']}, no name {fast['no_name']}, "
+                      f"ambiguous {fast['ambiguous']}, no field {fast['no_field']}")
+            if self.answer_cache:
+                ans = self.answer_cache.stats()
+                print(f"💬 Answer cache     : {ans['hit_rate'] * 100:5.1f}% hits | {ans['entries']} answers "
+                      f"| {ans['audio_bytes'] / 1e6:.1f} MB")
+            tts_cache = self.tts.cache.stats()
+            print(f"🔊 TTS cache        : {tts_cache['hit_rate'] * 100:5.1f}% hits "
+                  f"({tts_cache['hits']}/{tts_cache['hits'] + tts_cache['misses']}) | {tts_cache['bytes'] / 1e6:.1f} MB")
+            rag = self.rag.stats()
+            print(f"🔎 RAG cache        : {rag['results']['hit_rate'] * 100:5.1f}% hits | "
+                  f"batches {rag['batches']} ({rag['batched_queries']} queries) | timeouts {rag['timeouts']} | "
+                  f"name matches {rag['name_matches']}")
+            mic = self.mic_stats()
+            print(f"🎙️ Mic ingress      : {mic['frame_ms']:.0f} ms frames | {mic['callbacks']} frames -> {mic['sends']} sends "
+                  f"| overruns {mic['overruns']} ({mic['dropped_bytes']} B dropped) | device overflows {mic['device_overflows']}")
+            if hasattr(self.stt, "stats"):
+                stt = self.stt.stats()
+                last = f"{stt['last_reconnect_ms']:.0f} ms" if stt["last_reconnect_ms"] is not None else "-"
+                print(f"🔌 STT link         : drops {stt['drops']} | fail-overs {stt['failovers']} "
+                      f"({stt['promotions']} to standby, last {last}) | replayed {stt['replayed_bytes'] / 1024:.0f} KB "
+                      f"| standby {'ready' if stt['standby_ready'] else 'down'}")
+            if self.loop_monitor:
+                loop_stats = self.loop_monitor.stats()
+                worst = loop_stats["worst"]
+                print(f"🐢 Event loop       : lag p99 {self.tracer.percentiles('loop_lag')['p99']:.1f} ms | "
+                      f"stalls {loop_stats['stalls']}" + (f" (worst {worst['ms']:.0f} ms in {worst['stage']})" if worst else ""))
+            if self.barge_in_latencies:
+                print(f"✋ Barge-in         : {len(self.barge_in_latencies)} interruptions | "
+                      f"last stopped {self.barge_in_latencies[-1]:.1f} ms after speech onset")
+            if self.idle_mode != "off":
+                idle = self.idle.stats()
+                t = idle["time_in_s"]
+                print(f"💤 Idle mode        : {idle['state']} | active {t[ACTIVE]:.0f} s, idle {t[IDLE]:.0f} s, "
+                      f"waking {t[WAKING]:.1f} s | upstream audio avoided {idle['avoided_ratio'] * 100:5.1f}% "
+                      f"({idle['avoided_bytes'] / 1e6:.1f} MB) | wake-ups {idle['wakeups']}"
+                      + (f" (last {idle['last_wake_ms']:.0f} ms)" if idle["last_wake_ms"] is not None else ""))
+            for stage, client in (("LLM", self.model), ("TTS", self.tts.tts)):
+                if isinstance(client, (HedgedLLM, HedgedTTS)):
+                    hedge = client.stats()
+                    print(f"🔀 {stage} hedging      : {hedge['hedge_ratio'] * 100:4.1f}% hedged ({hedge['hedged']}/"
+                          f"{hedge['requests']}) | hedge won {hedge['hedge_wins']} | " + " | ".join(
+                              f"{name} p50 {p.get('p50', 0):.0f} ms ({p['wins']} wins)"
+                              for name, p in hedge["providers"].items()))
+            if self.speculation:
+                spec = self.speculation.stats()
+                print(f"🔮 Speculation      : RAG hits {spec['rag_hits']} | LLM hits {spec['llm_hits']} | "
+                      f"misses {spec['misses']} | restarts {spec['restarted']} | wasted {spec['wasted_ms']:.0f} ms")
             print("="*60 + "\n")
         except Exception as e:
             logger.error(f"Error printing metrics: {e}")
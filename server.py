@@ -0,0 +1,300 @@
+"""
+Multi-session server mode: many kiosks, one process.
+
+Each kiosk connects over TCP and streams 16 kHz mono PCM; the server runs an
+isolated S2SPipeline per connection (its own conversation state, turn traces and
+playback) and streams the answer audio back. The RAG engine (embedding model +
+directory index), its batched front end, the TTS audio cache and the answer
+cache are loaded once and shared. LLM and TTS calls take process-wide slots;
+sessions beyond --max-sessions (one STT stream each) are refused.
+
+Wire format, both directions: 1 byte frame type, 4 byte big-endian length, payload.
+    kiosk -> server   H hello (JSON: {"kiosk": name})   A mic PCM   P visitor present
+                      E end of utterance (for STT without endpointing)   Q quit
+    server -> kiosk   R ready (JSON)   A answer PCM   J event (JSON)   X error (JSON)
+
+    python server.py --port 8765 --max-sessions 8
+    python server.py --local --speed 4      # offline stand-ins, see bench_server.py
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import struct
+import time
+
+import main
+from main import S2SPipeline, LiveServices
+from services.async_rag import AsyncRAGEngine
+from services.session_services import SessionPools, SessionServices
+from utils.answer_cache import AnswerCache
+from utils.audio_cache import AudioCache, CachedTTSService
+from utils.startup import Startup
+from utils.tracing import STAGES, Tracer
+
+logger = logging.getLogger("Server")
+
+HEADER = struct.Struct(">cI")
+MAX_FRAME = 1 << 20
+SEND_TIMEOUT_S = 10.0  # a kiosk that doesn't take answer audio for this long is disconnected
+
+
+async def read_frame(reader):
+    """Returns (kind, payload); raises asyncio.IncompleteReadError on EOF."""
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_FRAME:
+        raise ValueError(f"frame too large ({length} bytes)")
+    return kind, await reader.readexactly(length)
+
+
+def write_frame(writer, kind, payload=b""):
+    writer.write(HEADER.pack(kind, len(payload)) + payload)
+
+
+class SharedResources:
+    """Loaded once per process and handed to every session's pipeline."""
+
+    def __init__(self, base, answer_cache=True, tts_cache_dir=main.TTS_CACHE_DIR, tts_cache_mb=main.TTS_CACHE_MB):
+        self.rag_engine = base.rag_engine()  # embedding model + directory index
+        self.rag = AsyncRAGEngine(self.rag_engine, vector_index_dir=main.VECTOR_INDEX_DIR or None,
+                                  int8=main.VECTOR_INDEX_INT8, lexical=main.LEXICAL_SEARCH)
+        self.tts_cache = AudioCache(tts_cache_dir, tts_cache_mb * 1024 * 1024)
+        self.answer_cache = AnswerCache(main.ANSWER_CACHE_THRESHOLD, main.ANSWER_CACHE_TTL_S) if answer_cache else None
+
+    def close(self):
+        self.rag.close()
+
+
+class Connection:
+    """Thread-safe sending side of one kiosk connection."""
+
+    def __init__(self, writer, loop, send_timeout_s=SEND_TIMEOUT_S):
+        self.writer = writer
+        self.loop = loop
+        self.send_timeout = send_timeout_s
+        self.closed = False
+        self.audio_bytes_out = 0
+
+    def send_audio(self, pcm):
+        """Called from the session's playback thread. Blocks until the socket buffer has drained, so a slow
+        kiosk slows its own playback instead of queueing audio without bound; one that stops reading for
+        send_timeout_s is dropped."""
+        if self.closed:
+            return
+        self.audio_bytes_out += len(pcm)
+        sent = asyncio.run_coroutine_threadsafe(self._send(b"A", pcm), self.loop)
+        try:
+            sent.result(self.send_timeout)
+        except concurrent.futures.TimeoutError:
+            sent.cancel()
+            logger.warning(f"Kiosk stopped reading for {self.send_timeout:.0f} s; closing its connection")
+            self.closed = True
+            self.loop.call_soon_threadsafe(self.writer.close)
+        except (ConnectionError, RuntimeError):
+            self.closed = True  # connection gone, or the loop is shutting down
+
+    async def _send(self, kind, payload):
+        self._write(kind, payload)
+        await self.writer.drain()
+
+    def send_event(self, event):
+        self._write(b"J", json.dumps(event).encode("utf-8"))
+
+    def _write(self, kind, payload):
+        if not self.closed and not self.writer.is_closing():
+            write_frame(self.writer, kind, payload)
+
+
+class Session:
+    def __init__(self, session_id, kiosk, pipeline, stream, connection):
+        self.id = session_id
+        self.kiosk = kiosk
+        self.pipeline = pipeline
+        self.stream = stream
+        self.connection = connection
+        self.turns = 0
+        self.tasks = []
+
+
+class KioskServer:
+    def __init__(self, base, max_sessions=8, llm_slots=4, tts_slots=4, speed=1.0, answer_cache=True,
+                 tts_cache_dir=main.TTS_CACHE_DIR, tts_cache_mb=main.TTS_CACHE_MB, trace_file=None, metrics_file=None):
+        self.base = base
+        self.max_sessions = max_sessions
+        self.speed = speed
+        self.shared = SharedResources(base, answer_cache, tts_cache_dir, tts_cache_mb)
+        self.pools = SessionPools(llm_slots, tts_slots)
+        self.tracer = Tracer(trace_file, metrics_file)  # all sessions' stages, for server-wide percentiles
+        self.sessions = {}
+        self.opening = 0  # sessions whose pipeline is still being built (they count against max_sessions)
+        self.next_id = 1
+        self.counters = {"accepted": 0, "refused": 0, "turns": 0}
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8765):
+        loop = asyncio.get_running_loop()
+        # Warm the shared audio cache once instead of once per session
+        warm_tts = CachedTTSService(self.base.tts(), self.shared.tts_cache)
+        await loop.run_in_executor(None, warm_tts.prewarm, [main.GREETING_TEXT])
+        self.server = await asyncio.start_server(self.handle, host, port)
+        port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Kiosk server listening on {host}:{port} (max {self.max_sessions} sessions)")
+        return port
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for session in list(self.sessions.values()):
+            session.pipeline.is_listening = False
+        self.shared.close()
+        self.tracer.close()
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            kind, payload = await read_frame(reader)
+            hello = json.loads(payload or b"{}") if kind == b"H" else {}
+        except (asyncio.IncompleteReadError, ValueError):
+            writer.close()
+            return
+        if kind != b"H" or len(self.sessions) + self.opening >= self.max_sessions:
+            self.counters["refused"] += 1
+            await self.refuse(writer, "busy" if kind == b"H" else "expected hello")
+            return
+
+        kiosk = hello.get("kiosk", "kiosk")
+        self.opening += 1
+        try:
+            session = await self.open_session(kiosk, writer, loop)
+        except Exception as e:
+            logger.error(f"Session for {kiosk} failed to open: {e}")
+            await self.refuse(writer, "session failed to start")
+            return
+        finally:
+            self.opening -= 1
+
+        runner = asyncio.create_task(session.pipeline.start())
+        try:
+            while not session.pipeline.is_listening and not runner.done():
+                await asyncio.sleep(0.01)
+            if not session.pipeline.is_listening:
+                write_frame(writer, b"X", json.dumps({"error": "session failed to start"}).encode("utf-8"))
+                return
+            write_frame(writer, b"R", json.dumps({"session": session.id}).encode("utf-8"))
+            while not runner.done():
+                kind, payload = await read_frame(reader)
+                if kind == b"A":
+                    session.stream.feed(payload)
+                elif kind == b"E" and hasattr(session.pipeline.stt, "finalize"):
+                    # The final transcript drives the whole turn; keep reading audio meanwhile
+                    session.tasks = [t for t in session.tasks if not t.done()]
+                    session.tasks.append(asyncio.create_task(session.pipeline.stt.finalize()))
+                elif kind == b"P":
+                    session.pipeline.handle_vision_trigger()
+                elif kind == b"Q":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            session.connection.closed = True
+            session.pipeline.is_listening = False
+            for task in session.tasks:
+                task.cancel()
+            try:
+                await runner
+            except Exception as e:
+                logger.error(f"Session {session.id} pipeline failed: {e}")
+            finally:
+                self.sessions.pop(session.id, None)
+                writer.close()
+            logger.info(f"Session {session.id} ({session.kiosk}) closed after {session.turns} turns")
+
+    @staticmethod
+    async def refuse(writer, reason):
+        write_frame(writer, b"X", json.dumps({"error": reason}).encode("utf-8"))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def open_session(self, kiosk, writer, loop):
+        connection = Connection(writer, loop)
+        services = SessionServices(self.base, connection, self.shared.rag_engine, self.pools, speed=self.speed)
+        # Session timeline starts at connect, not at server start. The constructor runs the blocking
+        # start-up steps (clients, warmup), so it goes on a thread: other sessions keep streaming meanwhile
+        startup = Startup(t0=time.perf_counter())
+        pipeline = await loop.run_in_executor(None, lambda: S2SPipeline(loop, services, shared=self.shared,
+                                                                        startup=startup))
+        pipeline.tracer = Tracer()  # per-session histograms; files are written server-wide
+        pipeline.show_metrics = False
+        pipeline.metrics_port = 0        # the server exposes one endpoint for all sessions
+        pipeline.diagnostics = "off"
+        session = Session(self.next_id, kiosk, pipeline, pipeline.audio_stream, connection)
+        pipeline.on_turn = lambda trace: self.turn_finished(session, trace)
+        self.sessions[session.id] = session
+        self.next_id += 1
+        self.counters["accepted"] += 1
+        logger.info(f"Session {session.id} opened for {kiosk} ({len(self.sessions)}/{self.max_sessions})")
+        return session
+
+    def turn_finished(self, session, trace):
+        session.turns += 1
+        self.counters["turns"] += 1
+        stages = trace.stages()
+        for stage, ms in stages.items():
+            self.tracer.observe(stage, ms)
+        session.connection.send_event({
+            "event": "turn",
+            "turn": trace.turn_id,
+            "status": trace.attrs.get("status"),
+            "path": trace.attrs.get("path"),
+            "stages_ms": {k: round(v, 3) for k, v in stages.items()},
+        })
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "counters": dict(self.counters),
+            "pools": self.pools.stats(),
+            "rag": self.shared.rag.stats(),
+            "stages": {stage: self.tracer.percentiles(stage) for stage, _, _ in STAGES + (("tts_first_chunk", 0, 0),)},
+        }
+
+
+def build_base(args):
+    if not args.local:
+        return LiveServices()
+    from services.local_services import LocalProfile, LocalServices
+    return LocalServices(LocalProfile(speed=args.speed))
+
+
+async def serve(args):
+    server = KioskServer(build_base(args), args.max_sessions, args.llm_slots, args.tts_slots, args.speed,
+                         answer_cache=main.ANSWER_CACHE, trace_file=main.TRACE_FILE or None,
+                         metrics_file=main.METRICS_FILE or None)
+    await server.start(args.host, args.port)
+    if main.METRICS_PORT:
+        server.tracer.serve(main.METRICS_PORT)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve many kiosks from one process.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-sessions", type=int, default=8, help="concurrent kiosks (one STT stream each)")
+    parser.add_argument("--llm-slots", type=int, default=4, help="concurrent LLM generations across sessions")
+    parser.add_argument("--tts-slots", type=int, default=4, help="concurrent TTS streams across sessions")
+    parser.add_argument("--local", action="store_true", help="use the offline stand-ins from services/local_services.py")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback pace (x real time) of the session audio clock")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        logger.info("Stopping...")
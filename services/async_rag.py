@@ -0,0 +1,304 @@
+"""
+Async, batched front end for RAGEngine.
+
+Queries arriving within a short window are embedded together on a worker
+thread; results and query embeddings are cached. A query that misses its
+deadline is answered by a keyword search over the directory file.
+`vector_index_dir` searches the memory-mapped index (services/vector_index.py),
+`lexical` fuses in BM25 and fuzzy name matches (utils/lexical_index.py).
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.vector_index import VectorIndex, default_embedder, hashed_embedding
+from utils.directory import DIRECTORY_PATH, KeywordIndex, directory_stamp, format_context, load_directory
+from utils.lexical_index import NAME_MATCH, LexicalIndex
+from utils.lru import LRUCache
+from utils.speculation import normalize
+
+logger = logging.getLogger("AsyncRAG")
+
+# ChromaDB distance -> cosine similarity, per the collection's "hnsw:space" (default l2, i.e. squared L2;
+# embeddings are unit length, so l2 = 2 - 2 cos)
+SIMILARITY = {
+    "cosine": lambda d: 1.0 - d,
+    "ip": lambda d: 1.0 - d,
+    "l2": lambda d: 1.0 - d / 2.0,
+}
+
+
+class EngineBackend:
+    """Per-query fallback: runs RAGEngine.search as-is, one query per worker call."""
+
+    batched = False
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def embed_batch(self, texts):
+        return [hashed_embedding(t) for t in texts]
+
+    def search_batch(self, texts, k):
+        results = []
+        for text in texts:
+            context = self.engine.search(text)
+            results.append([{"name": "", "text": context, "score": 1.0}] if context else [])
+        return results
+
+
+class ChromaBackend:
+    """
+    Batched path over the engine's SentenceTransformer (`model`) and ChromaDB
+    collection (`collection`): one encode() and one query() per batch.
+    Distances are turned into cosine similarity for the collection's metric;
+    a query with no hit above `min_similarity` gets RAGEngine.search's own
+    answer (its friendly default reply), as before.
+    """
+
+    batched = True
+
+    def __init__(self, engine, embedding_cache, min_similarity=0.4):
+        self.engine = engine
+        self.model = engine.model
+        self.collection = engine.collection
+        self.embedding_cache = embedding_cache
+        self.min_similarity = min_similarity
+        space = ((getattr(self.collection, "metadata", None) or {}).get("hnsw:space") or "l2").lower()
+        if space not in SIMILARITY:
+            raise ValueError(f"ChromaDB collection uses unsupported distance {space!r}")
+        self.similarity = SIMILARITY[space]
+
+    def embed_batch(self, texts):
+        keys = [normalize(t) for t in texts]
+        vectors = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            encoded = self.model.encode([texts[i] for i in missing], normalize_embeddings=True)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                self.embedding_cache.put(keys[i], vector)
+        return vectors
+
+    def search_batch(self, texts, k):
+        vectors = self.embed_batch(texts)
+        res = self.collection.query(query_embeddings=[list(map(float, v)) for v in vectors], n_results=k)
+        results = []
+        for q in range(len(texts)):
+            hits = []
+            for doc, meta, dist in zip(res["documents"][q], res["metadatas"][q], res["distances"][q]):
+                score = self.similarity(dist)
+                if score >= self.min_similarity:
+                    hits.append({"name": (meta or {}).get("name", ""), "text": doc, "score": score})
+            if not hits:
+                context = self.engine.search(texts[q])  # below threshold: the engine's default reply
+                hits = [{"name": "", "text": context, "score": 0.0}] if context else []
+            results.append(hits)
+        return results
+
+
+class VectorBackend:
+    """Batched path over the memory-mapped VectorIndex: one encode() and one matrix product per batch."""
+
+    batched = True
+
+    def __init__(self, index, embedder, embedding_cache, min_similarity=0.4):
+        self.index = index
+        self.embedder = embedder
+        self.embedding_cache = embedding_cache
+        self.min_similarity = min_similarity
+
+    def embed_batch(self, texts):
+        keys = [normalize(t) for t in texts]
+        vectors = [self.embedding_cache.get(key) for key in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            encoded = self.embedder.encode([texts[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                self.embedding_cache.put(keys[i], vector)
+        return vectors
+
+    def search_batch(self, texts, k):
+        return self.index.hits(np.stack(self.embed_batch(texts)), k, self.min_similarity)
+
+
+class AsyncRAGEngine:
+    def __init__(self, engine, workers=2, batch_window_ms=4, max_batch=16, timeout_ms=400,
+                 cache_size=256, top_k=3, directory_path=DIRECTORY_PATH, vector_index_dir=None, int8=False,
+                 lexical=False, result_ttl_s=3600, check_interval_s=5.0):
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="RAG")
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout_ms / 1000.0
+        self.top_k = top_k
+        self.result_cache = LRUCache(cache_size)  # key -> (stored at, hits)
+        self.embedding_cache = LRUCache(cache_size)
+        self.result_ttl = result_ttl_s
+        self.directory_path = directory_path
+        # Like AnswerCache: results are dropped when the directory file changes
+        self.directory_stamp = directory_stamp(directory_path)
+        self.check_interval = check_interval_s
+        self.next_check = 0.0
+        # Timeout fallback, built now (a start-up step) rather than on the loop when retrieval is already slow
+        self.keyword_index = None
+        self.lexical = None
+        started = time.perf_counter()
+        entries = load_directory(directory_path)
+        if lexical and entries:
+            self.lexical = LexicalIndex(entries)
+            logger.info(f"Lexical index: {len(entries)} entries in {(time.perf_counter() - started) * 1000:.0f} ms")
+        else:
+            self.keyword_index = KeywordIndex(entries)
+
+        self.backend = self._open_vector_index(engine, vector_index_dir, int8) if vector_index_dir else None
+        if self.backend is not None:
+            pass  # precomputed index replaces the engine's own search
+        elif hasattr(engine, "model") and hasattr(engine, "collection"):
+            try:
+                self.backend = ChromaBackend(engine, self.embedding_cache)
+            except ValueError as e:
+                logger.error(f"{e}; using the engine's search")
+                self.backend = EngineBackend(engine)
+        else:
+            self.backend = EngineBackend(engine)
+
+        self.pending = []  # (key, text, future) waiting for the current batch window
+        self.flush_handle = None
+        self.inflight = {}  # key -> future, so identical concurrent queries share one lookup
+        self.counters = {"queries": 0, "batches": 0, "batched_queries": 0, "timeouts": 0, "fallbacks": 0,
+                         "name_matches": 0, "expired": 0, "invalidations": 0}
+
+    def _open_vector_index(self, engine, index_dir, int8):
+        """VectorBackend over a fresh (or incrementally rebuilt) index; None to keep the engine's own search."""
+        try:
+            embedder = default_embedder(engine)
+            index = VectorIndex.ensure(self.directory_path, index_dir, embedder, int8)
+        except Exception as e:
+            logger.error(f"Vector index unavailable, using the engine's search: {e}")
+            return None
+        if index is None:
+            return None
+        logger.info(f"Vector index: {len(index)} entries, {index.nbytes / 1e6:.1f} MB mapped ({index.meta['model']})")
+        return VectorBackend(index, embedder, self.embedding_cache)
+
+    async def embed(self, text):
+        """Normalized query embedding (cached); used by the answer cache."""
+        key = normalize(text)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            loop = asyncio.get_running_loop()
+            vector = (await loop.run_in_executor(self.executor, self.backend.embed_batch, [text]))[0]
+            self.embedding_cache.put(key, vector)
+        return vector
+
+    async def search(self, text, timeout_ms=None):
+        """Context string for the query; never blocks the event loop."""
+        return format_context(await self.search_hits(text, timeout_ms))
+
+    async def search_hits(self, text, timeout_ms=None):
+        """Ranked hits ({name, text, score}) for the query."""
+        self.counters["queries"] += 1
+        key = normalize(text)
+        self._check_directory()
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            stored, hits = cached
+            if time.monotonic() - stored <= self.result_ttl:
+                return hits
+            self.counters["expired"] += 1
+
+        future = self.inflight.get(key)
+        if future is None:
+            future = self._submit(key, text)
+        timeout = self.timeout if timeout_ms is None else timeout_ms / 1000.0
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            logger.warning(f"RAG search exceeded {timeout * 1000:.0f} ms, using keyword fallback")
+            return self.keyword_search(text)
+        except Exception as e:
+            logger.error(f"RAG search failed, using keyword fallback: {e}")
+            return self.keyword_search(text)
+
+    def keyword_search(self, text):
+        self.counters["fallbacks"] += 1
+        if self.lexical is not None:
+            return self.lexical.search(text, self.top_k)
+        return self.keyword_index.search(text, self.top_k)
+
+    def search_batch(self, texts, k):
+        """Backend search, fused with the lexical index when there is one (runs on a worker thread)."""
+        results = self.backend.search_batch(texts, k)
+        if self.lexical is None:
+            return results
+        fused = []
+        for text, hits in zip(texts, results):
+            names = self.lexical.names(text, k)
+            self.counters["name_matches"] += any(score >= NAME_MATCH for _, score in names)
+            fused.append(self.lexical.fuse(hits, text, k, names))
+        return fused
+
+    def _submit(self, key, text):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.inflight[key] = future
+        self.pending.append((key, text, future))
+        if len(self.pending) >= self.max_batch or not self.backend.batched:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        self.counters["batches"] += 1
+        self.counters["batched_queries"] += len(batch)
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        work = loop.run_in_executor(self.executor, self.search_batch, [t for _, t, _ in batch], self.top_k)
+
+        def done(work):
+            logger.debug(f"RAG batch of {len(batch)} in {(time.perf_counter() - started) * 1000:.1f} ms")
+            error = work.exception()
+            for i, (key, _, future) in enumerate(batch):
+                self.inflight.pop(key, None)
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                    future.exception()  # the caller may already have fallen back; don't warn on GC
+                else:
+                    hits = work.result()[i]
+                    self.result_cache.put(key, (time.monotonic(), hits))
+                    future.set_result(hits)
+
+        work.add_done_callback(done)
+
+    def _check_directory(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + self.check_interval
+        stamp = directory_stamp(self.directory_path)
+        if stamp != self.directory_stamp:
+            logger.info("Directory file changed, clearing RAG result cache")
+            self.directory_stamp = stamp
+            self.result_cache.clear()
+            self.counters["invalidations"] += 1
+
+    def stats(self):
+        return dict(self.counters, results=self.result_cache.stats(), embeddings=self.embedding_cache.stats())
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,342 @@
+"""
+Deterministic, offline stand-ins for the live services.
+
+These mirror the interfaces main.py uses (AudioStream, STTService, RAGEngine,
+LLMService, TTSService, VisionService) but replace the microphone, speakers and
+network calls with recorded WAV input and configurable delays, so orchestration
+changes can be benchmarked repeatably (see bench_pipeline.py).
+"""
+import asyncio
+import logging
+import random
+import re
+import time
+import wave
+from dataclasses import dataclass
+
+from utils.prompt_builder import count_tokens
+
+logger = logging.getLogger("LocalServices")
+
+
+@dataclass
+class LocalProfile:
+    """Delays and rates used by the local services. All times are in ms."""
+    transcript: str = "What does Mindgrove Technologies do?"
+    response: str = (
+        "Mindgrove Technologies designs indigenous microcontroller chips. "
+        "Their Secure IoT SoC is built right here at the IITM Research Park. "
+        "You can find their office in the D block, second floor."
+    )
+    context: str = "Mindgrove Technologies: Fabless semiconductor startup building RISC-V SoCs."
+    stt_interim_ms: float = 300.0   # audio between interim transcripts
+    stt_final_ms: float = 250.0     # endpointing delay after the audio ends
+    rag_ms: float = 40.0
+    llm_ttft_ms: float = 350.0
+    llm_tokens_per_sec: float = 60.0
+    llm_ms_per_prompt_token: float = 0.0  # prefill cost per uncached prompt token (0 = prompt size is free)
+    llm_cached_token_ratio: float = 0.1   # cost of a token in the cached system-prompt prefix
+    tts_first_chunk_ms: float = 180.0
+    tts_realtime_factor: float = 4.0  # seconds of audio synthesized per wall second
+    tts_ms_per_char: float = 65.0     # spoken duration per character
+    tts_chunk_jitter_ms: float = 0.0  # network jitter: extra delay per chunk, exponential with this mean
+    tts_sample_rate: int = 0          # provider audio rate (0 = the device's `sample_rate`)
+    jitter_ms: float = 0.0            # uniform extra delay added to each stage
+    slow_ratio: float = 0.0           # share of LLM / TTS requests that hit a slow replica (the latency tail)
+    slow_ms: float = 0.0              # extra time to first token / first chunk on those (0.5-1.5x)
+    # Start-up costs (imports, model load, connection set-up); 0 keeps the latency benchmarks unchanged
+    audio_init_ms: float = 0.0
+    rag_load_ms: float = 0.0          # embedding model + directory index
+    llm_init_ms: float = 0.0          # per client: speculation builds extra ones
+    tts_init_ms: float = 0.0
+    stt_connect_ms: float = 0.0
+    vision_init_ms: float = 0.0       # cv2 import + camera open
+    # Idle connections: providers drop them after `connection_idle_s`; the next call pays set-up again
+    llm_connect_ms: float = 0.0
+    tts_connect_ms: float = 0.0
+    connection_idle_s: float = 0.0    # 0 = connections never go cold
+    seed: int = 1234
+    sample_rate: int = 16000
+    input_chunk: int = 8000           # samples per mic callback unless the pipeline asks for frames_per_buffer
+    output_chunk: int = 2048          # bytes per TTS chunk
+    speed: float = 1.0                # >1 feeds the mic / plays audio faster than real time
+
+
+class _Clock:
+    """Seeded jitter source so runs are repeatable."""
+
+    def __init__(self, profile, salt):
+        self.profile = profile
+        self.rng = random.Random(f"{profile.seed}:{salt}")
+
+    def delay(self, base_ms):
+        extra = self.rng.uniform(0, self.profile.jitter_ms) if self.profile.jitter_ms else 0.0
+        return (base_ms + extra) / 1000.0
+
+    def tail(self):
+        """Extra seconds before the first output when this request hits a slow replica."""
+        p = self.profile
+        if p.slow_ratio and self.rng.random() < p.slow_ratio:
+            return p.slow_ms * self.rng.uniform(0.5, 1.5) / 1000.0
+        return 0.0
+
+
+class _Connection:
+    """Keep-alive connection to a provider: set-up is paid on first use and again after sitting idle."""
+
+    def __init__(self, profile, connect_ms):
+        self.profile = profile
+        self.connect_ms = connect_ms
+        self.last_used = None
+        self.connects = 0
+
+    def setup_s(self):
+        """Seconds of connection set-up the call about to be made pays (and marks the connection used)."""
+        now = time.monotonic()
+        idle = self.profile.connection_idle_s
+        cold = self.last_used is None or (idle > 0 and now - self.last_used > idle)
+        self.last_used = now
+        if cold and self.connect_ms:
+            self.connects += 1
+            return self.connect_ms / 1000
+        return 0.0
+
+
+class LocalOutputStream:
+    """Blocks on write() for as long as the audio would take to play."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.sample_rate = profile.sample_rate
+        self.speed = profile.speed
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        time.sleep(len(data) / (self.profile.sample_rate * 2) / self.profile.speed)
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class LocalAudioStream:
+    """Replaces PyAudio: mic input comes from a WAV file, output is paced by sleeping."""
+
+    def __init__(self, profile):
+        time.sleep(profile.audio_init_ms / 1000)
+        self.profile = profile
+        self.input_callback = None
+        self.frames_per_buffer = profile.input_chunk
+        self.output_stream = None
+
+    def start_output_stream(self):
+        self.output_stream = LocalOutputStream(self.profile)
+        return self.output_stream
+
+    def start_input_stream(self, callback, frames_per_buffer=None):
+        self.input_callback = callback
+        self.frames_per_buffer = frames_per_buffer or self.profile.input_chunk
+
+    def feed_wav(self, path, trailing_silence_ms=0):
+        """Pushes a recorded WAV (plus optional trailing silence) through the mic callback
+        at `speed` x real time (blocking)."""
+        with wave.open(path, "rb") as wf:
+            if wf.getframerate() != self.profile.sample_rate or wf.getnchannels() != 1:
+                raise ValueError(f"{path}: expected mono {self.profile.sample_rate} Hz audio")
+            audio = wf.readframes(wf.getnframes())
+        self.feed_pcm(audio + b"\x00" * (int(self.profile.sample_rate * trailing_silence_ms / 1000) * 2))
+
+    def feed_silence(self, ms, should_run=None):
+        """An empty room: `ms` of silence through the mic callback (blocking), stopping early
+        once `should_run()` turns false."""
+        self.feed_pcm(b"\x00" * (int(self.profile.sample_rate * ms / 1000) * 2), should_run)
+
+    def feed_pcm(self, audio, should_run=None):
+        chunk = self.frames_per_buffer * 2
+        start = time.perf_counter()
+        for offset in range(0, len(audio), chunk):
+            if should_run and not should_run():
+                break
+            frames = audio[offset:offset + chunk]
+            frame_count = len(frames) // 2
+            if self.input_callback:
+                self.input_callback(frames, frame_count, None, 0)
+            # Pace against the start time so sleep overshoot on small frames doesn't accumulate
+            due = (offset + len(frames)) / 2 / self.profile.sample_rate / self.profile.speed
+            time.sleep(max(0.0, due - (time.perf_counter() - start)))
+
+    def stop_streams(self):
+        self.input_callback = None
+
+
+class LocalSTTService:
+    """Emits interim transcripts as audio arrives and a final one on finalize()."""
+
+    def __init__(self, transcription_callback, loop, profile):
+        self.callback = transcription_callback
+        self.loop = loop
+        self.profile = profile
+        self.clock = _Clock(profile, "stt")
+        self.words = profile.transcript.split()
+        self.audio_bytes = 0
+        self.interims_sent = 0
+        self.is_connected = False
+
+    async def start(self):
+        await asyncio.sleep(self.profile.stt_connect_ms / 1000)
+        self.is_connected = True
+        return True
+
+    async def stop(self):
+        self.is_connected = False
+
+    async def send_audio(self, data):
+        if data.count(0) == len(data):
+            return  # digital silence (an empty room, keepalives) produces no words
+        self.audio_bytes += len(data)
+        audio_ms = self.audio_bytes / (self.profile.sample_rate * 2) * 1000
+        due = int(audio_ms // self.profile.stt_interim_ms)
+        if due > self.interims_sent:
+            self.interims_sent = due
+            # Reveal the transcript a couple of words per interim, like a streaming recognizer.
+            partial = " ".join(self.words[:min(len(self.words), due * 2)])
+            await self.callback(False, partial, 0.0)
+
+    async def finalize(self):
+        """Marks end of speech; delivers the final transcript after the endpointing delay."""
+        await asyncio.sleep(self.clock.delay(self.profile.stt_final_ms))
+        self.audio_bytes = 0
+        self.interims_sent = 0
+        await self.callback(True, self.profile.transcript, 0.99)
+
+
+class LocalRAGEngine:
+    """Synchronous search, like the real engine, with a fixed cost."""
+
+    def __init__(self, profile):
+        time.sleep(profile.rag_load_ms / 1000)
+        self.profile = profile
+        self.clock = _Clock(profile, "rag")
+
+    def search(self, text):
+        time.sleep(self.clock.delay(self.profile.rag_ms))
+        return self.profile.context
+
+
+class LocalLLMService:
+    """Streams the canned response to the token callback at a fixed rate."""
+
+    def __init__(self, token_callback, profile, replica=""):
+        time.sleep(profile.llm_init_ms / 1000)
+        self.token_callback = token_callback
+        self.profile = profile
+        self.clock = _Clock(profile, "llm" + replica)  # replicas draw independent delays
+        self.tokens = re.findall(r"\S+\s*", profile.response)
+        self.connection = _Connection(profile, profile.llm_connect_ms)
+        self.system_prompt = ""
+        self.cached_prefix = None  # system prompt of the previous request (the provider's prefix cache)
+
+    async def warmup(self):
+        await asyncio.sleep(self.connection.setup_s())
+
+    def prefill_s(self, text, context=None):
+        """Time to first token spent reading the prompt: the system prompt is cheap once cached."""
+        prefix = count_tokens(self.system_prompt)
+        if self.system_prompt and self.system_prompt == self.cached_prefix:
+            prefix *= self.profile.llm_cached_token_ratio
+        self.cached_prefix = self.system_prompt
+        return (prefix + count_tokens(text) + count_tokens(context)) * self.profile.llm_ms_per_prompt_token / 1000
+
+    async def process_text(self, text, context=None):
+        await asyncio.sleep(self.connection.setup_s() + self.prefill_s(text, context)
+                            + self.clock.delay(self.profile.llm_ttft_ms) + self.clock.tail())
+        interval = 1.0 / self.profile.llm_tokens_per_sec
+        for token in self.tokens:
+            await self.token_callback(token)
+            await asyncio.sleep(interval)
+
+
+class LocalTTSService:
+    """Synchronous chunk generator, like the real ElevenLabs stream."""
+
+    voice_id = "local"  # keeps stand-in audio out of the real voice's cache entries
+
+    def __init__(self, profile, replica=""):
+        time.sleep(profile.tts_init_ms / 1000)
+        self.profile = profile
+        self.clock = _Clock(profile, "tts" + replica)
+        self.connection = _Connection(profile, profile.tts_connect_ms)
+        self.sample_rate = profile.tts_sample_rate or profile.sample_rate
+        self.output_format = f"pcm_{profile.tts_sample_rate}" if profile.tts_sample_rate else ""
+
+    def warmup(self):
+        time.sleep(self.connection.setup_s())
+
+    def text_to_audio_stream(self, text):
+        time.sleep(self.connection.setup_s() + self.clock.delay(self.profile.tts_first_chunk_ms) + self.clock.tail())
+        total = int(len(text) * self.profile.tts_ms_per_char / 1000 * self.sample_rate) * 2
+        chunk = self.profile.output_chunk
+        chunk_secs = chunk / (self.sample_rate * 2)
+        jitter = self.profile.tts_chunk_jitter_ms
+        sent = 0
+        while sent < total:
+            size = min(chunk, total - sent)
+            yield b"\x00" * size
+            sent += size
+            if sent < total:
+                stall = self.clock.rng.expovariate(1000 / jitter) if jitter else 0.0
+                time.sleep(chunk_secs / self.profile.tts_realtime_factor + stall)
+
+
+class LocalVisionService:
+    """No webcam in benchmark mode."""
+
+    def __init__(self, trigger_callback, profile=None, presence_callback=None):
+        if profile:
+            time.sleep(profile.vision_init_ms / 1000)
+        self.trigger_callback = trigger_callback
+        self.presence_callback = presence_callback
+        self.fps = None
+
+    def start(self):
+        pass
+
+    def set_fps(self, fps):
+        self.fps = fps
+
+    def stop(self):
+        pass
+
+
+class LocalServices:
+    """Service factory handed to S2SPipeline in benchmark mode."""
+
+    def __init__(self, profile=None):
+        self.profile = profile or LocalProfile()
+
+    def audio_stream(self):
+        return LocalAudioStream(self.profile)
+
+    def rag_engine(self):
+        return LocalRAGEngine(self.profile)
+
+    def llm(self, token_callback):
+        return LocalLLMService(token_callback, self.profile)
+
+    def tts(self):
+        return LocalTTSService(self.profile)
+
+    def alternate_llm(self, token_callback):
+        return LocalLLMService(token_callback, self.profile, replica="-alt")
+
+    def alternate_tts(self):
+        return LocalTTSService(self.profile, replica="-alt")
+
+    def stt(self, transcription_callback, loop):
+        return LocalSTTService(transcription_callback, loop, self.profile)
+
+    def vision(self, trigger_callback, presence_callback=None):
+        return LocalVisionService(trigger_callback, self.profile, presence_callback)
@@ -0,0 +1,282 @@
+"""
+Hedged requests across LLM / TTS providers.
+
+HedgedLLM and HedgedTTS keep the process_text / text_to_audio_stream
+interfaces over two or more providers. A request goes to the provider with
+the lowest recent median time to first output; if nothing has arrived by its
+`pct`-th percentile, the next provider is tried too, and the first to produce
+output wins while the other is cancelled. ProviderRouter keeps the per-provider
+timings and probes the least recently used provider every `probe_every`-th
+request. See bench_hedge.py.
+"""
+import asyncio
+import inspect
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.latency_stats import percentile, summarize
+
+logger = logging.getLogger("ProviderRouter")
+
+
+class ProviderRouter:
+    def __init__(self, names, pct=90.0, min_ms=100.0, max_ms=3000.0, initial_ms=1000.0, min_samples=10,
+                 window=200, probe_every=20):
+        self.names = list(names)
+        self.pct = pct
+        self.min_ms = min_ms            # never hedge sooner than this
+        self.max_ms = max_ms            # always hedge by this
+        self.initial_ms = initial_ms    # deadline until a provider has `min_samples`
+        self.min_samples = min_samples
+        self.probe_every = probe_every  # 0 = always the fastest first
+        self.samples = {name: deque(maxlen=window) for name in self.names}
+        self.last_used = {name: -1 for name in self.names}
+        self.requests = 0
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "cancelled": 0, "failures": 0}
+        self.wins = {name: 0 for name in self.names}
+
+    def median(self, name):
+        samples = self.samples[name]
+        return percentile(samples, 50) if len(samples) >= self.min_samples else None
+
+    def order(self):
+        """Providers for the next request, first choice first."""
+        self.requests += 1
+        self.counters["requests"] += 1
+        ranked = sorted(self.names, key=lambda n: (self.median(n) is None, self.median(n) or 0.0))
+        if self.probe_every and self.requests % self.probe_every == 0:
+            stale = min(self.names, key=lambda n: self.last_used[n])
+            ranked.remove(stale)
+            ranked.insert(0, stale)
+        self.last_used[ranked[0]] = self.requests
+        return ranked
+
+    def deadline_s(self, name):
+        """How long to wait for `name`'s first output before hedging."""
+        samples = self.samples[name]
+        ms = percentile(samples, self.pct) if len(samples) >= self.min_samples else self.initial_ms
+        return min(self.max_ms, max(self.min_ms, ms)) / 1000
+
+    def first_output(self, name, ms, hedged):
+        self.samples[name].append(ms)
+        self.last_used[name] = self.requests
+        self.wins[name] += 1
+        if hedged:
+            self.counters["hedge_wins"] += 1
+
+    def cancelled(self, name, elapsed_ms):
+        self.samples[name].append(elapsed_ms)  # censored: it would have taken at least this long
+        self.counters["cancelled"] += 1
+
+    def failed(self, name):
+        self.counters["failures"] += 1
+
+    def stats(self):
+        requests = self.counters["requests"]
+        return dict(
+            self.counters,
+            hedge_ratio=self.counters["hedged"] / requests if requests else 0.0,
+            providers={name: dict(summarize(list(self.samples[name])), wins=self.wins[name]) for name in self.names},
+        )
+
+
+class _Race:
+    def __init__(self, first):
+        self.first = first    # the provider asked first; a win by any other is a hedge win
+        self.winner = None
+        self.decided = asyncio.Event()
+        self.started = {}     # provider -> start time
+
+
+class HedgedLLM:
+    """LLMService over several providers: `providers` is [(name, factory(token_callback))]."""
+
+    def __init__(self, providers, token_callback, router=None):
+        self.token_callback = token_callback
+        self.router = router or ProviderRouter([name for name, _ in providers])
+        self.providers = {name: factory(self.route(name)) for name, factory in providers}
+        self.race = None
+
+    def route(self, name):
+        """Token callback for one provider: the first to produce a token wins, the others' tokens are dropped."""
+        async def on_token(token):
+            race = self.race
+            if race is None:
+                return
+            if race.winner is None:
+                race.winner = name
+                self.router.first_output(name, (time.perf_counter() - race.started[name]) * 1000,
+                                         hedged=name != race.first)
+                race.decided.set()
+            if race.winner == name:
+                await self.token_callback(token)
+        return on_token
+
+    @property
+    def system_prompt(self):
+        return next(iter(self.providers.values())).system_prompt
+
+    @system_prompt.setter
+    def system_prompt(self, prompt):
+        for llm in self.providers.values():
+            if hasattr(llm, "system_prompt"):
+                llm.system_prompt = prompt
+
+    async def warmup(self):
+        warmups = [llm.warmup() for llm in self.providers.values() if hasattr(llm, "warmup")]
+        await asyncio.gather(*[w for w in warmups if inspect.isawaitable(w)], return_exceptions=True)
+
+    async def process_text(self, text, context=None):
+        order = self.router.order()
+        race = self.race = _Race(order[0])
+        spare = order[1:]
+        tasks = {}
+
+        def launch(name):
+            race.started[name] = time.perf_counter()
+            tasks[name] = asyncio.ensure_future(self.providers[name].process_text(text, context))
+            return name
+
+        last = launch(order[0])
+        error = None
+        try:
+            while race.winner is None:
+                running = [task for task in tasks.values() if not task.done()]
+                if not running:
+                    if not spare:
+                        break
+                    last = launch(spare.pop(0))  # everything asked so far failed: fail over
+                    continue
+                timeout = None
+                if spare:
+                    timeout = max(0.0, self.router.deadline_s(last) - (time.perf_counter() - race.started[last]))
+                waiter = asyncio.ensure_future(race.decided.wait())
+                done, _ = await asyncio.wait(running + [waiter], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if race.winner is not None:
+                    break
+                for name, task in tasks.items():
+                    if task in done and task.exception() is not None:
+                        error = task.exception()
+                        self.router.failed(name)
+                        logger.warning(f"LLM provider {name} failed: {error}")
+                if spare and not done:
+                    # Past the deadline: ask the next provider too
+                    self.router.counters["hedged"] += 1
+                    logger.info(f"LLM hedge: no token from {last} after "
+                                f"{(time.perf_counter() - race.started[last]) * 1000:.0f} ms, asking {spare[0]}")
+                    last = launch(spare.pop(0))
+            if race.winner is None:
+                if error is not None:
+                    raise error
+                return  # every provider finished without a token
+            for name, task in tasks.items():
+                if name != race.winner and not task.done():
+                    task.cancel()
+                    self.router.cancelled(name, (time.perf_counter() - race.started[name]) * 1000)
+            await tasks[race.winner]
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+            if self.race is race:
+                self.race = None
+
+    def stats(self):
+        return self.router.stats()
+
+
+class HedgedTTS:
+    """TTSService over several providers: `providers` is [(name, tts)]. Runs on the TTS thread, like the
+    service it replaces; each provider's first chunk is awaited on a helper thread. Providers should share
+    a voice and output format (the audio cache and the playback converter see the first one's)."""
+
+    def __init__(self, providers, router=None):
+        self.providers = dict(providers)
+        self.router = router or ProviderRouter(list(self.providers))
+        self.executor = ThreadPoolExecutor(max_workers=2 * len(self.providers), thread_name_prefix="TTSHedge")
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name == "providers":
+            raise AttributeError(name)
+        return getattr(next(iter(self.providers.values())), name)
+
+    def first_chunk(self, name, text, race, results):
+        """Helper thread: starts `name`'s stream and reports its first chunk; a loser's stream is closed."""
+        generator, chunk, error = None, None, None
+        try:
+            generator = self.providers[name].text_to_audio_stream(text)
+            chunk = next(generator, None)
+        except Exception as e:
+            error = e
+        with self.lock:
+            if race["winner"] is None:
+                results.put((name, generator, chunk, error))
+                return
+        if generator is not None:
+            generator.close()
+
+    def text_to_audio_stream(self, text):
+        order = self.router.order()
+        spare = order[1:]
+        race = {"winner": None}
+        results = queue.Queue()
+        started, pending = {}, set()
+
+        def launch(name):
+            started[name] = time.perf_counter()
+            pending.add(name)
+            self.executor.submit(self.first_chunk, name, text, race, results)
+            return name
+
+        last = launch(order[0])
+        error = None
+        while pending:
+            timeout = None
+            if spare:
+                timeout = max(0.0, self.router.deadline_s(last) - (time.perf_counter() - started[last]))
+            try:
+                name, generator, chunk, err = results.get(timeout=timeout)
+            except queue.Empty:
+                self.router.counters["hedged"] += 1
+                logger.info(f"TTS hedge: no audio from {last} after "
+                            f"{(time.perf_counter() - started[last]) * 1000:.0f} ms, asking {spare[0]}")
+                last = launch(spare.pop(0))
+                continue
+            pending.discard(name)
+            if chunk is None:
+                if err is not None:
+                    error = err
+                    self.router.failed(name)
+                    logger.warning(f"TTS provider {name} failed: {err}")
+                if generator is not None:
+                    generator.close()
+                if spare and not pending:
+                    last = launch(spare.pop(0))
+                continue
+
+            with self.lock:
+                race["winner"] = name
+            self.router.first_output(name, (time.perf_counter() - started[name]) * 1000, hedged=name != order[0])
+            for other in pending:
+                self.router.cancelled(other, (time.perf_counter() - started[other]) * 1000)
+            while not results.empty():  # reported before the winner was set
+                other_generator = results.get_nowait()[1]
+                if other_generator is not None:
+                    other_generator.close()
+            try:
+                yield chunk
+                yield from generator
+            finally:
+                generator.close()
+            return
+        if error is not None:
+            raise error
+
+    def stats(self):
+        return self.router.stats()
@@ -0,0 +1,352 @@
+"""
+Deepgram streaming STT that survives dropped connections.
+
+ResilientSTTService keeps a hot standby connection, sends keepalives on idle
+connections and, after a fail-over, resends the audio since the last delivered
+final on the new connection. Connections come from an async factory
+`connect(on_result, on_closed)`; deepgram_connector() builds one for
+/v1/listen. See bench_stt.py.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from urllib.parse import urlencode
+
+from utils.latency_stats import summarize
+
+logger = logging.getLogger("ResilientSTT")
+
+DEEPGRAM_URL = "wss://api.deepgram.com/v1/listen"
+DEEPGRAM_OPTIONS = {
+    "model": "nova-2", "language": "en-US", "smart_format": "true", "interim_results": "true",
+    "encoding": "linear16", "sample_rate": 16000, "channels": 1, "endpointing": 300,
+}
+
+
+class DeepgramConnection:
+    """One /v1/listen stream: audio out, Results in. Reports results and an unexpected close to its owner."""
+
+    def __init__(self, url, headers, on_result, on_closed, open_timeout=5.0):
+        self.url = url
+        self.headers = headers
+        self.on_result = on_result      # async (connection, text, confidence, is_final, speech_final, end_s)
+        self.on_closed = on_closed      # (connection, error)
+        self.open_timeout = open_timeout
+        self.ws = None
+        self.reader = None
+        self.closed = False
+        self.last_sent = time.monotonic()
+
+    async def open(self):
+        import websockets  # >= 14: older versions name additional_headers extra_headers
+        self.ws = await websockets.connect(self.url, additional_headers=self.headers, open_timeout=self.open_timeout,
+                                           compression=None, ping_interval=None)
+        self.reader = asyncio.ensure_future(self.read())
+        return self
+
+    async def read(self):
+        error = None
+        try:
+            async for message in self.ws:
+                if isinstance(message, bytes):
+                    continue
+                result = json.loads(message)
+                if result.get("type") != "Results":
+                    continue
+                alternative = result["channel"]["alternatives"][0]
+                end_s = result["start"] + result["duration"] if "start" in result and "duration" in result else None
+                await self.on_result(self, alternative.get("transcript", ""), alternative.get("confidence", 0.0),
+                                     result.get("is_final", False),
+                                     result.get("speech_final", False) or result.get("from_finalize", False), end_s)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            error = e
+        if not self.closed:
+            self.closed = True
+            self.on_closed(self, error or ConnectionError("stream closed by server"))
+
+    async def send(self, data):
+        if self.closed:
+            raise ConnectionError("stream is closed")
+        await self.ws.send(data)
+        self.last_sent = time.monotonic()
+
+    async def keepalive(self):
+        await self.ws.send(json.dumps({"type": "KeepAlive"}))
+        self.last_sent = time.monotonic()
+
+    async def finalize(self):
+        """Asks for the pending audio's final transcript without waiting for endpointing."""
+        await self.ws.send(json.dumps({"type": "Finalize"}))
+
+    async def close(self):
+        if self.closed and self.ws is None:
+            return
+        self.closed = True
+        if self.reader:
+            self.reader.cancel()
+        if self.ws is not None:
+            try:
+                await self.ws.send(json.dumps({"type": "CloseStream"}))
+                await self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+
+
+def deepgram_connector(api_key, url=DEEPGRAM_URL, options=None, open_timeout=5.0):
+    """Factory for ResilientSTTService: opens one authenticated /v1/listen stream per call."""
+    full_url = f"{url}?{urlencode(DEEPGRAM_OPTIONS if options is None else options)}"
+    headers = {"Authorization": f"Token {api_key}"} if api_key else {}
+
+    async def connect(on_result, on_closed):
+        return await DeepgramConnection(full_url, headers, on_result, on_closed, open_timeout).open()
+    return connect
+
+
+class ResilientSTTService:
+    def __init__(self, transcription_callback, loop, connect, standby=True, replay=True, reconnect=True,
+                 keepalive_s=5.0, connect_attempts=5, backoff_s=0.5, replay_limit_s=30.0, sample_rate=16000):
+        self.callback = transcription_callback  # async (is_final, text, confidence), like STTService
+        self.loop = loop
+        self.connect = connect
+        self.use_standby = standby
+        self.use_replay = replay
+        self.use_reconnect = reconnect
+        self.keepalive_s = keepalive_s
+        self.connect_attempts = connect_attempts
+        self.backoff_s = backoff_s
+        self.bytes_per_s = sample_rate * 2
+        self.replay_limit = int(replay_limit_s * self.bytes_per_s)
+
+        self.active = None
+        self.standby = None
+        self.standby_task = None
+        self.failover_task = None
+        self.keepalive_task = None
+        self.is_connected = False
+        self.on_reconnect = None    # optional callback(ms) after every fail-over (the pipeline traces it)
+
+        # Replay buffer: (stream offset, chunk) for the audio since the last final segment
+        self.replay = deque()
+        self.replay_bytes = 0
+        self.stream_bytes = 0       # audio accepted so far; offsets are positions in this stream
+        self.active_offset = 0      # stream offset of the active connection's first byte
+        self.segments = []          # final segments of the utterance in progress (speech_final not yet seen)
+        self.deliveries = set()     # transcript callbacks still running (a final's runs the whole turn)
+
+        self.counters = {"drops": 0, "promotions": 0, "reconnects": 0, "connect_failures": 0,
+                         "replayed_bytes": 0, "lost_bytes": 0, "keepalives": 0}
+        self.reconnect_ms = deque(maxlen=1000)
+
+    async def open_connection(self):
+        for attempt in range(self.connect_attempts):
+            try:
+                return await self.connect(self.on_result, self.on_closed)
+            except TypeError:
+                raise  # the client library doesn't take our arguments (websockets < 14): retrying can't help
+            except Exception as e:
+                self.counters["connect_failures"] += 1
+                delay = self.backoff_s * 2 ** attempt
+                logger.warning(f"STT connect attempt {attempt + 1}/{self.connect_attempts} failed: {e}")
+                if attempt + 1 < self.connect_attempts:
+                    await asyncio.sleep(delay)
+        raise ConnectionError(f"no STT connection after {self.connect_attempts} attempts")
+
+    async def start(self):
+        # A restart (idle mode reconnects) begins a new stream: nothing from before it is replayed
+        self.replay.clear()
+        self.replay_bytes = 0
+        self.segments = []
+        try:
+            self.active = await self.open_connection()
+        except ConnectionError as e:
+            logger.error(str(e))
+            return False
+        self.active_offset = self.stream_bytes
+        self.is_connected = True
+        self.keepalive_task = asyncio.ensure_future(self.keep_alive())
+        self.refill_standby()
+        logger.info("STT connected" + (" (standby opening in the background)" if self.use_standby else ""))
+        return True
+
+    async def stop(self):
+        self.is_connected = False
+        for task in (self.keepalive_task, self.standby_task, self.failover_task, *self.deliveries):
+            if task and not task.done():
+                task.cancel()
+        for conn in (self.active, self.standby):
+            if conn:
+                await conn.close()
+        self.active = self.standby = None
+
+    def refill_standby(self):
+        if self.use_standby and self.is_connected and self.standby is None and (
+                self.standby_task is None or self.standby_task.done()):
+            self.standby_task = asyncio.ensure_future(self.open_standby())
+
+    async def open_standby(self):
+        try:
+            conn = await self.open_connection()
+        except ConnectionError:
+            return
+        if not self.is_connected:
+            await conn.close()
+            return
+        self.standby = conn
+
+    async def send_audio(self, data):
+        offset = self.stream_bytes
+        self.stream_bytes += len(data)
+        if self.use_replay:
+            self.replay.append((offset, data))
+            self.replay_bytes += len(data)
+            while self.replay_bytes > self.replay_limit and len(self.replay) > 1:
+                self.replay_bytes -= len(self.replay.popleft()[1])
+        if self.failover_task and not self.failover_task.done():
+            if not self.use_replay:
+                self.counters["lost_bytes"] += len(data)
+            return  # the fail-over sends it once the new connection is up
+        if self.active is None:
+            return
+        try:
+            await self.active.send(data)
+        except Exception as e:
+            self.fail_over(self.active, e)
+
+    async def finalize(self):
+        if self.active and not self.active.closed:
+            await self.active.finalize()
+
+    def on_closed(self, conn, error):
+        if conn is self.standby:
+            self.standby = None
+            self.refill_standby()
+        elif conn is self.active:
+            self.fail_over(conn, error)
+
+    def fail_over(self, conn, error):
+        """Replaces the dropped active connection (single flight); returns the fail-over task."""
+        if not self.is_connected or conn is not self.active:
+            return self.failover_task
+        if self.failover_task is None or self.failover_task.done():
+            self.counters["drops"] += 1
+            logger.warning(f"STT connection dropped: {error}")
+            self.failover_task = asyncio.ensure_future(self._fail_over())
+        return self.failover_task
+
+    async def _fail_over(self):
+        started = time.perf_counter()
+        dropped, self.active = self.active, None
+        self.loop.create_task(dropped.close())
+        while self.is_connected:
+            if self.standby is not None and not self.standby.closed:
+                conn, self.standby = self.standby, None
+                self.counters["promotions"] += 1
+            elif self.use_reconnect:
+                try:
+                    conn = await self.open_connection()
+                except ConnectionError as e:
+                    logger.error(f"STT fail-over gave up: {e}")
+                    self.is_connected = False
+                    return
+                self.counters["reconnects"] += 1
+            else:
+                self.is_connected = False
+                logger.error("STT connection lost (reconnect disabled)")
+                return
+            try:
+                await self.catch_up(conn)
+            except Exception as e:
+                logger.warning(f"STT replacement dropped during replay: {e}")
+                self.counters["drops"] += 1
+                self.loop.create_task(conn.close())
+                continue
+            break
+        ms = (time.perf_counter() - started) * 1000
+        self.reconnect_ms.append(ms)
+        logger.info(f"STT failed over in {ms:.0f} ms")
+        if self.on_reconnect:
+            self.on_reconnect(ms)
+        self.refill_standby()
+
+    async def catch_up(self, conn):
+        """Sends the buffered audio since the last final (and whatever arrives meanwhile), then goes live."""
+        if not self.use_replay:
+            self.active_offset = self.stream_bytes
+            self.active = conn
+            return
+        position = self.replay[0][0] if self.replay else self.stream_bytes
+        self.active_offset = position
+        while True:
+            pending = [(offset, chunk) for offset, chunk in self.replay if offset >= position]
+            if not pending:
+                break
+            for offset, chunk in pending:
+                await conn.send(chunk)
+                self.counters["replayed_bytes"] += len(chunk)
+                position = offset + len(chunk)
+        # No await between the last check and here: send_audio sees the new connection from its next chunk on
+        self.active = conn
+
+    async def on_result(self, conn, text, confidence, is_final, speech_final, end_s):
+        if conn is not self.active:
+            return  # standby streams carry no audio; a dropped stream's late results are replayed instead
+        if is_final:
+            self.trim_replay(end_s)
+            if text:
+                self.segments.append(text)
+            if speech_final:
+                # An empty final still ends the utterance (the pipeline clears a barge-in on it)
+                utterance, self.segments = " ".join(self.segments), []
+                self.deliver(True, utterance, confidence)
+            return
+        self.deliver(False, " ".join(self.segments + [text]).strip(), confidence)
+
+    def deliver(self, is_final, text, confidence):
+        """Runs the pipeline's callback as its own task: a final's runs retrieval and the LLM, and the
+        connection's reader has to keep reading interims and control frames meanwhile."""
+        task = self.loop.create_task(self.callback(is_final, text, confidence))
+        self.deliveries.add(task)
+        task.add_done_callback(self._delivered)
+
+    def _delivered(self, task):
+        self.deliveries.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Transcript callback failed: {task.exception()}")
+
+    def trim_replay(self, end_s):
+        """Drops buffered audio the final segment ending at `end_s` (connection time) has covered."""
+        if end_s is None:
+            cut = self.stream_bytes
+        else:
+            cut = self.active_offset + int(end_s * self.bytes_per_s)
+        while self.replay and self.replay[0][0] + len(self.replay[0][1]) <= cut:
+            self.replay_bytes -= len(self.replay.popleft()[1])
+
+    async def keep_alive(self):
+        while self.is_connected:
+            await asyncio.sleep(min(1.0, self.keepalive_s / 2))
+            now = time.monotonic()
+            for conn in (self.active, self.standby):
+                if conn is None or conn.closed or now - conn.last_sent < self.keepalive_s:
+                    continue
+                try:
+                    await conn.keepalive()
+                    self.counters["keepalives"] += 1
+                except Exception as e:
+                    self.on_closed(conn, e)
+
+    def stats(self):
+        return dict(
+            self.counters,
+            connected=self.is_connected,
+            standby_ready=self.standby is not None and not self.standby.closed,
+            replay_buffered_bytes=self.replay_bytes,
+            failovers=len(self.reconnect_ms),
+            last_reconnect_ms=self.reconnect_ms[-1] if self.reconnect_ms else None,
+            reconnect_ms=summarize(list(self.reconnect_ms)),
+        )
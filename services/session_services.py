@@ -0,0 +1,185 @@
+"""
+Per-session services for server mode (see server.py).
+
+A kiosk session has no local mic, speaker or webcam: mic audio arrives as
+frames on its network connection and synthesized audio is sent back on it.
+The RAG engine is shared by all sessions. Each session builds its own LLM /
+TTS clients, but their calls take a process-wide slot (a semaphore) first, so
+N kiosks can't open N unbounded upstream streams. These are concurrency
+limits, not connection pools: clients are not shared or reused between
+sessions. STT stays one streaming connection per session (the server bounds
+sessions).
+"""
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger("SessionServices")
+
+
+class SessionOutputStream:
+    """Sends synthesized audio to the kiosk. write() blocks for the audio's play time, like a
+    sound card would, so the pipeline's speaking/echo-mute logic tracks what the kiosk is playing."""
+
+    def __init__(self, connection, sample_rate=16000, speed=1.0):
+        self.connection = connection
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        self.connection.send_audio(bytes(data))
+        time.sleep(len(data) / (self.sample_rate * 2) / self.speed)
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SessionAudioStream:
+    """AudioStream replacement fed by the session's connection."""
+
+    def __init__(self, connection, sample_rate=16000, speed=1.0):
+        self.connection = connection
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.input_callback = None
+        self.output_stream = None
+
+    def start_output_stream(self):
+        self.output_stream = SessionOutputStream(self.connection, self.sample_rate, self.speed)
+        return self.output_stream
+
+    def start_input_stream(self, callback, frames_per_buffer=None):
+        self.input_callback = callback  # frame size is whatever the kiosk sends
+
+    def feed(self, pcm):
+        """Called with each audio frame received from the kiosk."""
+        if self.input_callback:
+            self.input_callback(pcm, len(pcm) // 2, None, 0)
+
+    def stop_streams(self):
+        self.input_callback = None
+
+
+class SlotLimitedLLM:
+    """Wraps one session's own LLM client; at most `slots` generations run at once across sessions.
+    Attribute reads and writes other than its own go to the client (e.g. system_prompt)."""
+
+    OWN = ("llm", "slots", "counters")
+
+    def __init__(self, llm, slots, counters):
+        self.llm = llm
+        self.slots = slots  # asyncio.Semaphore shared by all sessions
+        self.counters = counters
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def __setattr__(self, name, value):
+        if name in self.OWN:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.llm, name, value)
+
+    async def process_text(self, text, context=None):
+        started = time.perf_counter()
+        async with self.slots:
+            self.counters["llm_wait_ms"] += (time.perf_counter() - started) * 1000
+            self.counters["llm_calls"] += 1
+            return await self.llm.process_text(text, context)
+
+
+class SlotLimitedTTS:
+    """Wraps one session's own TTS client; at most `slots` synthesis streams run at once across sessions.
+    Sits under CachedTTSService, so cache hits never take a slot. Other attributes go to the client."""
+
+    OWN = ("tts", "slots", "counters")
+
+    def __init__(self, tts, slots, counters):
+        self.tts = tts
+        self.slots = slots  # threading.BoundedSemaphore shared by all sessions (TTS runs on threads)
+        self.counters = counters
+
+    def __getattr__(self, name):
+        return getattr(self.tts, name)
+
+    def __setattr__(self, name, value):
+        if name in self.OWN:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.tts, name, value)
+
+    def text_to_audio_stream(self, text):
+        started = time.perf_counter()
+        with self.slots:
+            self.counters["tts_wait_ms"] += (time.perf_counter() - started) * 1000
+            self.counters["tts_calls"] += 1
+            yield from self.tts.text_to_audio_stream(text)
+
+
+class SessionVision:
+    """No webcam on the server; the kiosk reports presence over the connection instead."""
+
+    def __init__(self, trigger_callback, presence_callback=None):
+        self.trigger_callback = trigger_callback
+        self.presence_callback = presence_callback
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class SessionPools:
+    """Process-wide LLM / TTS slots (semaphores, not client pools) and their wait counters."""
+
+    def __init__(self, llm_slots=4, tts_slots=4):
+        self.llm = asyncio.Semaphore(llm_slots)
+        self.tts = threading.BoundedSemaphore(tts_slots)
+        self.sizes = {"llm_slots": llm_slots, "tts_slots": tts_slots}
+        self.counters = {"llm_calls": 0, "llm_wait_ms": 0.0, "tts_calls": 0, "tts_wait_ms": 0.0}
+
+    def stats(self):
+        return dict(self.sizes, **self.counters)
+
+
+class SessionServices:
+    """Service factory handed to S2SPipeline for one server session."""
+
+    def __init__(self, base, connection, rag_engine, pools, sample_rate=16000, speed=1.0):
+        self.base = base  # LiveServices or LocalServices: builds the real STT/LLM/TTS clients
+        self.connection = connection
+        self.shared_rag_engine = rag_engine
+        self.pools = pools
+        self.sample_rate = sample_rate
+        self.speed = speed
+
+    def audio_stream(self):
+        return SessionAudioStream(self.connection, self.sample_rate, self.speed)
+
+    def rag_engine(self):
+        return self.shared_rag_engine
+
+    def llm(self, token_callback):
+        return SlotLimitedLLM(self.base.llm(token_callback), self.pools.llm, self.pools.counters)
+
+    def tts(self):
+        return SlotLimitedTTS(self.base.tts(), self.pools.tts, self.pools.counters)
+
+    def alternate_llm(self, token_callback):
+        return SlotLimitedLLM(self.base.alternate_llm(token_callback), self.pools.llm, self.pools.counters)
+
+    def alternate_tts(self):
+        return SlotLimitedTTS(self.base.alternate_tts(), self.pools.tts, self.pools.counters)
+
+    def stt(self, transcription_callback, loop):
+        return self.base.stt(transcription_callback, loop)
+
+    def vision(self, trigger_callback, presence_callback=None):
+        return SessionVision(trigger_callback, presence_callback)
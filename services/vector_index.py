@@ -0,0 +1,260 @@
+"""
+Precomputed, memory-mapped vector index for the startup directory.
+
+An offline build embeds every directory entry once and writes:
+    meta.json                 model, dimension, the directory file's sha256 and per-entry metadata
+    vectors-<hash>.npy        (n, dim) normalized float32 embeddings
+    vectors-<hash>.i8.npy     optional int8 quantization, with per-row scales in scales-<hash>.npy
+
+At runtime the .npy files are opened with mmap, so startup is a JSON read
+and the OS pages vectors in on demand; a query batch is one matrix product
+plus argpartition. When the directory file changes, only entries whose text
+changed are re-embedded. meta.json is replaced last, so a reader never sees a
+half-written index.
+
+    python -m services.vector_index build [--int8]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from utils.directory import DIRECTORY_PATH, load_directory, tokenize
+
+logger = logging.getLogger("VectorIndex")
+
+INDEX_DIR = os.path.join("cache", "vector_index")
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+FORMAT_VERSION = 1
+
+
+def hashed_embedding(text, dim=256):
+    """Bag of words + bigrams hashed into a unit vector; stands in when no embedding model is loaded."""
+    words = tokenize(text)
+    vector = np.zeros(dim, dtype=np.float32)
+    for term in words + [a + " " + b for a, b in zip(words, words[1:])]:
+        vector[int.from_bytes(hashlib.md5(term.encode()).digest()[:4], "little") % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class HashedEmbedder:
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashed-{dim}"
+
+    def encode(self, texts):
+        return np.stack([hashed_embedding(t, self.dim) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+
+class SentenceTransformerEmbedder:
+    """Wraps an already-loaded SentenceTransformer (e.g. RAGEngine.model) or loads one on first use."""
+
+    def __init__(self, model=None, name=DEFAULT_MODEL):
+        self.model = model
+        self.name = name
+
+    def encode(self, texts):
+        if self.model is None:
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.name)
+        return np.asarray(self.model.encode(list(texts), normalize_embeddings=True), dtype=np.float32)
+
+
+def default_embedder(engine=None, name=DEFAULT_MODEL):
+    """The engine's own model if it has one, else sentence-transformers if installed, else hashed vectors."""
+    if engine is not None and hasattr(engine, "model"):
+        return SentenceTransformerEmbedder(engine.model, name)
+    try:
+        import sentence_transformers  # noqa: F401
+        return SentenceTransformerEmbedder(None, name)
+    except ImportError:
+        logger.warning("sentence-transformers not installed; vector index uses hashed embeddings")
+        return HashedEmbedder()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def quantize(vectors):
+    """Symmetric per-row int8 quantization; returns (int8 matrix, float32 scales)."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class VectorIndex:
+    def __init__(self, index_dir, meta, vectors, scales=None):
+        self.index_dir = index_dir
+        self.meta = meta
+        self.entries = meta["entries"]
+        self.vectors = vectors  # (n, dim) float32 or int8, memory-mapped
+        self.scales = scales    # (n,) float32 when int8
+        self.dim = meta["dim"]
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR, int8=False):
+        """Opens an existing index (memory-mapped); None if there is none or it is incomplete."""
+        try:
+            with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != FORMAT_VERSION:
+                return None
+            if int8 and meta.get("int8"):
+                vectors = np.load(os.path.join(index_dir, meta["int8"]["vectors"]), mmap_mode="r")
+                scales = np.load(os.path.join(index_dir, meta["int8"]["scales"]), mmap_mode="r")
+                return cls(index_dir, meta, vectors, scales)
+            return cls(index_dir, meta, np.load(os.path.join(index_dir, meta["vectors"]), mmap_mode="r"))
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"No usable vector index in {index_dir}: {e}")
+            return None
+
+    @classmethod
+    def ensure(cls, directory_path=DIRECTORY_PATH, index_dir=INDEX_DIR, embedder=None, int8=False):
+        """Loads the index if it matches the directory file and model; otherwise (re)builds it."""
+        if not os.path.exists(directory_path):
+            return None
+        embedder = embedder or default_embedder()
+        digest = file_sha256(directory_path)
+        index = cls.load(index_dir, int8)
+        if index and index.meta["directory_sha256"] == digest and index.meta["model"] == embedder.name \
+                and (not int8 or index.scales is not None):
+            return index
+        stats = build(directory_path, index_dir, embedder, int8, digest)
+        logger.info(f"Vector index rebuilt: {stats['embedded']} embedded, {stats['reused']} reused "
+                    f"in {stats['seconds'] * 1000:.0f} ms")
+        return cls.load(index_dir, int8)
+
+    def scores(self, queries, block=4096):
+        """Cosine scores (n_queries, n_entries); int8 rows are dequantized a block at a time."""
+        if self.scales is None:
+            return queries @ self.vectors.T
+        out = np.empty((len(queries), len(self.entries)), dtype=np.float32)
+        for start in range(0, len(self.entries), block):
+            rows = self.vectors[start:start + block].astype(np.float32)
+            out[:, start:start + block] = (queries @ rows.T) * self.scales[start:start + block]
+        return out
+
+    def search(self, queries, k=3):
+        """Top-k (row, score) lists for a batch of normalized query vectors."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(self.entries) == 0:
+            return [[] for _ in range(len(queries))]
+        scores = self.scores(queries)
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for q, rows in enumerate(top):
+            rows = rows[np.argsort(-scores[q, rows])]
+            results.append([(int(r), float(scores[q, r])) for r in rows])
+        return results
+
+    def hits(self, queries, k=3, min_score=0.0):
+        """Ranked {name, text, score} dicts per query, like the other retrieval paths."""
+        return [
+            [{"name": self.entries[r]["name"], "text": self.entries[r]["text"], "score": s}
+             for r, s in rows if s >= min_score]
+            for rows in self.search(queries, k)
+        ]
+
+
+def build(directory_path=DIRECTORY_PATH, index_dir=INDEX_DIR, embedder=None, int8=False, digest=None):
+    """Embeds the directory into index_dir, reusing vectors of entries whose text is unchanged."""
+    started = time.perf_counter()
+    embedder = embedder or default_embedder()
+    digest = digest or file_sha256(directory_path)
+    entries = load_directory(directory_path)
+    texts = [e.text for e in entries]
+    hashes = [text_hash(t) for t in texts]
+
+    previous = VectorIndex.load(index_dir)
+    reuse = {}
+    if previous is not None and previous.meta["model"] == embedder.name:
+        reuse = {entry["hash"]: row for row, entry in enumerate(previous.entries)}
+    missing = [i for i, h in enumerate(hashes) if h not in reuse]
+    fresh = embedder.encode([texts[i] for i in missing]) if missing else None
+
+    dim = fresh.shape[1] if fresh is not None and len(fresh) else (previous.dim if previous else 0)
+    vectors = np.zeros((len(entries), dim), dtype=np.float32)
+    for i, h in enumerate(hashes):
+        if h in reuse:
+            vectors[i] = previous.vectors[reuse[h]]
+    if missing:
+        vectors[missing] = fresh
+
+    os.makedirs(index_dir, exist_ok=True)
+    tag = digest[:12]
+    meta = {
+        "version": FORMAT_VERSION,
+        "model": embedder.name,
+        "dim": dim,
+        "directory_sha256": digest,
+        "built_at": time.time(),
+        "vectors": f"vectors-{tag}.npy",
+        "entries": [{"name": e.name, "text": e.text, "hash": h} for e, h in zip(entries, hashes)],
+    }
+    _save(os.path.join(index_dir, meta["vectors"]), vectors)
+    if int8:
+        q, scales = quantize(vectors)
+        meta["int8"] = {"vectors": f"vectors-{tag}.i8.npy", "scales": f"scales-{tag}.npy"}
+        _save(os.path.join(index_dir, meta["int8"]["vectors"]), q)
+        _save(os.path.join(index_dir, meta["int8"]["scales"]), scales)
+
+    tmp = os.path.join(index_dir, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(index_dir, "meta.json"))
+    _remove_stale(index_dir, meta)
+    return {"entries": len(entries), "embedded": len(missing), "reused": len(entries) - len(missing),
+            "seconds": time.perf_counter() - started}
+
+
+def _save(path, array):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _remove_stale(index_dir, meta):
+    keep = {"meta.json", meta["vectors"]} | set((meta.get("int8") or {}).values())
+    for name in os.listdir(index_dir):
+        if name.endswith(".npy") and name not in keep:
+            try:
+                os.remove(os.path.join(index_dir, name))
+            except OSError:
+                pass  # still mapped by a running process on some platforms; removed next build
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the memory-mapped directory vector index.")
+    parser.add_argument("command", choices=("build",))
+    parser.add_argument("--directory", default=DIRECTORY_PATH)
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--int8", action="store_true", help="also write the int8-quantized vectors")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="sentence-transformers model name")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    result = build(args.directory, args.index_dir, default_embedder(name=args.model), args.int8)
+    print(f"{result['entries']} entries ({result['embedded']} embedded, {result['reused']} reused) "
+          f"in {result['seconds']:.2f} s -> {args.index_dir}")
@@ -0,0 +1,157 @@
+"""
+Webcam presence trigger.
+
+Reads the default webcam, decides per frame whether a face is present with
+utils.presence.AdaptivePresenceDetector (downscaled grayscale, motion gating,
+ROI tracking, CPU budget) around OpenCV's frontal-face Haar cascade, and calls
+`trigger_callback` once a visitor has been present for `hold_s` seconds. It
+re-arms after the visitor leaves. `presence_callback(present)`, if given, is
+called as soon as a face first appears and again when the visitor has left, so
+the pipeline can wake its connections before the greeting; set_fps() lowers
+the capture rate while the kiosk is idle.
+
+Capture and detection run on a daemon thread, or with `process=True` in a
+separate process so OpenCV's work never competes with the audio threads for
+the GIL; the child only sends presence events back over a pipe.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+
+from utils.presence import AdaptivePresenceDetector, PresenceDebouncer
+
+logger = logging.getLogger("VisionService")
+
+CASCADE = "haarcascade_frontalface_default.xml"
+
+
+class HaarFaceDetector:
+    def __init__(self, scale_factor=1.2, min_neighbors=5, min_size=24):
+        import cv2
+        self.classifier = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = (min_size, min_size)
+
+    def detect(self, gray):
+        if gray.shape[0] < self.min_size[1] or gray.shape[1] < self.min_size[0]:
+            return []
+        return self.classifier.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                minNeighbors=self.min_neighbors, minSize=self.min_size)
+
+
+def watch_camera(camera, config, on_event, should_run, frame_rate=None):
+    """Capture loop: calls on_event(kind, stats) with "arrived" (first face), "present" (debouncer fired)
+    and "left". `frame_rate()` is read every frame. Runs in a thread or a child process."""
+    import cv2
+    capture = cv2.VideoCapture(camera)
+    if not capture.isOpened():
+        logger.error(f"Could not open camera {camera}")
+        return
+    frame_rate = frame_rate or (lambda: config.get("fps", 15.0))
+    fps = frame_rate()
+    detector = AdaptivePresenceDetector(HaarFaceDetector(), width=config.get("width", 320), fps=fps,
+                                        cpu_budget=config.get("cpu_budget", 0.1))
+    debouncer = PresenceDebouncer(config.get("hold_s", 2.0), config.get("leave_s", 3.0))
+    try:
+        while should_run():
+            if frame_rate() != fps:
+                fps = frame_rate()
+                detector.set_fps(fps)
+            started = time.monotonic()
+            ok, frame = capture.read()
+            if not ok:
+                time.sleep(0.1)
+                continue
+            was_seen = debouncer.last_seen is not None
+            fired = debouncer.update(detector.process(frame), started)
+            seen = debouncer.last_seen is not None
+            if seen and not was_seen:
+                on_event("arrived", detector.stats())
+            if fired:
+                on_event("present", detector.stats())
+            if was_seen and not seen:
+                on_event("left", detector.stats())
+            # Don't read faster than the budgeted frame rate (the driver may deliver 30+ fps)
+            time.sleep(max(0.0, 1.0 / fps - (time.monotonic() - started)))
+    finally:
+        capture.release()
+
+
+def _camera_process(conn, stop_event, fps, camera, config):
+    logging.basicConfig(level=logging.INFO)
+    watch_camera(camera, config, lambda kind, stats: conn.send((kind, stats)), lambda: not stop_event.is_set(),
+                 frame_rate=lambda: fps.value)
+    conn.send(("stopped", None))
+
+
+class VisionService:
+    def __init__(self, trigger_callback, camera=0, width=320, fps=15.0, cpu_budget=0.1, hold_s=2.0,
+                 leave_s=3.0, process=False, presence_callback=None):
+        self.trigger_callback = trigger_callback
+        self.presence_callback = presence_callback
+        self.camera = camera
+        self.config = {"width": width, "fps": fps, "cpu_budget": cpu_budget, "hold_s": hold_s, "leave_s": leave_s}
+        self.process_mode = process
+        self.running = False
+        self.thread = None
+        self.process = None
+        self.stop_event = None
+        self.fps_value = None  # shared with the child process
+        self.last_stats = None
+
+    def start(self):
+        self.running = True
+        if self.process_mode:
+            ctx = multiprocessing.get_context("spawn")
+            parent, child = ctx.Pipe(duplex=False)
+            self.stop_event = ctx.Event()
+            self.fps_value = ctx.Value("d", self.config["fps"], lock=False)
+            self.process = ctx.Process(target=_camera_process, name="Vision", daemon=True,
+                                       args=(child, self.stop_event, self.fps_value, self.camera, self.config))
+            self.process.start()
+            self.thread = threading.Thread(target=self.receive, args=(parent,), name="VisionEvents", daemon=True)
+        else:
+            self.thread = threading.Thread(target=watch_camera, name="Vision", daemon=True,
+                                           args=(self.camera, self.config, self.event, lambda: self.running))
+        self.thread.start()
+        logger.info(f"Vision started ({'separate process' if self.process_mode else 'thread'}, "
+                    f"{self.config['fps']:.0f} fps, CPU budget {self.config['cpu_budget'] * 100:.0f}%)")
+
+    def receive(self, conn):
+        while self.running:
+            try:
+                if not conn.poll(0.5):
+                    continue
+                kind, stats = conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == "stopped":
+                break
+            self.event(kind, stats)
+
+    def event(self, kind, stats):
+        if kind == "present":
+            self.present(stats)
+        elif self.presence_callback:
+            self.presence_callback(kind == "arrived")
+
+    def set_fps(self, fps):
+        """Capture rate from the next frame on (idle mode runs the camera slowly)."""
+        self.config["fps"] = fps
+        if self.fps_value is not None:
+            self.fps_value.value = fps
+
+    def present(self, stats):
+        self.last_stats = stats
+        logger.info(f"Presence detected ({stats['cpu_ms_per_frame']:.2f} ms CPU/frame, "
+                    f"detecting every {stats['interval']} frames)")
+        self.trigger_callback()
+
+    def stop(self):
+        self.running = False
+        if self.stop_event is not None:
+            self.stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout=2)
@@ -0,0 +1,142 @@
+"""
+Semantic answer cache.
+
+A finished turn's answer text and audio are stored under the query embedding
+and a fingerprint of the prompt context; a later query with cosine >=
+threshold and the same context replays the stored audio, skipping the LLM and
+TTS. Entries expire after a TTL, the cache is dropped when the directory file
+changes, and size is bounded by entry count and audio bytes.
+"""
+import hashlib
+import logging
+import time
+
+import numpy as np
+
+from utils.directory import DIRECTORY_PATH, directory_stamp
+
+logger = logging.getLogger("AnswerCache")
+
+
+def context_key(context):
+    """Fingerprint of the context the answer was grounded on (entries and history)."""
+    return hashlib.sha1((context or "").encode("utf-8")).hexdigest()
+
+
+class CachedAnswer:
+    __slots__ = ("text", "audio", "audio_bytes", "context_key", "created", "last_used", "hits")
+
+    def __init__(self, text, audio, context_key):
+        self.text = text
+        self.audio = audio
+        self.audio_bytes = sum(len(c) for c in audio)
+        self.context_key = context_key
+        self.created = self.last_used = time.time()
+        self.hits = 0
+
+
+class AnswerCache:
+    def __init__(self, threshold=0.92, ttl_s=3600, max_entries=128, max_audio_bytes=32 * 1024 * 1024,
+                 directory_path=DIRECTORY_PATH, check_interval_s=5.0):
+        self.threshold = threshold
+        self.ttl = ttl_s
+        self.max_entries = max_entries
+        self.max_audio_bytes = max_audio_bytes
+        self.directory_path = directory_path
+        self.check_interval = check_interval_s
+
+        self.vectors = None  # (max_entries, dim) float32, allocated on first store
+        self.entries = [None] * max_entries
+        self.audio_bytes = 0
+        self.directory_stamp = directory_stamp(directory_path)
+        self.next_check = 0.0
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+    def lookup(self, vector, ctx_key):
+        """Returns the CachedAnswer for a similar query over the same entries, or None."""
+        self._check_directory()
+        if self.vectors is None:
+            self.counters["misses"] += 1
+            return None
+        scores = self.vectors @ np.asarray(vector, dtype=np.float32)
+        now = time.time()
+        for slot in np.argsort(-scores):
+            entry = self.entries[slot]
+            if scores[slot] < self.threshold:
+                break
+            if entry is None:
+                continue
+            if now - entry.created > self.ttl:
+                self._drop(slot)
+                self.counters["expired"] += 1
+                continue
+            if entry.context_key == ctx_key:
+                entry.last_used = now
+                entry.hits += 1
+                self.counters["hits"] += 1
+                return entry
+        self.counters["misses"] += 1
+        return None
+
+    def store(self, vector, ctx_key, text, audio):
+        """Caches a completed answer (text + list of PCM chunks)."""
+        vector = np.asarray(vector, dtype=np.float32)
+        entry = CachedAnswer(text, list(audio), ctx_key)
+        if entry.audio_bytes > self.max_audio_bytes:
+            return
+        if self.vectors is None:
+            self.vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        slot = self._free_slot()
+        while self.audio_bytes + entry.audio_bytes > self.max_audio_bytes:
+            self._drop(self._lru_slot())
+            self.counters["evictions"] += 1
+        self.vectors[slot] = vector
+        self.entries[slot] = entry
+        self.audio_bytes += entry.audio_bytes
+        self.counters["stores"] += 1
+
+    def clear(self):
+        for slot in range(self.max_entries):
+            self._drop(slot)
+
+    def stats(self):
+        total = self.counters["hits"] + self.counters["misses"]
+        return dict(
+            self.counters,
+            entries=sum(e is not None for e in self.entries),
+            audio_bytes=self.audio_bytes,
+            hit_rate=self.counters["hits"] / total if total else 0.0,
+        )
+
+    def _free_slot(self):
+        for slot, entry in enumerate(self.entries):
+            if entry is None:
+                return slot
+        slot = self._lru_slot()
+        self._drop(slot)
+        self.counters["evictions"] += 1
+        return slot
+
+    def _lru_slot(self):
+        used = [(e.last_used, i) for i, e in enumerate(self.entries) if e is not None]
+        return min(used)[1]
+
+    def _drop(self, slot):
+        entry = self.entries[slot]
+        if entry is not None:
+            self.audio_bytes -= entry.audio_bytes
+            self.entries[slot] = None
+            self.vectors[slot] = 0.0  # zero vector never passes the threshold
+
+    def _check_directory(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + self.check_interval
+        stamp = directory_stamp(self.directory_path)
+        if stamp != self.directory_stamp:
+            logger.info("Directory file changed, clearing answer cache")
+            self.directory_stamp = stamp
+            self.clear()
+            self.counters["invalidations"] += 1
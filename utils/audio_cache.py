@@ -0,0 +1,198 @@
+"""
+Persistent cache of synthesized PCM for fixed and frequent utterances.
+
+Files are content-addressed (sha256 of voice, output format and text) and read
+back through mmap, so a cached phrase is played straight from the page cache
+without copying. The directory is bounded in bytes with LRU eviction; phrases
+pre-warmed at startup (greeting, fallbacks, common answers) are pinned. At most
+`max_maps` files stay mapped (and hold a file descriptor) at a time.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from utils.lru import LRUCache
+
+logger = logging.getLogger("AudioCache")
+
+
+class AudioCache:
+    def __init__(self, cache_dir=os.path.join("cache", "tts"), max_bytes=64 * 1024 * 1024, max_maps=64):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_maps = max_maps
+        self.lock = threading.Lock()
+        self.files = OrderedDict()  # key -> size, least recently used first
+        self.maps = OrderedDict()   # key -> open mmap, least recently used first
+        self.pinned = set()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def key(text, voice="", fmt=""):
+        return hashlib.sha256(f"{voice}\x00{fmt}\x00{text.strip()}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pcm")
+
+    def _scan(self):
+        """Rebuilds the LRU order from file access times left by previous runs."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pcm"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_atime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self.files[key] = size
+            self.total_bytes += size
+
+    def get(self, key):
+        """Returns a read-only memoryview of the cached PCM, or None."""
+        with self.lock:
+            if key not in self.files:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.files.move_to_end(key)
+            m = self.maps.get(key)
+            if m is None:
+                with open(self._path(key), "rb") as f:
+                    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.maps[key] = m
+                self._unmap()
+            else:
+                self.maps.move_to_end(key)
+        try:
+            os.utime(self._path(key))  # persist recency for the next start-up scan
+        except OSError:
+            pass
+        return memoryview(m)
+
+    def contains(self, key):
+        with self.lock:
+            return key in self.files
+
+    def pin(self, key):
+        """Exempts a cached phrase from eviction."""
+        with self.lock:
+            self.pinned.add(key)
+
+    def _unmap(self):
+        """Closes the least recently used maps beyond max_maps (one still being played stays open, and so
+        does the newest, about to be returned)."""
+        for key in list(self.maps)[:-1]:
+            if len(self.maps) <= self.max_maps:
+                return
+            try:
+                self.maps[key].close()
+            except BufferError:
+                continue
+            del self.maps[key]
+
+    def put(self, key, chunks, pin=False):
+        """Stores the concatenated chunks atomically and evicts down to max_bytes."""
+        data = b"".join(bytes(c) for c in chunks)
+        if not data:
+            return
+        tmp = self._path(key) + f".{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        with self.lock:
+            self.total_bytes += len(data) - self.files.get(key, 0)
+            self.files[key] = len(data)
+            self.files.move_to_end(key)
+            if pin:
+                self.pinned.add(key)
+            self._evict()
+
+    def _evict(self):
+        for key in list(self.files):
+            if self.total_bytes <= self.max_bytes:
+                return
+            if key in self.pinned:
+                continue
+            m = self.maps.pop(key, None)
+            if m is not None:
+                try:
+                    m.close()
+                except BufferError:
+                    self.maps[key] = m  # still being played; try again next time
+                    continue
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self.total_bytes -= self.files.pop(key)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "files": len(self.files),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class CachedTTSService:
+    """
+    Wraps TTSService.text_to_audio_stream with the audio cache. Pinned phrases are
+    always cached; other sentences are admitted once they have been requested
+    `admit_after` times, so one-off LLM sentences don't churn the cache.
+    """
+
+    def __init__(self, tts, cache, voice=None, fmt=None, chunk_bytes=4096, admit_after=2):
+        self.tts = tts
+        self.cache = cache
+        self.voice = voice if voice is not None else getattr(tts, "voice_id", os.getenv("ELEVENLABS_VOICE_ID", ""))
+        self.fmt = fmt if fmt is not None else getattr(tts, "output_format", "")
+        self.chunk_bytes = chunk_bytes
+        self.admit_after = admit_after
+        self.seen = LRUCache(1024)
+
+    def __getattr__(self, name):
+        # Everything else (connection warm-up etc.) goes to the real service
+        return getattr(self.tts, name)
+
+    def text_to_audio_stream(self, text):
+        key = self.cache.key(text, self.voice, self.fmt)
+        view = self.cache.get(key)
+        if view is not None:
+            for offset in range(0, len(view), self.chunk_bytes):
+                yield view[offset:offset + self.chunk_bytes]
+            return
+
+        count = self.seen.get(key, 0) + 1
+        self.seen.put(key, count)
+        chunks = [] if count >= self.admit_after else None
+        for chunk in self.tts.text_to_audio_stream(text):
+            if chunks is not None:
+                chunks.append(chunk)
+            yield chunk
+        # Only reached when the stream finished; interrupted sentences are never cached
+        if chunks:
+            self.cache.put(key, chunks)
+
+    def prewarm(self, phrases):
+        """Synthesizes and pins phrases that aren't cached yet (blocking; run off the loop)."""
+        warmed = 0
+        for text in phrases:
+            key = self.cache.key(text, self.voice, self.fmt)
+            if self.cache.contains(key):
+                self.cache.pin(key)
+                continue
+            try:
+                self.cache.put(key, list(self.tts.text_to_audio_stream(text)), pin=True)
+                warmed += 1
+            except Exception as e:
+                logger.error(f"Pre-warm failed for '{text[:30]}...': {e}")
+        logger.info(f"TTS cache pre-warmed {warmed} new phrase(s), {len(phrases) - warmed} already cached")
+        return warmed
@@ -0,0 +1,78 @@
+"""
+Barge-in detection while the avatar is talking.
+
+The mic keeps running during playback. Each mic buffer is split into short
+frames and their RMS is computed with NumPy. A frame counts as user speech only
+if it is loud enough on its own (above an adaptive noise floor) and clearly louder
+than what we are currently playing (simple echo suppression against the output
+level reported by the playback thread). When most frames in a short sliding
+window are speech, barge-in fires. `onset_at` is when the speech run that
+fired began (from the capture time of the buffer), so detected_at - onset_at
+is what the detector itself cost.
+"""
+import time
+from collections import deque
+
+from utils.vad import frame_rms
+
+
+class BargeInDetector:
+    def __init__(self, sample_rate=16000, frame_ms=20, trigger_ms=200, trigger_ratio=0.7, min_level=300.0,
+                 noise_factor=3.0, echo_gain=1.5, preroll_ms=400):
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.frame_ms = frame_ms
+        self.window = deque(maxlen=max(1, trigger_ms // frame_ms))
+        self.trigger_count = max(1, int(self.window.maxlen * trigger_ratio))
+        self.min_level = min_level
+        self.noise_factor = noise_factor
+        self.echo_gain = echo_gain  # mic must exceed echo_gain x the playback RMS
+        self.noise_floor = min_level / noise_factor
+        # Mic audio captured while muted, so the first words of the interruption reach STT
+        self.preroll_bytes = deque()
+        self.preroll_limit = int(preroll_ms * sample_rate / 1000) * 2
+        self.reset()
+
+    def reset(self):
+        self.window.clear()
+        self.speech_frames = 0
+        self.detected_at = 0.0
+        self.onset_at = 0.0
+        self.preroll_bytes.clear()
+        self.preroll_size = 0
+
+    def process(self, pcm, echo_level=0.0, now=None):
+        """Feed one mic buffer captured during playback (`now`: wall time of its end). Returns True when
+        barge-in fires."""
+        now = time.time() if now is None else now
+        self._remember(pcm)
+        levels = frame_rms(pcm, self.frame_samples)
+        threshold = max(self.min_level, self.noise_floor * self.noise_factor, echo_level * self.echo_gain)
+        for i, level in enumerate(levels):
+            speech = level > threshold
+            if self.window.maxlen == len(self.window) and self.window[0]:
+                self.speech_frames -= 1
+            self.window.append(speech)
+            if speech:
+                if self.speech_frames == 0:
+                    self.onset_at = now - (len(levels) - i) * self.frame_ms / 1000
+                self.speech_frames += 1
+                if self.speech_frames >= self.trigger_count:
+                    self.detected_at = time.time()
+                    return True
+            else:
+                # Track background noise slowly from non-speech frames
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(level)
+        return False
+
+    def take_preroll(self):
+        """Audio buffered before the trigger, oldest first."""
+        chunks = list(self.preroll_bytes)
+        self.preroll_bytes.clear()
+        self.preroll_size = 0
+        return chunks
+
+    def _remember(self, pcm):
+        self.preroll_bytes.append(bytes(pcm))
+        self.preroll_size += len(pcm)
+        while self.preroll_size > self.preroll_limit and len(self.preroll_bytes) > 1:
+            self.preroll_size -= len(self.preroll_bytes.popleft())
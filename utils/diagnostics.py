@@ -0,0 +1,220 @@
+"""
+Event-loop stall detection and a sampling profiler.
+
+LoopMonitor measures asyncio loop lag with a heartbeat; when the loop misses
+`threshold_ms`, a watchdog thread captures the loop thread's stack and
+attributes the stall to a pipeline stage. SamplingProfiler samples all
+threads' stacks and writes folded stacks for flamegraph tools.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+logger = logging.getLogger("Diagnostics")
+
+# Innermost frame that matches decides the stage. Function names first, then module file names.
+STAGE_FUNCTIONS = {
+    "mic_callback": "mic", "feed_wav": "mic", "drain_mic": "mic", "process_mic_audio": "mic", "send_mic_audio": "stt",
+    "handle_transcription": "stt", "send_audio": "stt",
+    "search": "rag", "search_hits": "rag", "embed": "rag",
+    "generate_response": "llm", "handle_llm_token": "llm", "process_text": "llm",
+    "process_tts_queue": "segmenter",
+    "process_sentence_queue": "tts", "synthesize_sentence": "tts", "replay_audio": "tts",
+    "text_to_audio_stream": "tts", "enqueue_audio": "playback",
+    "handle_vision_trigger": "vision", "play_greeting": "greeting",
+    "interrupt": "barge_in", "finish_turn": "tracing", "print_metrics": "metrics",
+}
+STAGE_MODULES = {
+    "async_rag.py": "rag", "rag_engine.py": "rag", "directory.py": "rag", "lru.py": "rag",
+    "vector_index.py": "rag", "lexical_index.py": "rag",
+    "llm_service.py": "llm", "prompt_builder.py": "llm", "speculation.py": "speculation",
+    "tts_service.py": "tts", "audio_cache.py": "tts", "segmenter.py": "segmenter",
+    "stt_service.py": "stt", "resilient_stt.py": "stt",
+    "vad.py": "vad", "barge_in.py": "barge_in", "ring_buffer.py": "mic",
+    "answer_cache.py": "answer_cache", "fast_path.py": "fast_path", "tracing.py": "tracing", "playback.py": "playback",
+    "jitter_buffer.py": "playback",
+    "vision_service.py": "vision", "presence.py": "vision", "startup.py": "startup", "idle_mode.py": "mic",
+}
+
+# Threads parked here (waiting on a queue, a lock, the selector or an executor work item) are idle
+IDLE_MODULES = ("selectors.py", "threading.py", "queue.py")
+IDLE_FUNCTIONS = ("_worker",)  # concurrent.futures worker blocked in its C-level queue get
+OWN_THREADS = ("Profiler", "LoopWatchdog")
+
+
+def is_idle(frames):
+    filename, function = frames[0]
+    return os.path.basename(filename) in IDLE_MODULES or function in IDLE_FUNCTIONS
+
+
+def attribute(frames):
+    """Pipeline stage for a stack given as (filename, function) pairs, innermost first."""
+    for filename, function in frames:
+        stage = STAGE_FUNCTIONS.get(function) or STAGE_MODULES.get(os.path.basename(filename))
+        if stage:
+            return stage
+    return "other"
+
+
+def walk(frame, limit=64):
+    """(filename, function) pairs from `frame` outwards, without building a traceback."""
+    out = []
+    while frame is not None and len(out) < limit:
+        code = frame.f_code
+        out.append((code.co_filename, code.co_name))
+        frame = frame.f_back
+    return out
+
+
+class LoopMonitor:
+    def __init__(self, loop, threshold_ms=100, interval_ms=50, on_lag=None, max_stalls=200):
+        self.loop = loop
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.on_lag = on_lag  # callback(ms) for every heartbeat, e.g. a tracer histogram
+        self.stalls = deque(maxlen=max_stalls)
+        self.stage_ms = Counter()
+        self.stage_count = Counter()
+        self.max_lag_ms = 0.0
+        self.beats = 0
+        self.last_beat = time.monotonic()
+        self.loop_thread = None
+        self.pending = None  # stall captured by the watchdog, completed by the next heartbeat
+        self.running = False
+        self.task = None
+        self.watchdog = None
+
+    def start(self):
+        self.running = True
+        self.loop_thread = threading.get_ident()  # called from the loop thread
+        self.last_beat = time.monotonic()
+        self.task = self.loop.create_task(self.heartbeat())
+        self.watchdog = threading.Thread(target=self.watch, name="LoopWatchdog", daemon=True)
+        self.watchdog.start()
+
+    def stop(self):
+        self.running = False
+        if self.task:
+            self.task.cancel()
+
+    async def heartbeat(self):
+        while self.running:
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag_ms = max(0.0, (now - t0 - self.interval) * 1000)
+            self.last_beat = now
+            self.beats += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if self.on_lag:
+                self.on_lag(lag_ms)
+            stall = self.pending
+            if stall is not None:
+                self.pending = None
+                stall["duration_ms"] = (now - stall["started"]) * 1000
+                self.stage_ms[stall["stage"]] += stall["duration_ms"]
+                logger.warning(f"Event loop blocked for {stall['duration_ms']:.0f} ms in {stall['stage']}:\n"
+                               + "".join(stall["stack"]))
+
+    def watch(self):
+        while self.running:
+            time.sleep(self.interval / 2)
+            since = time.monotonic() - self.last_beat
+            if since < self.interval + self.threshold or self.pending is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            stage = attribute(walk(frame))
+            stall = {
+                "at": time.time(),
+                "started": self.last_beat + self.interval,
+                "stage": stage,
+                "stack": traceback.format_stack(frame, limit=12),
+                "duration_ms": None,
+            }
+            self.stage_count[stage] += 1
+            self.stalls.append(stall)
+            self.pending = stall
+
+    def stats(self):
+        worst = max((s for s in self.stalls if s["duration_ms"]), key=lambda s: s["duration_ms"], default=None)
+        return {
+            "beats": self.beats,
+            "stalls": sum(self.stage_count.values()),
+            "max_lag_ms": self.max_lag_ms,
+            "stall_count_by_stage": dict(self.stage_count),
+            "stall_ms_by_stage": {k: round(v, 1) for k, v in self.stage_ms.items()},
+            "worst": {"stage": worst["stage"], "ms": round(worst["duration_ms"], 1)} if worst else None,
+        }
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms=5, max_depth=48):
+        self.interval = interval_ms / 1000.0
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.labels = {}  # thread id -> explicit stage set by wrap()
+        self.sample_count = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="Profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def wrap(self, stage, fn):
+        """Labels everything `fn` runs on its thread as `stage` (for executor / thread work)."""
+        def wrapper(*args, **kwargs):
+            tid = threading.get_ident()
+            previous = self.labels.get(tid)
+            self.labels[tid] = stage
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if previous is None:
+                    self.labels.pop(tid, None)
+                else:
+                    self.labels[tid] = previous
+        return wrapper
+
+    def run(self):
+        while self.running:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                name = names.get(tid, tid)
+                if name in OWN_THREADS:
+                    continue
+                frames = walk(frame, self.max_depth)
+                if not frames or is_idle(frames):
+                    stage = "idle"
+                else:
+                    stage = self.labels.get(tid) or attribute(frames)
+                path = ";".join(f"{os.path.basename(f)}:{fn}" for f, fn in reversed(frames))
+                self.samples[f"{name};{stage};{path}"] += 1
+            self.sample_count += 1
+            time.sleep(self.interval)
+
+    def by_stage(self):
+        totals = Counter()
+        for key, count in self.samples.items():
+            thread, stage, _ = key.split(";", 2)
+            totals[stage] += count
+        return dict(totals.most_common())
+
+    def dump(self, path):
+        """Writes folded stacks (one "frame;frame;... count" line per unique stack)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for key, count in sorted(self.samples.items()):
+                f.write(f"{key} {count}\n")
+        logger.info(f"Wrote {len(self.samples)} folded stacks ({self.sample_count} samples) to {path}")
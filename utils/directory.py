@@ -0,0 +1,108 @@
+"""
+Loading helpers for the startup directory (data/iitmrp_directory.json).
+
+The file is a list of startup records (or an object wrapping such a list).
+Each record is flattened into a DirectoryEntry with a display name and one
+searchable text blob, which is what the retrieval fallbacks index.
+"""
+import json
+import logging
+import os
+import re
+from collections import namedtuple
+
+logger = logging.getLogger("Directory")
+
+DIRECTORY_PATH = os.path.join("data", "iitmrp_directory.json")
+
+NAME_FIELDS = ("name", "startup_name", "company", "company_name", "title")
+
+DirectoryEntry = namedtuple("DirectoryEntry", ["name", "text", "record"])
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "who", "where", "when", "which", "how",
+    "do", "does", "did", "of", "in", "on", "at", "to", "for", "and", "or", "me", "about",
+    "tell", "can", "you", "i", "it", "its", "their", "there", "this", "that", "with",
+}
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _records(data):
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, list):
+                return value
+        # {"Startup name": {...}, ...}
+        return [dict(record, name=name) if isinstance(record, dict) else {"name": name, "description": record}
+                for name, record in data.items()]
+    return []
+
+
+def _flatten(value):
+    if isinstance(value, dict):
+        return "; ".join(f"{k}: {_flatten(v)}" for k, v in value.items() if v not in (None, "", []))
+    if isinstance(value, list):
+        return ", ".join(_flatten(v) for v in value)
+    return str(value)
+
+
+def entry_from_record(record):
+    if not isinstance(record, dict):
+        return DirectoryEntry(str(record), str(record), record)
+    name = next((str(record[f]) for f in NAME_FIELDS if record.get(f)), "")
+    return DirectoryEntry(name, _flatten(record), record)
+
+
+def load_directory(path=DIRECTORY_PATH):
+    """Returns the directory as a list of DirectoryEntry; empty if the file is missing."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Directory file not found: {path}")
+        return []
+    return [entry_from_record(r) for r in _records(data)]
+
+
+def directory_stamp(path=DIRECTORY_PATH):
+    """(mtime, size) of the directory file, to notice edits; None if it is missing."""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def format_context(hits):
+    """Joins retrieval hits into the context string handed to the LLM."""
+    return "\n".join(hit["text"] for hit in hits)
+
+
+class KeywordIndex:
+    """Token-overlap search over the directory; the cheap fallback when semantic search is slow."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.tokens = [set(tokenize(e.text)) for e in entries]
+        self.name_tokens = [set(tokenize(e.name)) for e in entries]
+
+    def search(self, query, k=3):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        scored = []
+        for i, entry in enumerate(self.entries):
+            overlap = len(terms & self.tokens[i]) + 2 * len(terms & self.name_tokens[i])
+            if overlap:
+                scored.append((overlap / len(terms), i))
+        scored.sort(reverse=True)
+        return [
+            {"name": self.entries[i].name, "text": self.entries[i].text, "score": score}
+            for score, i in scored[:k]
+        ]
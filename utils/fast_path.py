@@ -0,0 +1,221 @@
+"""
+Deterministic answers for plain directory lookups.
+
+FastPath answers "what does X do", "who founded X" and similar one-field
+questions from the directory record without the LLM. It answers only when an
+intent pattern matches the whole utterance, the slot names exactly one startup
+(spelled out, or a confident fuzzy match via LexicalIndex.names) and the record
+has the field; "they" / "their" refer to the previously named startup.
+Anything else returns None.
+"""
+import logging
+import re
+from collections import namedtuple
+
+from utils.directory import tokenize
+from utils.lexical_index import NAME_MIN, name_keys
+
+logger = logging.getLogger("FastPath")
+
+FastAnswer = namedtuple("FastAnswer", ["intent", "row", "name", "text", "sentences", "score"])
+
+# Record keys holding each field, first match wins (keys compared lower-case, "_" for spaces and dashes)
+FIELDS = {
+    "about": ("description", "about", "summary", "overview", "what_they_do", "products", "product"),
+    "founders": ("founders", "founder", "founded_by", "co_founders", "cofounders"),
+    "location": ("office", "location", "address", "office_location"),
+    "sector": ("sector", "domain", "industry", "category", "focus_area"),
+    "website": ("website", "url", "web", "site"),
+}
+LOCATION_PARTS = ("building", "block", "wing", "floor", "room")  # composed when there is no single location field
+
+# Whole-utterance patterns; more specific ones first ("what is X's website" before "what is X")
+INTENTS = [
+    ("founders", r"who (?:founded|started|created|set up|co ?founded) (?P<name>.+)"),
+    ("founders", r"who (?:is|are|was|were) (?:the )?(?:co ?)?founders? (?:of|behind) (?P<name>.+)"),
+    ("founders", r"who (?:is|are) behind (?P<name>.+)"),
+    ("founders", r"(?:who|what) (?:is|are) (?P<name>.+?)(?:'s?)? (?:co ?)?founders?"),
+    ("website", r"what (?:is|are) (?P<name>.+?)(?:'s?)? (?:website|web site|url|site)"),
+    ("sector", r"what (?:sector|domain|industry|field|area) (?:is|are|does) (?P<name>.+?) (?:in|from|work in)"),
+    ("location", r"where (?:is|are) (?P<name>.+?)(?:'s?)? (?:office|offices|located|based|situated)"),
+    ("location", r"where (?:is|are) (?:the )?offices? (?:of|for) (?P<name>.+)"),
+    ("location", r"where (?:is|are|can i find|do i find|would i find) (?P<name>.+)"),
+    ("location", r"how (?:do|can) i (?:get|go) to (?P<name>.+?)(?:'s?)?(?: office)?"),
+    ("about", r"what (?:does|do) (?P<name>.+?) do"),
+    ("about", r"what (?:is|are) (?P<name>.+?) (?:doing|working on|all about|about)"),
+    ("about", r"(?:can you |could you )?tell me (?:a bit |a little |more )?about (?P<name>.+)"),
+]
+# Matched after INTENTS; the slot must spell a startup's name (no fuzzy match, no "they")
+EXACT_INTENTS = [
+    ("about", r"(?:what|who) (?:is|are) (?P<name>.+)"),
+]
+_INTENTS = ([(intent, re.compile(f"^{pattern}$"), False) for intent, pattern in INTENTS]
+            + [(intent, re.compile(f"^{pattern}$"), True) for intent, pattern in EXACT_INTENTS])
+
+TEMPLATES = {
+    "about": "{about}",  # phrased by _about()
+    "founders": "{name} was founded by {founders}.",
+    "location": "You'll find {name} {location}.",
+    "sector": "{name} works in {sector}.",
+    "website": "You can find {name} online at {website}.",
+}
+
+PRONOUNS = {"they", "them", "their", "theirs", "it", "its", "this startup", "that startup", "this company",
+            "that company", "the startup", "the company"}
+NOT_NAMES = {"you", "your", "yours", "we", "us", "i", "me", "this", "that", "here", "there"}
+_FILLER = re.compile(r"^(?:(?:hey|hi|hello|so|okay|ok|um|uh|please|and|also|then)\b\s*)+|\s*\bplease$")
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_ARTICLE = re.compile(r"^(?:the|a|an) ")
+_POSSESSIVE = re.compile(r"'s?$")
+MAX_SLOT_WORDS = 6  # a longer slot is a description ("the startup that builds rockets"), not a name
+
+
+def normalize(text):
+    text = _NON_WORD.sub(" ", text.lower().replace("’", "'"))
+    return _FILLER.sub("", " ".join(text.split())).strip()
+
+
+def _key(field):
+    return re.sub(r"[\s\-]+", "_", str(field).strip().lower())
+
+
+def _spoken(value):
+    """A record value as a phrase: lists joined with "and", nested objects as "key value" pairs."""
+    if isinstance(value, dict):
+        return ", ".join(f"{k.replace('_', ' ')} {_spoken(v)}" for k, v in value.items() if v not in (None, "", []))
+    if isinstance(value, (list, tuple)):
+        items = [_spoken(v) for v in value if v not in (None, "", [])]
+        return ", ".join(items[:-1]) + " and " + items[-1] if len(items) > 1 else "".join(items)
+    return " ".join(str(value).split()).rstrip(".")
+
+
+def _about(name, text, sentences=2):
+    """The description as a sentence about `name` (only its first `sentences` sentences)."""
+    text = " ".join(_SENTENCE_END.split(text)[:sentences]).rstrip(".") + "."
+    first = text.split(" ", 1)[0]
+    if text.lower().startswith(name.lower()) or text.lower().startswith(name.split()[0].lower()):
+        return text
+    if first.lower() in ("a", "an", "the"):
+        return f"{name} is {text[0].lower()}{text[1:]}"
+    if first.islower():
+        return f"{name} {text}"  # "designs chips ..."
+    return f"Here's what {name} does: {text}"
+
+
+class FastPath:
+    def __init__(self, index, min_score=0.85, margin=0.1):
+        self.index = index  # LexicalIndex over the directory
+        self.min_score = min_score
+        self.margin = margin
+        self.answers = {intent: {} for intent in TEMPLATES}  # intent -> row -> answer text
+        self.exact = {}  # name key -> rows: a slot that spells one startup's name needs no fuzzy margin
+        for row, entry in enumerate(index.entries):
+            if not entry.name:
+                continue
+            for key in name_keys(entry.name):
+                self.exact.setdefault(key, set()).add(row)
+            for intent, text in self.render(entry).items():
+                self.answers[intent][row] = text
+        self.counters = {"questions": 0, "hits": 0, "no_intent": 0, "no_name": 0, "ambiguous": 0, "no_field": 0}
+        self.intent_hits = {intent: 0 for intent in TEMPLATES}
+        logger.info("Fast path: " + ", ".join(f"{intent} {len(rows)}" for intent, rows in self.answers.items())
+                    + f" of {len(index.entries)} entries")
+
+    @staticmethod
+    def render(entry):
+        """intent -> answer text for one directory entry (intents whose field the record lacks are left out)."""
+        record = entry.record if isinstance(entry.record, dict) else {}
+        fields = {_key(k): v for k, v in record.items() if v not in (None, "", [], {})}
+        values = {}
+        for field, keys in FIELDS.items():
+            key = next((k for k in keys if k in fields), None)
+            if key is not None:
+                values[field] = _spoken(fields[key])
+        if "location" not in values:
+            parts = [f"{part} {_spoken(fields[part])}" for part in LOCATION_PARTS if part in fields]
+            if parts:
+                values["location"] = ", ".join(parts)
+        if "location" in values and not re.match(r"(?i)(in|at|on|near|inside) ", values["location"]):
+            values["location"] = "at " + values["location"]
+
+        name = entry.name
+        answers = {}
+        if "about" in values:
+            answers["about"] = _about(name, values["about"])
+        elif "sector" in values:
+            answers["about"] = TEMPLATES["sector"].format(name=name, sector=values["sector"])
+        for intent in ("founders", "location", "sector", "website"):
+            if intent in values:
+                answers[intent] = TEMPLATES[intent].format(name=name, **values)
+        return answers
+
+    def parse(self, text):
+        """(intent, slot, exact) when the utterance is a lookup question, else None.
+        exact: the slot must spell a name (see EXACT_INTENTS)."""
+        norm = normalize(text)
+        for intent, pattern, exact in _INTENTS:
+            match = pattern.match(norm)
+            if match:
+                slot = _ARTICLE.sub("", match.group("name").strip())
+                return intent, _POSSESSIVE.sub("", slot).strip(), exact
+        return None
+
+    def resolve(self, slot, previous=(), exact=False):
+        """(row, score, None) for the one startup `slot` names confidently, else (None, 0.0, reason).
+        A pronoun slot stands for the startup named by the latest of the `previous` questions (oldest first)
+        that isn't itself a pronoun follow-up; any other question in between ends the search.
+        exact: only a slot that spells one startup's name resolves."""
+        if slot in PRONOUNS and not exact:
+            for question in reversed(previous):
+                parsed = self.parse(question)
+                if parsed is None or parsed[1] not in PRONOUNS:
+                    break
+            else:
+                parsed = None
+            if parsed is None:
+                return None, 0.0, "no_name"
+            slot, exact = parsed[1], parsed[2]
+        if not slot or slot in NOT_NAMES or len(slot.split()) > MAX_SLOT_WORDS:
+            return None, 0.0, "no_name"
+        rows = self.exact.get("".join(tokenize(slot)), ())
+        if len(rows) == 1:
+            return next(iter(rows)), 1.0, None
+        if exact:
+            return None, 0.0, "ambiguous" if rows else "no_name"
+        matches = self.index.names(slot, k=2, min_score=NAME_MIN, whole=True)
+        if not matches or matches[0][1] < self.min_score:
+            return None, 0.0, "no_name"
+        if len(matches) > 1 and matches[1][1] > matches[0][1] - self.margin:
+            return None, 0.0, "ambiguous"
+        return matches[0][0], matches[0][1], None
+
+    def answer(self, text, previous=()):
+        """The FastAnswer for a lookup question, or None to fall back to the LLM.
+        `previous`: the conversation's earlier questions, oldest first (for "they" / "their")."""
+        self.counters["questions"] += 1
+        parsed = self.parse(text)
+        if parsed is None:
+            self.counters["no_intent"] += 1
+            return None
+        intent, slot, exact = parsed
+        row, score, reason = self.resolve(slot, previous, exact)
+        if row is None:
+            self.counters[reason] += 1
+            return None
+        answer = self.answers[intent].get(row)
+        if answer is None:
+            self.counters["no_field"] += 1
+            return None
+        self.counters["hits"] += 1
+        self.intent_hits[intent] += 1
+        return FastAnswer(intent, row, self.index.entries[row].name, answer, _SENTENCE_END.split(answer), score)
+
+    def hit(self, answer):
+        """The retrieval-style hit the answer was grounded on (for the conversation memory)."""
+        return self.index.hit(answer.row, answer.score)
+
+    def stats(self):
+        questions = self.counters["questions"]
+        return dict(self.counters, hit_rate=self.counters["hits"] / questions if questions else 0.0,
+                    intents=dict(self.intent_hits))
@@ -0,0 +1,86 @@
+"""
+Presence-driven idle mode: state and accounting.
+
+    active   audio goes upstream; vision runs at its normal rate
+    idle     nobody seen and nothing said for `idle_after_s`: mic audio stays
+             local, STT is kept alive or closed after `disconnect_after_s`,
+             vision drops to a low frame rate
+    waking   a face or local speech appeared; connections are warming up
+
+IdleStateMachine keeps the state, timers and counters; the pipeline performs
+the transitions' side effects.
+"""
+import time
+from collections import deque
+
+ACTIVE, WAKING, IDLE = "active", "waking", "idle"
+STATES = (ACTIVE, WAKING, IDLE)
+
+
+class IdleStateMachine:
+    def __init__(self, idle_after_s=30.0, disconnect_after_s=60.0, clock=time.monotonic):
+        self.idle_after_s = idle_after_s
+        self.disconnect_after_s = disconnect_after_s  # measured from entering idle; 0 = keep the socket
+        self.clock = clock
+        self.state = ACTIVE
+        self.entered = clock()
+        self.last_activity = self.entered
+        self.present = False       # a face is in view (raw arrival / departure, not the greeting trigger)
+        self.stt_closed = False    # the STT socket was closed while idle
+        self.time_in = {state: 0.0 for state in STATES}
+        self.transitions = {state: 0 for state in STATES}
+        self.counters = {"forwarded_bytes": 0, "avoided_bytes": 0, "keepalives": 0, "disconnects": 0}
+        self.wake_ms = deque(maxlen=1000)
+        self.wake_reasons = {}
+
+    def enter(self, state):
+        """Switches state; False if already there."""
+        if state == self.state:
+            return False
+        now = self.clock()
+        self.time_in[self.state] += now - self.entered
+        self.state, self.entered = state, now
+        self.transitions[state] += 1
+        if state == ACTIVE:
+            self.last_activity = now  # the idle timer restarts after a wake-up
+        return True
+
+    def seen(self, present):
+        self.present = present
+        self.activity()
+
+    def activity(self):
+        """Speech, a transcript or playback: the kiosk is in use."""
+        self.last_activity = self.clock()
+
+    def should_idle(self, busy=False):
+        return (self.state == ACTIVE and not busy and not self.present
+                and self.clock() - self.last_activity >= self.idle_after_s)
+
+    def should_disconnect(self):
+        return (self.state == IDLE and not self.stt_closed and self.disconnect_after_s > 0
+                and self.clock() - self.entered >= self.disconnect_after_s)
+
+    def woke(self, reason, ms):
+        self.wake_ms.append(ms)
+        self.wake_reasons[reason] = self.wake_reasons.get(reason, 0) + 1
+
+    def count_audio(self, nbytes, forwarded):
+        self.counters["forwarded_bytes" if forwarded else "avoided_bytes"] += nbytes
+
+    def stats(self):
+        time_in = dict(self.time_in)
+        time_in[self.state] += self.clock() - self.entered
+        total = sum(time_in.values()) or 1.0
+        audio = self.counters["forwarded_bytes"] + self.counters["avoided_bytes"]
+        return dict(
+            self.counters,
+            state=self.state,
+            time_in_s=time_in,
+            time_share={state: seconds / total for state, seconds in time_in.items()},
+            transitions=dict(self.transitions),
+            avoided_ratio=self.counters["avoided_bytes"] / audio if audio else 0.0,
+            wakeups=len(self.wake_ms),
+            wake_reasons=dict(self.wake_reasons),
+            last_wake_ms=self.wake_ms[-1] if self.wake_ms else None,
+        )
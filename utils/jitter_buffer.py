@@ -0,0 +1,195 @@
+"""
+Output jitter buffer: adaptive prebuffering and format normalization for the speaker.
+
+PlayoutBuffer sets how much audio to hold before playback starts from a high
+percentile of recent streams' chunk-arrival leads, raises it on an underrun
+and counts underruns and starved time. FormatConverter turns provider chunks
+(16-bit PCM or mu-law, any rate) into 16-bit PCM at the device rate, with
+optional gain toward a target loudness.
+"""
+import re
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.latency_stats import percentile
+
+_FORMAT = re.compile(r"^(pcm|ulaw)_(\d+)$")
+
+
+def parse_format(name, default_rate=16000):
+    """(encoding, sample_rate) for an ElevenLabs-style format name ("pcm_24000", "ulaw_8000"); "" = PCM."""
+    if not name:
+        return "pcm", default_rate
+    match = _FORMAT.match(name)
+    if not match:
+        raise ValueError(f"unsupported output format {name!r} (expected pcm_<rate> or ulaw_<rate>)")
+    return match.group(1), int(match.group(2))
+
+
+def _ulaw_table():
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = (((codes & 0x0F) << 3) + 0x84) << exponent
+    return np.where(codes & 0x80, 0x84 - magnitude, magnitude - 0x84).astype(np.float32)
+
+
+ULAW = _ulaw_table()
+
+
+class FormatConverter:
+    def __init__(self, src_format="", dst_rate=16000, target_rms=0.0, max_gain=4.0, gain_alpha=0.05,
+                 silence_rms=100.0):
+        self.encoding, self.src_rate = parse_format(src_format, dst_rate)
+        self.dst_rate = dst_rate
+        self.step = self.src_rate / dst_rate  # input samples per output sample
+        self.target_rms = target_rms          # 0 = no gain normalization
+        self.max_gain = max_gain
+        self.gain_alpha = gain_alpha          # per-chunk smoothing of the gain
+        self.silence_rms = silence_rms        # quieter chunks (sentence gaps) don't move the gain
+        self.width = 1 if self.encoding == "ulaw" else 2
+        self.passthrough = self.encoding == "pcm" and self.step == 1.0 and not target_rms
+        self.gain = 1.0
+        self.level = 0.0  # RMS of the last converted chunk, after gain
+        self._capacity = 0
+        self.reset()
+
+    def reset(self):
+        """New stream: no carried sample, phase or odd byte (the gain carries over)."""
+        self._last = 0.0
+        self._phase = 1.0  # position of the next output sample; index 0 is the previous chunk's last sample
+        self._odd = b""
+
+    def _reserve(self, n):
+        if n <= self._capacity:
+            return
+        self._capacity = max(n, 2 * self._capacity)
+        out = int(self._capacity / self.step) + 2
+        self._ext = np.empty(self._capacity + 1, dtype=np.float32)
+        self._ramp = np.arange(out, dtype=np.float64)
+        self._pos = np.empty(out, dtype=np.float64)
+        self._idx = np.empty(out, dtype=np.intp)
+        self._frac = np.empty(out, dtype=np.float32)
+        self._work = np.empty(out, dtype=np.float32)
+        self._next = np.empty(out, dtype=np.float32)
+        self._pcm = np.empty(out, dtype=np.int16)
+
+    def convert(self, chunk):
+        """Device-format bytes for one provider chunk (may be empty while a sample is split across chunks)."""
+        if self.passthrough:
+            if len(chunk) >= 2:
+                samples = np.frombuffer(chunk, dtype=np.int16, count=len(chunk) // 2).astype(np.float32)
+                self.level = float(np.sqrt(np.mean(samples * samples)))
+            return chunk
+        data = self._odd + bytes(chunk) if self._odd else chunk
+        usable = len(data) - len(data) % self.width
+        self._odd = bytes(data[usable:])
+        n = usable // self.width
+        if n == 0:
+            return b""
+        self._reserve(n)
+        ext = self._ext[:n + 1]
+        ext[0] = self._last
+        if self.encoding == "ulaw":
+            np.take(ULAW, np.frombuffer(data, dtype=np.uint8, count=n), out=ext[1:])
+        else:
+            ext[1:] = np.frombuffer(data, dtype=np.int16, count=n)
+        self._last = float(ext[n])
+
+        if self.step == 1.0:
+            count, out = n, self._work[:n]
+            out[:] = ext[1:]
+        else:
+            count = max(0, int(np.ceil((n - self._phase) / self.step)))
+            pos = self._pos[:count]
+            np.multiply(self._ramp[:count], self.step, out=pos)
+            pos += self._phase
+            idx, frac, out = self._idx[:count], self._frac[:count], self._work[:count]
+            idx[:] = pos  # truncation: positions are never negative
+            np.subtract(pos, idx, out=frac, casting="unsafe")
+            np.take(ext, idx, out=out)
+            nxt = self._next[:count]
+            np.take(ext[1:], idx, out=nxt)
+            nxt -= out
+            nxt *= frac
+            out += nxt
+            self._phase += count * self.step - n
+        if count == 0:
+            return b""
+
+        rms = float(np.sqrt(np.dot(out, out) / count))
+        if self.target_rms and rms > self.silence_rms:
+            wanted = min(self.max_gain, self.target_rms / rms)
+            self.gain += (wanted - self.gain) * self.gain_alpha
+        if self.gain != 1.0:
+            out *= self.gain
+        self.level = rms * self.gain
+        np.clip(out, -32768, 32767, out=out)
+        pcm = self._pcm[:count]
+        pcm[:] = out
+        return pcm.tobytes()
+
+
+class PlayoutBuffer:
+    def __init__(self, min_ms=40.0, max_ms=600.0, margin_ms=20.0, history=20, pct=90, clock=time.monotonic):
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.margin_ms = margin_ms
+        self.pct = pct
+        self.clock = clock
+        self.leads = deque(maxlen=history)  # lead each recent stream needed to play without underruns (ms)
+        self.boost_ms = 0.0                 # added after an underrun; decays as smooth streams come in
+        self.stream_start = None
+        self.stream_ms = 0.0                # audio that arrived in the current stream
+        self.stream_lead = 0.0
+        self.counters = {"streams": 0, "chunks": 0, "underruns": 0, "starved_ms": 0.0, "prebuffer_ms": 0.0}
+        self.depth_ms = deque(maxlen=2000)  # buffered audio behind each write
+        self.starved = deque(maxlen=1000)
+
+    @property
+    def target_ms(self):
+        base = percentile(self.leads, self.pct) + self.margin_ms if self.leads else self.min_ms
+        return min(self.max_ms, max(self.min_ms, base + self.boost_ms))
+
+    def arrived(self, audio_ms, t):
+        """A chunk of `audio_ms` (device time) was produced at `t`."""
+        if self.stream_start is None:
+            self.stream_start = t
+            self.stream_ms = 0.0
+            self.stream_lead = 0.0
+            self.counters["streams"] += 1
+        late = (t - self.stream_start) * 1000 - self.stream_ms
+        self.stream_lead = max(self.stream_lead, late)
+        self.stream_ms += audio_ms
+        self.counters["chunks"] += 1
+
+    def ended(self):
+        """The current stream is complete (or was flushed)."""
+        if self.stream_start is not None and self.stream_ms:
+            self.leads.append(self.stream_lead)
+            if self.stream_lead + self.margin_ms < self.target_ms:
+                self.boost_ms *= 0.5
+        self.stream_start = None
+
+    def underrun(self, starved_ms):
+        self.counters["underruns"] += 1
+        self.counters["starved_ms"] += starved_ms
+        self.starved.append(starved_ms)
+        self.boost_ms = min(self.max_ms, self.boost_ms + starved_ms)
+
+    def prebuffered(self, ms):
+        self.counters["prebuffer_ms"] += ms
+
+    def wrote(self, depth_ms):
+        self.depth_ms.append(depth_ms)
+
+    def stats(self):
+        depth = list(self.depth_ms)
+        return dict(
+            self.counters,
+            target_ms=self.target_ms,
+            depth_ms_p50=percentile(depth, 50) if depth else 0.0,
+            depth_ms_min=min(depth) if depth else 0.0,
+            last_starved_ms=self.starved[-1] if self.starved else None,
+        )
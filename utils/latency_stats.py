@@ -0,0 +1,31 @@
+"""Small helpers for turning raw latency samples into percentile summaries."""
+import math
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile (pct in 0..100) of an iterable of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return float(ordered[int(rank)])
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values):
+    """Returns count/mean/min/max/p50/p95/p99 for a list of samples (ms)."""
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "min": min(values),
+        "max": max(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
@@ -0,0 +1,206 @@
+"""
+Lexical and fuzzy-name index over the startup directory.
+
+LexicalIndex scores entry text with BM25 and matches startup names by
+character trigrams and phonetic keys, so STT-mangled names ("agni cool")
+still find their entry; candidates are rechecked with an edit-distance ratio.
+fuse() merges semantic, BM25 and name rankings with weighted reciprocal rank
+fusion.
+"""
+import difflib
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from utils.directory import tokenize
+
+try:
+    from Levenshtein import ratio as _ratio
+except ImportError:
+    def _ratio(a, b):
+        return difflib.SequenceMatcher(None, a, b).ratio()
+
+# Corporate suffixes visitors leave out ("Ather" for "Ather Energy Pvt Ltd")
+NAME_SUFFIXES = {"pvt", "private", "ltd", "limited", "llp", "inc", "technologies", "technology", "tech",
+                 "solutions", "systems", "labs", "innovations", "india", "ventures", "services", "company"}
+MAX_WINDOW = 3          # query words joined per name window
+NAME_MATCH = 0.8        # name score at which an entry is pinned to the top of fused results
+NAME_MIN = 0.65         # weaker name matches still take part in fusion
+RERANK = 8              # trigram candidates re-scored with the edit-distance ratio
+RRF_K = 60
+WEIGHTS = {"semantic": 1.0, "bm25": 0.8, "name": 1.5}
+
+_PHONETIC = [
+    (re.compile(r"^kn|^gn|^pn|^wr"), lambda m: m.group(0)[1]),
+    (re.compile(r"ph"), "f"), (re.compile(r"ck|q"), "k"), (re.compile(r"sch"), "sk"),
+    (re.compile(r"sh|ch"), "x"), (re.compile(r"th"), "0"), (re.compile(r"dg"), "j"),
+    (re.compile(r"gh(?![aeiou])"), ""), (re.compile(r"c(?=[eiy])"), "s"), (re.compile(r"c"), "k"),
+    (re.compile(r"g(?=[eiy])"), "j"), (re.compile(r"x"), "ks"), (re.compile(r"z"), "s"),
+    (re.compile(r"v"), "f"), (re.compile(r"(?<=.)[wy](?![aeiou])"), ""),
+]
+
+
+def phonetic_key(text):
+    """Rough Metaphone-style key: consonant skeleton with sound-alike spellings merged."""
+    s = re.sub(r"[^a-z]", "", text.lower())
+    if not s:
+        return ""
+    for pattern, repl in _PHONETIC:
+        s = pattern.sub(repl, s)
+    head, tail = s[0], re.sub(r"[aeiouy]", "", s[1:])
+    head = "a" if head in "aeiouy" else head
+    return re.sub(r"(.)\1+", r"\1", head + tail)
+
+
+def trigrams(text):
+    padded = f"${text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_keys(name):
+    """Name tokens joined without spaces, corporate suffixes dropped (unless that leaves nothing),
+    then the full name, then the leading word alone for multi-word names ("Agnikul" for "Agnikul Cosmos")."""
+    words = tokenize(name)
+    core = [w for w in words if w not in NAME_SUFFIXES] or words
+    keys = ["".join(core)] if core else []
+    if len(core) < len(words):
+        keys.append("".join(words))
+    if len(core) > 1 and len(core[0]) >= 4:
+        keys.append(core[0])
+    return keys
+
+
+class LexicalIndex:
+    def __init__(self, entries, k1=1.2, b=0.75):
+        self.entries = entries
+        self.k1 = k1
+        self.b = b
+
+        # BM25 over the whole entry text
+        self.postings = defaultdict(list)  # term -> [(row, tf)]
+        self.lengths = []
+        for row, entry in enumerate(entries):
+            counts = Counter(tokenize(entry.text))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((row, tf))
+        n = len(entries)
+        self.avg_length = sum(self.lengths) / n if n else 0.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+        # Character and phonetic trigrams over each name key (several keys may point at one row)
+        self.key_rows, self.keys, self.phonetic, char_counts, code_counts = [], [], [], [], []
+        postings = defaultdict(list)  # gram -> [key id]; phonetic grams are prefixed with "~"
+        for row, entry in enumerate(entries):
+            for key in name_keys(entry.name):
+                code = phonetic_key(key)
+                grams, codes = trigrams(key), {"~" + g for g in trigrams(code)} if code else set()
+                for gram in grams | codes:
+                    postings[gram].append(len(self.keys))
+                self.key_rows.append(row)
+                self.keys.append(key)
+                self.phonetic.append(code)
+                char_counts.append(len(grams))
+                code_counts.append(len(codes))
+        self.gram_postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.char_counts = np.array(char_counts, dtype=np.float32)
+        self.code_counts = np.array(code_counts, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def bm25(self, query, k=3):
+        """(row, score) by BM25, best first."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for row, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[row] / self.avg_length)
+                scores[row] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+    def windows(self, query):
+        words = tokenize(query)
+        for size in range(1, MAX_WINDOW + 1):
+            for i in range(len(words) - size + 1):
+                yield "".join(words[i:i + size])
+
+    def shared(self, grams):
+        """Number of `grams` each name key contains."""
+        found = [self.gram_postings[g] for g in grams if g in self.gram_postings]
+        if not found:
+            return None
+        return np.bincount(np.concatenate(found), minlength=len(self.keys))
+
+    def names(self, query, k=3, min_score=NAME_MIN, whole=False):
+        """(row, score) by fuzzy name match in [0, 1], best first.
+        whole: the query must be the name as a whole (no matching a few of its words)."""
+        if not self.keys:
+            return []
+        best = np.zeros(len(self.keys), dtype=np.float32)
+        best_window = np.zeros(len(self.keys), dtype=np.int32)
+        windows = ["".join(tokenize(query))] if whole else self.windows(query)
+        windows = [w for w in windows if len(w) >= 3]
+        if not windows:
+            return []
+        codes = []
+        for i, window in enumerate(windows):
+            grams = trigrams(window)
+            code = phonetic_key(window)
+            code = code if len(code) >= 3 else ""  # "dt" (data, dot, diet...) says too little
+            codes.append(code)
+            dice = np.zeros(len(self.keys), dtype=np.float32)
+            chars = self.shared(grams)
+            if chars is not None:
+                dice = 2 * chars / (len(grams) + self.char_counts)
+            if code:
+                code_grams = {"~" + g for g in trigrams(code)}
+                sounds = self.shared(code_grams)
+                if sounds is not None:
+                    dice = np.maximum(dice, 0.9 * 2 * sounds / (len(code_grams) + np.maximum(self.code_counts, 1)))
+            better = dice > best
+            best[better] = dice[better]
+            best_window[better] = i
+
+        top = min(RERANK, len(self.keys))
+        candidates = np.argpartition(-best, top - 1)[:top]
+        scores = {}
+        for key_id in candidates:
+            if best[key_id] <= 0:
+                continue
+            window, code = windows[best_window[key_id]], codes[best_window[key_id]]
+            score = max(float(best[key_id]), _ratio(window, self.keys[key_id]),
+                        0.9 * _ratio(code, self.phonetic[key_id]) if code else 0.0)
+            row = self.key_rows[key_id]
+            scores[row] = max(score, scores.get(row, 0.0))
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        return [(row, score) for row, score in ranked if score >= min_score][:k]
+
+    def hit(self, row, score):
+        return {"name": self.entries[row].name, "text": self.entries[row].text, "score": score}
+
+    def search(self, query, k=3):
+        """Lexical-only ranking (BM25 + names), e.g. when semantic search is unavailable or too slow."""
+        return self.fuse([], query, k)
+
+    def fuse(self, semantic_hits, query, k=3, names=None):
+        """Merges semantic hits with BM25 and name matches for `query` into one ranked hit list."""
+        names = self.names(query, k) if names is None else names
+        rankings = {
+            "semantic": semantic_hits,
+            "bm25": [self.hit(row, score) for row, score in self.bm25(query, k)],
+            "name": [self.hit(row, score) for row, score in names],
+        }
+        fused, hits = defaultdict(float), {}
+        for source, ranked in rankings.items():
+            for rank, hit in enumerate(ranked):
+                key = hit["name"] or hit["text"]
+                fused[key] += WEIGHTS[source] / (RRF_K + rank + 1)
+                hits.setdefault(key, hit)
+        pinned = {self.entries[row].name or self.entries[row].text: score for row, score in names if score >= NAME_MATCH}
+        order = sorted(fused, key=lambda key: (-pinned.get(key, 0.0), -fused[key]))
+        return [dict(hits[key], score=fused[key]) for key in order[:k]]
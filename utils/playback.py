@@ -0,0 +1,242 @@
+"""
+Dedicated speaker thread.
+
+PlaybackWorker owns the blocking output_stream.write() calls so the asyncio loop
+never waits on the sound card. Audio arrives through a bounded queue.Queue; the
+bound is what lets synthesis run ahead of playback without buffering a whole
+answer in memory.
+
+Chunks go in through put(), which stamps their arrival, and each stream (an
+answer, the greeting) ends with end_stream(). The worker converts them to the
+device format and holds the first ones back until the jitter buffer's target
+depth is reached (or the stream ends); after an underrun it prebuffers again
+instead of stuttering chunk by chunk. See utils/jitter_buffer.py.
+
+flush() (barge-in) drops everything not yet written under the worker's lock:
+no write starts after it, and a chunk the worker took off the queue while the
+flush ran is dropped too. The chunk already in output_stream.write() plays
+out; `on_silent` is called with the time it returned (the audio stopped).
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from utils.jitter_buffer import FormatConverter, PlayoutBuffer
+
+logger = logging.getLogger("Playback")
+
+END_OF_STREAM = b""  # queued by end_stream(); any empty chunk counts as one
+
+
+def silence(ms, sample_rate, sample_width=2, channels=1, encoding="pcm"):
+    """Silence of the given duration (PCM, or mu-law whose silence byte is 0xFF)."""
+    if encoding == "ulaw":
+        return b"\xff" * (int(sample_rate * ms / 1000) * channels)
+    return b"\x00" * (int(sample_rate * ms / 1000) * sample_width * channels)
+
+
+class PlaybackWorker(threading.Thread):
+    def __init__(self, output_stream, audio_queue, tail_ms=0, track_level=False, converter=None, jitter=None,
+                 speed=1.0, stream_timeout_s=2.0):
+        super().__init__(name="Playback", daemon=True)
+        self.output_stream = output_stream
+        self.audio_queue = audio_queue
+        self.tail = tail_ms / 1000.0  # keep reporting "active" briefly after the last write (echo tail)
+        self.writing = False
+        self.last_write = 0.0
+        self.bytes_played = 0
+        self.running = True
+        self.track_level = track_level
+        self.output_level = 0.0  # RMS of the chunk being played; the barge-in detector's echo reference
+        self.on_next_write = None  # one-shot callback(time) after the next chunk reaches the device (tracing)
+        self.converter = converter or FormatConverter()
+        self.jitter = jitter or PlayoutBuffer()
+        self.speed = speed  # device plays this many seconds of audio per wall second (benchmarks run faster)
+        self.stream_timeout = stream_timeout_s  # a stream without end_stream() is over after this long starved
+        self.bytes_per_ms = self.converter.dst_rate * 2 / 1000
+        self.lock = threading.Lock()
+        self.pending = deque()  # converted chunks (pcm, ms, level) taken off the queue, not yet written
+        self.pending_ms = 0.0
+        self.in_stream = False       # between a stream's first chunk and its end
+        self.ending = False          # end_stream() seen; finish once pending is played
+        self.prebuffer_until = None  # holding playback back until this time (or the target depth)
+        self.prebuffer_started = 0.0
+        self.played_until = 0.0      # when the last write returned: the device runs dry after that
+        self.generation = 0          # bumped by flush(); audio pulled under an older one is dropped
+        self.on_silent = None        # flush() callback(time), once the write in progress has returned
+
+    def put(self, chunk, timeout=None):
+        """Queues provider audio (raises queue.Full after `timeout`, like Queue.put)."""
+        self.audio_queue.put((time.monotonic(), chunk), timeout=timeout)
+
+    def end_stream(self, timeout=None):
+        self.put(END_OF_STREAM, timeout)
+
+    def run(self):
+        while self.step():
+            pass
+
+    def step(self):
+        """One scheduling decision: write, prebuffer, wait out a gap or wait for the next stream.
+        False once stop() was called."""
+        now = time.monotonic()
+        if self.pending and self.prebuffer_until is None:
+            self.write_next()
+            # Top up from the queue without blocking the device; the queue bound still limits run-ahead
+            got = self.pull(0)
+            while got == "audio" and self.pending_ms < self.jitter.target_ms:
+                got = self.pull(0)
+            return got != "stop"
+        if self.ending and not self.pending:
+            self.finish_stream()
+            return True
+        if self.prebuffer_until is not None:
+            if self.pending_ms >= self.jitter.target_ms or self.ending or now >= self.prebuffer_until:
+                self.jitter.prebuffered((now - self.prebuffer_started) * 1000 * self.speed)
+                self.prebuffer_until = None
+                return True
+            return self.pull(self.prebuffer_until - now) != "stop"
+        if self.in_stream:
+            # Mid-stream with nothing to play: the device starves until the next chunk arrives
+            got = self.pull(self.stream_timeout)
+            if got is None:
+                self.ending = True  # nobody called end_stream(); the stream is over
+            elif got == "audio":
+                self.jitter.underrun((time.monotonic() - self.played_until) * 1000 * self.speed)
+                self.start_prebuffer()
+            return got != "stop"
+        got = self.pull(None)
+        if got == "audio":
+            self.in_stream = True
+            self.start_prebuffer()
+        return got != "stop"
+
+    def pull(self, timeout):
+        """Takes one queue item: "audio" (converted into pending), "end", "stop" or None on timeout."""
+        generation = self.generation
+        try:
+            item = self.audio_queue.get_nowait() if timeout == 0 else self.audio_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is None:
+            self.audio_queue.task_done()
+            return "stop"
+        arrival, chunk = item
+        if not chunk:
+            self.audio_queue.task_done()
+            if self.in_stream:
+                self.ending = True
+            return "end"
+        try:
+            pcm = self.converter.convert(chunk)
+        except Exception as e:
+            logger.error(f"Playback conversion error: {e}")
+            pcm = b""
+        ms = len(pcm) / self.bytes_per_ms
+        self.jitter.arrived(ms, arrival * self.speed)  # in device time, like the audio durations
+        with self.lock:
+            if generation != self.generation:
+                self.audio_queue.task_done()  # taken off the queue while a flush ran: never play it
+                return None
+            self.pending.append((pcm, ms, self.converter.level))
+            self.pending_ms += ms
+        return "audio"
+
+    def start_prebuffer(self):
+        """Holds playback until the target depth is buffered, the stream ends, or the target's time has passed."""
+        self.prebuffer_started = time.monotonic()
+        self.prebuffer_until = self.prebuffer_started + self.jitter.target_ms / 1000 / self.speed
+
+    def finish_stream(self):
+        self.in_stream = self.ending = False
+        self.prebuffer_until = None
+        self.jitter.ended()
+        self.converter.reset()
+
+    def write_next(self):
+        with self.lock:
+            if not self.pending:
+                return
+            pcm, ms, level = self.pending.popleft()
+            self.pending_ms -= ms
+            depth = self.pending_ms
+            self.writing = bool(pcm)  # under the lock: a flush either sees this write or prevents it
+        if not pcm:
+            self.audio_queue.task_done()  # a chunk too short to yield a sample; its bytes carried over
+            return
+        self.write(pcm, level, depth)
+
+    def write(self, pcm, level, depth_ms):
+        try:
+            self.writing = True
+            if self.track_level:
+                self.output_level = level
+            self.jitter.wrote(depth_ms)
+            self.output_stream.write(pcm)
+            self.bytes_played += len(pcm)
+            callback, self.on_next_write = self.on_next_write, None
+            if callback:
+                callback(time.time())
+        except Exception as e:
+            logger.error(f"Playback error: {e}")
+        finally:
+            with self.lock:
+                self.writing = False
+                on_silent, self.on_silent = self.on_silent, None
+            self.last_write = self.played_until = time.monotonic()
+            self.audio_queue.task_done()
+            if on_silent:
+                on_silent(time.time())
+
+    def is_active(self):
+        """True while audio is queued, prebuffered, being written, or within the echo tail."""
+        return (
+            self.writing
+            or bool(self.pending)
+            or not self.audio_queue.empty()
+            or time.monotonic() - self.last_write < self.tail
+        )
+
+    def flush(self, reset_tail=False, on_silent=None):
+        """Drops all queued and prebuffered (not yet written) audio. reset_tail also ends the echo tail now.
+        on_silent(time) is called once no more audio reaches the device: now, or from the playback thread
+        when the write in progress returns."""
+        if reset_tail:
+            self.last_write = 0.0
+        dropped = 0
+        with self.lock:
+            self.generation += 1
+            while self.pending:
+                dropped += len(self.pending.popleft()[0])
+                self.audio_queue.task_done()
+            self.pending_ms = 0.0
+            silent = not self.writing
+            if not silent:
+                self.on_silent = on_silent
+        if silent and on_silent:
+            on_silent(time.time())
+        while True:
+            try:
+                item = self.audio_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                dropped += len(item[1])
+            self.audio_queue.task_done()
+        # The interrupted stream is over; the next chunk starts a new one
+        try:
+            self.end_stream(timeout=0.1)
+        except queue.Full:
+            pass
+        return dropped
+
+    def stats(self):
+        return dict(self.jitter.stats(), source_rate=self.converter.src_rate, device_rate=self.converter.dst_rate,
+                    gain=self.converter.gain)
+
+    def stop(self):
+        self.running = False
+        self.flush()
+        self.audio_queue.put_nowait(None)
@@ -0,0 +1,172 @@
+"""
+CPU-light presence detection for the kiosk webcam.
+
+AdaptivePresenceDetector runs a face detector on downscaled grayscale frames,
+skips static scenes with a motion gate, tracks inside the last box and adapts
+its detection interval to a CPU budget. PresenceDebouncer turns per-frame
+presence into a one-shot trigger after `hold_s`. Detectors are any object
+with detect(gray) -> [(x, y, w, h), ...].
+"""
+import math
+import time
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # numpy fallback for resizing; the Haar detector itself needs OpenCV
+    cv2 = None
+
+
+def downscale_gray(frame, width):
+    """Grayscale uint8 image at most `width` pixels wide, and the scale factor applied."""
+    h, w = frame.shape[:2]
+    scale = min(1.0, width / w)
+    if cv2 is not None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        return gray, scale
+    step = max(1, int(round(1 / scale)))
+    small = frame[::step, ::step]
+    if small.ndim == 3:  # BGR
+        small = small[..., 0] * 0.114 + small[..., 1] * 0.587 + small[..., 2] * 0.299
+    return small.astype(np.uint8), 1.0 / step
+
+
+class MotionGate:
+    """Fraction of pixels that changed since the previous frame, on a ~40 px wide thumbnail."""
+
+    def __init__(self, threshold=0.02, pixel_delta=18, thumb_width=40):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.thumb_width = thumb_width
+        self.previous = None
+
+    def update(self, gray):
+        step = max(1, gray.shape[1] // self.thumb_width)
+        thumb = gray[::step, ::step].astype(np.int16)
+        previous, self.previous = self.previous, thumb
+        if previous is None or previous.shape != thumb.shape:
+            return 1.0
+        return float(np.mean(np.abs(thumb - previous) > self.pixel_delta))
+
+    def moving(self, gray):
+        return self.update(gray) >= self.threshold
+
+
+class PresenceDebouncer:
+    """Fires once after `hold_s` of continuous presence; re-arms after `leave_s` without a face."""
+
+    def __init__(self, hold_s=2.0, leave_s=3.0, gap_s=0.5):
+        self.hold_s = hold_s
+        self.leave_s = leave_s
+        self.gap_s = gap_s  # brief misses (turned head, blink of the detector) don't restart the hold
+        self.since = None
+        self.last_seen = None
+        self.triggered = False
+
+    def update(self, present, now):
+        if present:
+            if self.since is None or now - self.last_seen > self.gap_s:
+                self.since = now
+            self.last_seen = now
+            if not self.triggered and now - self.since >= self.hold_s:
+                self.triggered = True
+                return True
+        elif self.last_seen is not None and now - self.last_seen > self.leave_s:
+            self.since = None
+            self.last_seen = None
+            self.triggered = False
+        return False
+
+
+class AdaptivePresenceDetector:
+    def __init__(self, detector, width=320, fps=15.0, cpu_budget=0.1, min_interval=1, max_interval=15,
+                 idle_interval_s=1.0, roi_margin=0.5, motion=None):
+        self.detector = detector
+        self.width = width
+        self.frame_s = 1.0 / fps
+        self.cpu_budget = cpu_budget    # share of one core the detector may use
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_interval = max(1, int(idle_interval_s * fps))  # empty, static scene: re-check this often
+        self.roi_margin = roi_margin
+        self.idle_interval_s = idle_interval_s
+        self.motion = motion or MotionGate()
+        self.interval = min_interval
+        self.since_detect = math.inf
+        self.box = None           # last face box, in downscaled coordinates
+        self.detect_ms = None     # EMA of one detection's cost
+        self.counters = {"frames": 0, "full_detections": 0, "roi_detections": 0, "coasted": 0,
+                         "motion_skips": 0, "detect_ms": 0.0, "frame_ms": 0.0}
+
+    def process(self, frame):
+        """True if a face is (believed to be) in this frame."""
+        started = time.thread_time()
+        self.counters["frames"] += 1
+        gray, _ = downscale_gray(frame, self.width)
+        moving = self.motion.moving(gray)
+        self.since_detect += 1
+
+        if self.box is not None:
+            if self.since_detect < self.interval:
+                self.counters["coasted"] += 1
+                present = True
+            else:
+                present = self.track(gray)
+        elif (moving and self.since_detect >= self.interval) or self.since_detect >= self.idle_interval:
+            present = self.detect(gray, None)
+        else:
+            self.counters["motion_skips"] += 1
+            present = False
+        self.counters["frame_ms"] += (time.thread_time() - started) * 1000
+        return present
+
+    def track(self, gray):
+        """Detection inside the last box plus a margin; full frame if the face left it."""
+        x, y, w, h = self.box
+        mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        if self.detect(gray[y0:y1, x0:x1], (x0, y0)):
+            return True
+        return self.detect(gray, None)
+
+    def detect(self, gray, offset):
+        started = time.thread_time()
+        boxes = self.detector.detect(gray)
+        cost = (time.thread_time() - started) * 1000
+        self.counters["detect_ms"] += cost
+        self.counters["roi_detections" if offset else "full_detections"] += 1
+        self.since_detect = 0
+        if offset is None:
+            self.detect_ms = cost if self.detect_ms is None else 0.8 * self.detect_ms + 0.2 * cost
+            self.adapt()
+        if len(boxes) == 0:
+            self.box = None
+            return False
+        x, y, w, h = max(boxes, key=lambda b: b[2] * b[3])
+        if offset:
+            x, y = x + offset[0], y + offset[1]
+        self.box = (int(x), int(y), int(w), int(h))
+        return True
+
+    def set_fps(self, fps):
+        """The capture rate changed (idle mode): same idle re-check period and CPU share at the new rate."""
+        self.frame_s = 1.0 / fps
+        self.idle_interval = max(1, int(self.idle_interval_s * fps))
+        self.adapt()
+
+    def adapt(self):
+        """Spaces detections so their cost stays within cpu_budget of the frame time."""
+        if self.detect_ms is None or self.cpu_budget <= 0:
+            return
+        needed = self.detect_ms / (self.cpu_budget * self.frame_s * 1000)
+        self.interval = int(min(self.max_interval, max(self.min_interval, math.ceil(needed))))
+
+    def stats(self):
+        frames = max(1, self.counters["frames"])
+        return dict(self.counters, interval=self.interval,
+                    cpu_ms_per_frame=self.counters["frame_ms"] / frames,
+                    detections_per_frame=(self.counters["full_detections"] + self.counters["roi_detections"]) / frames)
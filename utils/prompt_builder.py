@@ -0,0 +1,171 @@
+"""
+Token-budgeted prompt assembly with a rolling conversation memory.
+
+PromptBuilder splits the prompt into a fixed `prefix` (persona and
+instructions, sent as the system instruction so the provider can cache it, or
+put at the top of the context with `prefix_in_context`) and a per-turn context: the conversation so far, then directory entries
+packed by relevance into the remaining token budget. Entries the previous
+answer used are carried over at a lower weight so follow-ups keep their
+subject. ConversationMemory keeps recent exchanges verbatim and folds older
+ones into one line each. Token counts are estimates.
+"""
+import re
+from collections import deque
+
+PERSONA = (
+    "You are the Director's AI assistant at the IITM Research Park, speaking with visitors at the reception "
+    "kiosk. Be brief, high-impact and helpful, like the Director of the Research Park. Answer in one to three "
+    "short spoken sentences, without lists or markdown. Use only the directory entries provided; if they don't "
+    "answer the question, say so and suggest the reception desk. Resolve words like 'they' or 'their' from the "
+    "conversation so far."
+)
+
+HISTORY_LABEL = "Conversation so far:\n"
+ENTRIES_LABEL = "Directory entries:\n"
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text):
+    """Estimated LLM tokens in `text`."""
+    return sum(1 + (len(piece) - 1) // 6 for piece in _PIECE.findall(text or ""))
+
+
+def truncate(text, max_tokens):
+    """Longest prefix of whole sentences within `max_tokens` (whole words if the first sentence is too long)."""
+    kept, used = [], 0
+    for sentence in _SENTENCE_END.split(text):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return " ".join(kept)
+    words, used = [], 0
+    for word in text.split():
+        used += count_tokens(word)
+        if used > max_tokens:
+            break
+        words.append(word)
+    return " ".join(words) + "..." if words else ""
+
+
+class Prompt:
+    """One turn's prompt: the stable prefix, the per-turn context and their token counts."""
+
+    __slots__ = ("prefix", "context", "entries", "tokens", "dropped", "truncated")
+
+    def __init__(self, prefix, context, entries, tokens, dropped=0, truncated=0):
+        self.prefix = prefix
+        self.context = context      # what process_text() receives next to the question
+        self.entries = entries      # packed hits ({name, text, score}), in prompt order
+        self.tokens = tokens        # {"prefix", "history", "entries", "question", "total"}
+        self.dropped = dropped      # hits that didn't fit
+        self.truncated = truncated  # hits cut to fit
+
+    @classmethod
+    def raw(cls, question, context):
+        """The unbudgeted prompt: the retriever's context string as-is, no history."""
+        entries_tokens, question_tokens = count_tokens(context), count_tokens(question)
+        return cls("", context or "", [{"name": "", "text": context, "score": 1.0}] if context else [],
+                   {"prefix": 0, "history": 0, "entries": entries_tokens, "question": question_tokens,
+                    "total": entries_tokens + question_tokens})
+
+    @property
+    def entries_text(self):
+        """The grounding entries alone, without the history."""
+        return "\n".join(hit["text"] for hit in self.entries)
+
+
+class ConversationMemory:
+    def __init__(self, verbatim_turns=2, line_tokens=40):
+        self.verbatim_turns = verbatim_turns
+        self.line_tokens = line_tokens   # cap per folded exchange
+        self.turns = deque()             # (question, answer), most recent last
+        self.summary = deque(maxlen=50)  # one line per folded exchange
+        self.last_entries = []           # what the last answer was grounded on
+
+    def __len__(self):
+        return len(self.summary) + len(self.turns)
+
+    def add(self, question, answer, entries=()):
+        self.turns.append((question, answer))
+        self.last_entries = [hit for hit in entries if hit.get("text")]
+        while len(self.turns) > self.verbatim_turns:
+            old_question, old_answer = self.turns.popleft()
+            first = _SENTENCE_END.split(old_answer.strip(), maxsplit=1)[0]
+            self.summary.append(truncate(f"Earlier the visitor asked: {old_question} Answer: {first}",
+                                         self.line_tokens))
+
+    def render(self, max_tokens):
+        """History text within `max_tokens`; the oldest lines go first."""
+        lines = list(self.summary) + [f"Visitor: {q}\nAssistant: {a}" for q, a in self.turns]
+        costs = [count_tokens(line) for line in lines]
+        while lines and sum(costs) > max_tokens:
+            lines.pop(0)
+            costs.pop(0)
+        return "\n".join(lines)
+
+    def reset(self):
+        self.turns.clear()
+        self.summary.clear()
+        self.last_entries = []
+
+
+class PromptBuilder:
+    def __init__(self, budget_tokens=1200, history_tokens=250, prefix=PERSONA, min_entry_tokens=40,
+                 carry_weight=0.5):
+        self.budget_tokens = budget_tokens
+        self.history_tokens = history_tokens
+        self.prefix = prefix
+        self.prefix_tokens = count_tokens(prefix)
+        self.min_entry_tokens = min_entry_tokens  # smaller leftovers aren't worth a truncated entry
+        self.carry_weight = carry_weight          # score multiplier for the previous turn's entries
+        self.prefix_in_context = False            # set when the LLM client takes no system instruction
+
+    def candidates(self, hits, memory):
+        """Current hits and the previous turn's entries, by relevance, without duplicates."""
+        ranked = [dict(hit) for hit in hits if hit.get("text")]
+        if memory is not None:
+            ranked += [dict(hit, score=hit.get("score", 0.0) * self.carry_weight, carried=True)
+                       for hit in memory.last_entries]
+        seen, unique = set(), []
+        for hit in sorted(ranked, key=lambda h: h.get("score", 0.0), reverse=True):
+            key = hit.get("name") or hit["text"]
+            if key not in seen:
+                seen.add(key)
+                unique.append(hit)
+        return unique
+
+    def build(self, question, hits, memory=None):
+        history = memory.render(self.history_tokens) if memory is not None else ""
+        history_tokens, question_tokens = count_tokens(history), count_tokens(question)
+        labels = count_tokens(HISTORY_LABEL + ENTRIES_LABEL)
+        room = max(0, self.budget_tokens - self.prefix_tokens - history_tokens - question_tokens - labels)
+
+        entries, used, dropped, truncated = [], 0, 0, 0
+        for hit in self.candidates(hits, memory):
+            tokens = count_tokens(hit["text"])
+            if used + tokens > room:
+                if room - used < self.min_entry_tokens:
+                    dropped += 1
+                    continue
+                hit["text"] = truncate(hit["text"], room - used)
+                tokens = count_tokens(hit["text"])
+                truncated += 1
+            entries.append(hit)
+            used += tokens
+
+        sections = [self.prefix] if self.prefix_in_context else []
+        if history:
+            sections.append(HISTORY_LABEL + history)
+        if entries:
+            sections.append(ENTRIES_LABEL + "\n".join(hit["text"] for hit in entries))
+        context = "\n\n".join(sections)
+        tokens = {"prefix": self.prefix_tokens, "history": history_tokens, "entries": used,
+                  "question": question_tokens,
+                  "total": (0 if self.prefix_in_context else self.prefix_tokens) + count_tokens(context)
+                  + question_tokens}
+        return Prompt(self.prefix, context, entries, tokens, dropped, truncated)
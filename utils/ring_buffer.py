@@ -0,0 +1,94 @@
+"""
+Preallocated byte ring buffer between the PortAudio callback and the event loop.
+
+The audio thread only copies each frame into a fixed bytearray (no queue items,
+futures or coroutines per frame). One async consumer drains whatever has
+accumulated in a single read, which is what coalesces frames when the consumer
+falls behind. When the writer laps the reader, the oldest audio is overwritten:
+stale mic audio is worth less than fresh audio, and the loss is counted.
+"""
+import threading
+import time
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity_bytes, align=2):
+        self.capacity = capacity_bytes - capacity_bytes % align
+        self.align = align  # bytes per sample; overruns never split a sample
+        self.buffer = bytearray(self.capacity)
+        self.view = memoryview(self.buffer)
+        self.lock = threading.Lock()
+        self.read_pos = 0
+        self.write_pos = 0
+        self.size = 0
+        self.last_write = 0.0  # wall time of the newest byte
+
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.overruns = 0       # writes that had to overwrite unread audio
+        self.dropped_bytes = 0  # unread audio lost to those overruns
+        self.max_fill = 0
+
+    def write(self, data):
+        """Copies one buffer in (audio thread). Overwrites the oldest audio if full."""
+        n = len(data)
+        if n == 0:
+            return
+        with self.lock:
+            if n > self.capacity:
+                self.dropped_bytes += n - self.capacity
+                data = memoryview(data)[n - self.capacity:]
+                n = self.capacity
+            overflow = self.size + n - self.capacity
+            if overflow > 0:
+                overflow += -overflow % self.align
+                self.read_pos = (self.read_pos + overflow) % self.capacity
+                self.size -= overflow
+                self.overruns += 1
+                self.dropped_bytes += overflow
+
+            end = self.write_pos + n
+            if end <= self.capacity:
+                self.view[self.write_pos:end] = data
+            else:
+                first = self.capacity - self.write_pos
+                self.view[self.write_pos:] = data[:first]
+                self.view[:n - first] = data[first:]
+            self.write_pos = end % self.capacity
+            self.size += n
+            self.bytes_written += n
+            self.last_write = time.time()
+            if self.size > self.max_fill:
+                self.max_fill = self.size
+
+    def read(self, max_bytes):
+        """Returns up to max_bytes of the oldest unread audio (b"" when empty)."""
+        with self.lock:
+            n = min(self.size, max_bytes)
+            n -= n % self.align
+            if n == 0:
+                return b""
+            end = self.read_pos + n
+            if end <= self.capacity:
+                data = bytes(self.view[self.read_pos:end])
+            else:
+                data = bytes(self.view[self.read_pos:]) + bytes(self.view[:end - self.capacity])
+            self.read_pos = end % self.capacity
+            self.size -= n
+            self.bytes_read += n
+            return data
+
+    def clear(self):
+        with self.lock:
+            self.read_pos = self.write_pos = self.size = 0
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "fill": self.size,
+            "max_fill": self.max_fill,
+            "bytes_written": self.bytes_written,
+            "bytes_read": self.bytes_read,
+            "overruns": self.overruns,
+            "dropped_bytes": self.dropped_bytes,
+        }
@@ -0,0 +1,150 @@
+"""
+Incremental sentence/clause segmenter for the LLM -> TTS boundary.
+
+Tokens are fed as they stream in; only newly arrived characters are scanned, so
+cost is linear in response length. A terminator (. ! ? or an ellipsis) only ends
+a sentence when followed by whitespace, which keeps "3.5 crore", "iitmrp.org" and
+"e.g." intact; known abbreviations ("Dr.", "Pvt.") and initials never end one.
+"No." and "Co." are also plain words, so they only count as abbreviations
+before a number ("No. 5") or a capitalised word ("Co. Ltd").
+
+Optional early-first-chunk policy: the first segment of each response may be cut
+at a clause break (, ; :) or after N words so TTS can start sooner; subsequent
+segments are full sentences.
+"""
+
+TERMINATORS = ".!?…"
+CLOSERS = "\"')]”’"
+CLAUSE_BREAKS = ",;:"
+
+ABBREVIATIONS = {
+    "dr", "mr", "mrs", "ms", "prof", "sr", "jr", "st", "vs", "mt", "fig",
+    "inc", "ltd", "pvt", "corp", "dept", "govt", "approx", "est",
+    "e.g", "i.e", "a.m", "p.m", "u.s", "rs", "ph.d", "b.tech", "m.tech",
+}
+# Abbreviations that are also words ("No.", "Co."): one only when the next word passes the test
+CONDITIONAL_ABBREVIATIONS = {"no": str.isdigit, "nos": str.isdigit, "co": str.isupper}
+
+
+class SentenceSegmenter:
+    def __init__(self, first_chunk_words=0, first_chunk_clause=False, min_clause_words=3,
+                 abbreviations=ABBREVIATIONS):
+        self.first_chunk_words = first_chunk_words  # 0 disables the word-count cut
+        self.first_chunk_clause = first_chunk_clause
+        self.min_clause_words = min_clause_words
+        self.abbreviations = abbreviations
+        self.reset()
+
+    def reset(self):
+        """Starts a new response (re-arms the early-first-chunk policy)."""
+        self.buffer = ""
+        self.pos = 0          # next unscanned index
+        self.start = 0        # start of the current segment
+        self.words = 0        # completed words in the current segment
+        self.word_start = -1  # index where the current word began, -1 between words
+        self.emitted = 0
+
+    def feed(self, text):
+        """Adds streamed text; returns the list of segments completed by it."""
+        self.buffer += text
+        segments = []
+        buf = self.buffer
+        n = len(buf)
+        i = self.pos
+        while i < n:
+            c = buf[i]
+            if c.isspace():
+                if self.word_start >= 0:
+                    self.words += 1
+                    self.word_start = -1
+                if c == "\n" and self.words:
+                    self._emit(i, segments)
+                elif self._early() and self.first_chunk_words and self.words >= self.first_chunk_words:
+                    self._emit(i, segments)
+                i += 1
+                continue
+
+            if self.word_start < 0:
+                self.word_start = i
+
+            if c in TERMINATORS:
+                j = i
+                while j < n and (buf[j] in TERMINATORS or buf[j] in CLOSERS):
+                    j += 1
+                if j == n:
+                    break  # can't decide until the next character arrives
+                if buf[j].isspace():
+                    run = buf[i:j]
+                    if self._is_ellipsis(run):
+                        k = j
+                        while k < n and buf[k].isspace():
+                            k += 1
+                        if k == n:
+                            break
+                        boundary = buf[k].isupper()
+                    elif run[0] == ".":
+                        word = buf[self.word_start:i]
+                        test = CONDITIONAL_ABBREVIATIONS.get(word.lower()) if run == "." else None
+                        if test is None:
+                            boundary = not self._is_abbreviation(word)
+                        else:
+                            k = j
+                            while k < n and buf[k].isspace():
+                                k += 1
+                            if k == n:
+                                break
+                            boundary = not test(buf[k])
+                    else:
+                        boundary = True
+                    if boundary:
+                        self.words += 1
+                        self.word_start = -1
+                        self._emit(j, segments)
+                i = j
+                continue
+
+            if c in CLAUSE_BREAKS and self._early() and self.first_chunk_clause:
+                if i + 1 == n:
+                    break
+                if buf[i + 1].isspace() and self.words + 1 >= self.min_clause_words:
+                    self.words += 1
+                    self.word_start = -1
+                    self._emit(i + 1, segments)
+            i += 1
+
+        self.pos = i
+        if self.start:
+            # Drop emitted text so the buffer only ever holds the unfinished segment
+            self.buffer = self.buffer[self.start:]
+            self.pos -= self.start
+            if self.word_start >= 0:
+                self.word_start -= self.start
+            self.start = 0
+        return segments
+
+    def flush(self):
+        """End of response: returns whatever is left as a final segment and resets."""
+        tail = self.buffer[self.start:].strip()
+        self.reset()
+        return [tail] if tail else []
+
+    def _early(self):
+        return self.emitted == 0
+
+    def _emit(self, end, segments):
+        segment = self.buffer[self.start:end].strip()
+        self.start = end
+        self.words = 0
+        if segment:
+            segments.append(segment)
+            self.emitted += 1
+
+    def _is_abbreviation(self, word):
+        word = word.lstrip("(\"'“‘").lower()
+        if len(word) == 1 and word.isalpha():
+            return True  # initials: "A. P. J. Abdul Kalam"
+        return word in self.abbreviations
+
+    @staticmethod
+    def _is_ellipsis(run):
+        return "…" in run or run.startswith("..")
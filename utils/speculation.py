@@ -0,0 +1,202 @@
+"""
+Speculative retrieval / LLM prefetch on interim transcripts.
+
+While the visitor is still talking, Deepgram streams interim hypotheses. Once a
+hypothesis has been stable for a few updates we start RAG (and optionally the
+LLM) on it. If the hypothesis later changes meaningfully the work is cancelled
+and restarted; when the final transcript arrives, an in-flight result whose text
+matches is promoted instead of starting from scratch.
+"""
+import asyncio
+import difflib
+import logging
+import re
+import time
+
+from utils.directory import STOPWORDS
+
+logger = logging.getLogger("Speculation")
+
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+
+
+def normalize(text):
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+# Words two hypotheses may differ in and still ask the same thing; question words change the question
+FILLER_WORDS = STOPWORDS - {"what", "who", "where", "when", "which", "how"}
+
+
+def same_question(a, b):
+    """True when two normalized transcripts differ at most in filler words ("the", "does", ...).
+    Any other word (a startup's name, "founded" vs "funded") makes it a different question."""
+    if a == b:
+        return True
+    a, b = a.split(), b.split()
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag != "equal" and any(word not in FILLER_WORDS for word in a[i1:i2] + b[j1:j2]):
+            return False
+    return True
+
+
+class Speculation:
+    """One speculative attempt for a single hypothesis."""
+
+    def __init__(self, text, norm):
+        self.text = text
+        self.norm = norm
+        self.started = time.time()
+        self.rag_task = None
+        self.llm_task = None
+        self.tokens = asyncio.Queue()  # streamed LLM tokens; None marks the end
+        self.token_count = 0
+
+    def cancel(self):
+        for task in (self.rag_task, self.llm_task):
+            if task and not task.done():
+                task.cancel()
+
+
+class SpeculativePrefetcher:
+    def __init__(self, search_fn, llm_factory=None, stable_count=2, min_words=3):
+        """
+        search_fn: async callable(text) -> context (a utils.prompt_builder.Prompt or a context string).
+        llm_factory: callable(token_callback) -> LLM service; None disables LLM prefetch.
+        """
+        self.search_fn = search_fn
+        self.llm = llm_factory(self._on_token) if llm_factory else None
+        self.stable_count = stable_count
+        self.min_words = min_words
+
+        self.current = None
+        self.llm_target = None  # speculation that receives tokens from self.llm
+        self.promoted = None    # speculation whose LLM stream was handed out by resolve()
+        self.last_norm = ""
+        self.stable = 0
+        self.counters = {
+            "started": 0,
+            "restarted": 0,
+            "rag_hits": 0,
+            "llm_hits": 0,
+            "misses": 0,
+            "wasted_ms": 0.0,
+            "wasted_llm_tokens": 0,
+        }
+
+    def on_interim(self, text):
+        """Feed every interim transcript (called on the event loop)."""
+        norm = normalize(text)
+        if len(norm.split()) < self.min_words:
+            return
+        if norm == self.last_norm:
+            self.stable += 1
+        else:
+            self.last_norm = norm
+            self.stable = 1
+        if self.stable < self.stable_count:
+            return
+        if self.current and same_question(self.current.norm, norm):
+            return  # same question, keep the work in flight
+        if self.current:
+            self.counters["restarted"] += 1
+            self._discard(self.current)
+        self._launch(text, norm)
+
+    async def resolve(self, final_text):
+        """
+        Called with the final transcript. Returns (context, token_queue) where either
+        may be None: context is the promoted RAG result, token_queue streams the
+        promoted LLM answer (terminated by None).
+        """
+        self.promoted = None  # a new turn: the previous turn's stream is no longer this turn's to discard
+        spec = self.current
+        self.current = None
+        self.last_norm = ""
+        self.stable = 0
+        if spec is None:
+            return None, None
+
+        norm = normalize(final_text)
+        if not same_question(spec.norm, norm):
+            self.counters["misses"] += 1
+            self._discard(spec)
+            return None, None
+
+        context = None
+        try:
+            context = await spec.rag_task
+            self.counters["rag_hits"] += 1
+        except (asyncio.CancelledError, Exception) as e:
+            logger.warning(f"Speculative RAG failed, searching again: {e}")
+
+        if spec.llm_task and norm == spec.norm and context is not None:
+            self.counters["llm_hits"] += 1
+            self.promoted = spec
+            return context, spec.tokens
+
+        if spec.llm_task:
+            self._discard_llm(spec)
+        return context, None
+
+    def abandon(self):
+        """The final transcript was answered without retrieval or the LLM: drop the work in flight."""
+        self.promoted = None
+        spec = self.current
+        self.current = None
+        self.last_norm = ""
+        self.stable = 0
+        if spec is not None:
+            self._discard(spec)
+
+    def consumed(self):
+        """The promoted stream was read to its end: a later barge-in has nothing of it to discard."""
+        self.promoted = None
+
+    def discard_promoted(self):
+        """The promoted LLM stream isn't needed after all (e.g. answered from cache)."""
+        if self.promoted is not None:
+            self.counters["llm_hits"] -= 1
+            self._discard_llm(self.promoted)
+            self.promoted = None
+
+    def stats(self):
+        return dict(self.counters)
+
+    def _launch(self, text, norm):
+        spec = Speculation(text, norm)
+        spec.rag_task = asyncio.create_task(self.search_fn(text))
+        if self.llm:
+            self.llm_target = spec
+            spec.llm_task = asyncio.create_task(self._prefetch_llm(spec))
+        self.current = spec
+        self.counters["started"] += 1
+        logger.debug(f"Speculating on: {text}")
+
+    async def _prefetch_llm(self, spec):
+        try:
+            context = await spec.rag_task
+            await self.llm.process_text(spec.text, getattr(context, "context", context))
+        finally:
+            spec.tokens.put_nowait(None)
+
+    async def _on_token(self, text):
+        # Only one speculation runs at a time; late tokens from a cancelled one are dropped
+        spec = self.llm_target
+        if spec is not None:
+            spec.token_count += 1
+            spec.tokens.put_nowait(text)
+
+    def _discard(self, spec):
+        if self.llm_target is spec:
+            self.llm_target = None
+        spec.cancel()
+        self.counters["wasted_ms"] += (time.time() - spec.started) * 1000
+        self.counters["wasted_llm_tokens"] += spec.token_count
+
+    def _discard_llm(self, spec):
+        if self.llm_target is spec:
+            self.llm_target = None
+        if not spec.llm_task.done():
+            spec.llm_task.cancel()
+        self.counters["wasted_llm_tokens"] += spec.token_count
@@ -0,0 +1,177 @@
+"""
+Start-up orchestration with a per-step timeline.
+
+Startup runs named steps as soon as their dependencies finish: blocking
+callables on worker threads, coroutine functions on the event loop. report()
+renders the timeline with the critical path and the time-to-ready budget.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("Startup")
+
+PROCESS_T0 = time.perf_counter()  # as close to process start as an import gets
+
+
+class StartupError(RuntimeError):
+    pass
+
+
+class Step:
+    def __init__(self, name, fn, after=(), required=True):
+        self.name = name
+        self.fn = fn
+        self.after = tuple(after)
+        self.required = required
+
+
+class Startup:
+    def __init__(self, budget_s=None, parallel=True, t0=PROCESS_T0):
+        self.budget_s = budget_s
+        self.parallel = parallel
+        self.t0 = t0
+        self.steps = []
+        self.deps = {}  # step name -> names it waited for, kept for critical_path()
+        self.results = {}
+        self.records = []  # {name, phase, start_ms, end_ms, thread, ok, error}
+        self.ready_ms = None
+        self.lock = threading.Lock()
+
+    def add(self, name, fn, after=(), required=True):
+        """Registers a step; `after` names steps (added earlier) whose results it needs."""
+        known = {s.name for s in self.steps} | set(self.results)
+        missing = [d for d in after if d not in known]
+        if missing:
+            raise ValueError(f"step {name!r} depends on unknown steps {missing}")
+        self.steps.append(Step(name, fn, after, required))
+        self.deps[name] = tuple(after)
+
+    def now_ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+    def _record(self, step, phase, started, error=None):
+        with self.lock:
+            self.records.append({
+                "name": step.name, "phase": phase, "start_ms": started, "end_ms": self.now_ms(),
+                "thread": threading.current_thread().name, "ok": error is None,
+                "error": None if error is None else f"{type(error).__name__}: {error}",
+            })
+
+    def _failed(self, step, phase, started, error):
+        self._record(step, phase, started, error)
+        if step.required:
+            raise StartupError(f"{step.name} failed: {error}") from error
+        logger.warning(f"Optional start-up step {step.name} failed: {error}")
+
+    def run_sync(self, phase="init"):
+        """Runs the registered blocking steps on a thread pool; returns {name: result}."""
+        steps, self.steps = self.steps, []
+        futures = {}
+
+        def call(step):
+            for dep in step.after:
+                if dep in futures:
+                    futures[dep].result()  # re-raises a required dependency's failure
+            started = self.now_ms()
+            try:
+                result = step.fn()
+            except Exception as e:
+                self._failed(step, phase, started, e)
+                return None
+            self._record(step, phase, started)
+            self.results[step.name] = result
+            return result
+
+        # Steps are submitted in registration order, so one worker still satisfies every dependency
+        workers = len(steps) if self.parallel else 1
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="Startup") as pool:
+            for step in steps:
+                futures[step.name] = pool.submit(call, step)
+            for future in futures.values():
+                future.result()
+        return self.results
+
+    async def run(self, phase="start"):
+        """Runs the registered steps concurrently on the loop (coroutines) and the default executor."""
+        loop = asyncio.get_running_loop()
+        steps, self.steps = self.steps, []
+        tasks = {}
+
+        async def call(step):
+            for dep in step.after:
+                if dep in tasks:
+                    await tasks[dep]
+            started = self.now_ms()
+            try:
+                if asyncio.iscoroutinefunction(step.fn):
+                    result = await step.fn()
+                else:
+                    result = await loop.run_in_executor(None, step.fn)
+            except Exception as e:
+                self._failed(step, phase, started, e)
+                return None
+            self._record(step, phase, started)
+            self.results[step.name] = result
+            return result
+
+        if self.parallel:
+            for step in steps:
+                tasks[step.name] = asyncio.ensure_future(call(step))
+            await asyncio.gather(*tasks.values())
+        else:
+            for step in steps:
+                await call(step)
+        return self.results
+
+    def ready(self):
+        """Marks the kiosk as able to take its first question."""
+        self.ready_ms = self.now_ms()
+        if self.budget_s and self.ready_ms > self.budget_s * 1000:
+            slowest = max(self.records, key=lambda r: r["end_ms"] - r["start_ms"], default=None)
+            logger.warning(f"Start-up took {self.ready_ms / 1000:.2f} s, over the {self.budget_s:.1f} s budget"
+                           + (f" (slowest step: {slowest['name']})" if slowest else ""))
+        return self.ready_ms
+
+    def critical_path(self):
+        """Steps on the chain that decided when the last step finished: each step's latest-finishing
+        dependency, or for a step without one, the last step of the phase before it."""
+        by_name = {r["name"]: r for r in self.records}
+        path, name = [], max(by_name, key=lambda n: by_name[n]["end_ms"], default=None)
+        while name:
+            path.append(name)
+            record = by_name[name]
+            before = [d for d in self.deps.get(name, ()) if d in by_name] or [
+                n for n, r in by_name.items() if r["phase"] != record["phase"] and r["end_ms"] <= record["start_ms"]]
+            name = max(before, key=lambda n: by_name[n]["end_ms"], default=None)
+        return path[::-1]
+
+    def summary(self):
+        return {
+            "ready_ms": self.ready_ms,
+            "budget_ms": self.budget_s * 1000 if self.budget_s else None,
+            "parallel": self.parallel,
+            "serial_ms": sum(r["end_ms"] - r["start_ms"] for r in self.records),
+            "critical_path": self.critical_path(),
+            "steps": sorted(self.records, key=lambda r: r["start_ms"]),
+        }
+
+    def report(self, width=40):
+        """Text timeline: one bar per step on a shared time axis."""
+        records = sorted(self.records, key=lambda r: r["start_ms"])
+        end = max([r["end_ms"] for r in records] + [self.ready_ms or 0]) or 1.0
+        serial = sum(r["end_ms"] - r["start_ms"] for r in records)
+        ready = f"ready in {self.ready_ms / 1000:.2f} s" if self.ready_ms is not None else "not ready"
+        budget = f", budget {self.budget_s:.1f} s" if self.budget_s else ""
+        lines = [f"🚀 Start-up timeline ({ready}{budget}; steps sum to {serial / 1000:.2f} s)"]
+        for r in records:
+            a = int(r["start_ms"] / end * width)
+            b = max(a + 1, int(r["end_ms"] / end * width))
+            bar = " " * a + "█" * (b - a) + " " * (width - b)
+            status = "" if r["ok"] else f"  FAILED {r['error']}"
+            lines.append(f"   {r['name']:<14}|{bar}| {r['start_ms']:7.0f} -> {r['end_ms']:7.0f} ms "
+                         f"({r['end_ms'] - r['start_ms']:.0f}){status}")
+        lines.append(f"   critical path: {' -> '.join(self.critical_path())}")
+        return "\n".join(lines)
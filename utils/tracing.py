@@ -0,0 +1,284 @@
+"""
+Per-turn latency tracing.
+
+Each conversational turn gets a TurnTrace: timestamps ("marks") for mic speech
+start/end, VAD onset, STT interim/final, RAG, LLM first/last token, one span per
+TTS sentence and the first audio actually written to the speaker. When the turn
+ends, the Tracer derives per-stage durations, feeds them into rolling
+histograms and appends the whole trace as one JSON line.
+
+Histograms are fixed log-spaced buckets (~7% wide) kept per time slice, so
+observing a sample is a bisect and an increment, and p50/p95/p99 cover the last
+`window_s` of traffic rather than one turn. They are exported as a
+Prometheus-style summary, to a text file and/or a small HTTP endpoint.
+"""
+import bisect
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+logger = logging.getLogger("Tracing")
+
+# Derived stage durations: (stage, start mark, end mark)
+STAGES = (
+    ("vad_onset", "speech_start", "speech_detected"),   # mic frame -> VAD decision (incl. ingress lag)
+    ("first_interim", "speech_start", "first_interim"),
+    ("vad_to_final", "speech_end", "stt_final"),
+    ("rag", "rag_start", "rag_end"),
+    ("ttft", "llm_start", "llm_first_token"),
+    ("llm_stream", "llm_first_token", "llm_last_token"),
+    ("ttfa", "stt_final", "first_audio"),               # first audio handed to the playback queue
+    ("playout", "first_audio", "first_audio_written"),  # ... until the speaker thread wrote it
+    ("mouth_to_ear", "speech_end", "first_audio_written"),
+    ("turn", "stt_final", "end"),
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class TurnTrace:
+    __slots__ = ("turn_id", "marks", "sentences", "attrs", "finished")
+
+    def __init__(self, turn_id):
+        self.turn_id = turn_id
+        self.marks = {}
+        self.sentences = []
+        self.attrs = {}
+        self.finished = False
+
+    def mark(self, name, t=None):
+        self.marks[name] = time.time() if t is None else t
+
+    def first(self, name, t=None):
+        """Marks only the first occurrence (first interim, first token, ...)."""
+        if name not in self.marks:
+            self.marks[name] = time.time() if t is None else t
+
+    def get(self, name, default=0.0):
+        return self.marks.get(name, default)
+
+    def start_sentence(self, chars, cached=False):
+        """Opens a TTS sentence span; returns the dict the caller fills in (first_chunk, end)."""
+        span = {"chars": chars, "cached": cached, "start": time.time()}
+        self.sentences.append(span)
+        return span
+
+    def stages(self):
+        """Stage durations (ms) for every stage whose start and end were both marked."""
+        out = {}
+        for stage, start, end in STAGES:
+            t0, t1 = self.marks.get(start), self.marks.get(end)
+            if t0 and t1 and t1 >= t0:
+                out[stage] = (t1 - t0) * 1000
+        if self.sentences and "first_chunk" in self.sentences[0]:
+            out["tts_first_chunk"] = (self.sentences[0]["first_chunk"] - self.sentences[0]["start"]) * 1000
+        return out
+
+    def to_record(self):
+        t0 = min(self.marks.values()) if self.marks else 0.0
+        rel = lambda t: round((t - t0) * 1000, 3)
+        return {
+            "turn": self.turn_id,
+            "ts": t0,
+            "attrs": self.attrs,
+            "marks_ms": {name: rel(t) for name, t in sorted(self.marks.items(), key=lambda kv: kv[1])},
+            "sentences": [
+                {k: (rel(v) if k in ("start", "first_chunk", "end") else v) for k, v in span.items()}
+                for span in self.sentences
+            ],
+            "stages_ms": {k: round(v, 3) for k, v in self.stages().items()},
+        }
+
+
+class RollingHistogram:
+    """Log-bucketed latency histogram over a sliding time window (plus lifetime sum/count)."""
+
+    def __init__(self, window_s=3600, slices=12, low_ms=0.05, high_ms=120000.0, growth=1.07):
+        n = int(math.ceil(math.log(high_ms / low_ms) / math.log(growth))) + 1
+        self.bounds = [low_ms * growth ** i for i in range(n)]  # upper bound of each bucket
+        self.slice_s = window_s / slices
+        self.counts = np.zeros((slices, n + 1), dtype=np.int64)  # last column: overflow
+        self.slice_ids = np.full(slices, -1, dtype=np.int64)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, ms, now=None):
+        slice_id = int((time.time() if now is None else now) // self.slice_s)
+        row = slice_id % len(self.slice_ids)
+        if self.slice_ids[row] != slice_id:
+            self.counts[row] = 0
+            self.slice_ids[row] = slice_id
+        self.counts[row, bisect.bisect_left(self.bounds, ms)] += 1
+        self.total += 1
+        self.sum += ms
+
+    def window_counts(self, now=None):
+        current = int((time.time() if now is None else now) // self.slice_s)
+        live = self.slice_ids > current - len(self.slice_ids)
+        return self.counts[live].sum(axis=0)
+
+    def quantiles(self, qs=QUANTILES, now=None):
+        counts = self.window_counts(now)
+        n = int(counts.sum())
+        if n == 0:
+            return {q: 0.0 for q in qs}
+        cumulative = np.cumsum(counts)
+        out = {}
+        for q in qs:
+            rank = q * n
+            i = min(int(np.searchsorted(cumulative, rank)), len(self.bounds))
+            if i >= len(self.bounds):
+                out[q] = self.bounds[-1]
+                continue
+            lo = self.bounds[i - 1] if i > 0 else 0.0
+            below = cumulative[i - 1] if i > 0 else 0
+            frac = (rank - below) / counts[i] if counts[i] else 1.0
+            out[q] = lo + (self.bounds[i] - lo) * frac
+        return out
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    tracer = None
+
+    def do_GET(self):
+        body = self.tracer.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Tracer:
+    def __init__(self, trace_path=None, prom_path=None, window_s=3600, slices=12, prom_interval_s=10.0):
+        self.trace_path = trace_path
+        self.prom_path = prom_path
+        self.window_s = window_s
+        self.slices = slices
+        self.prom_interval = prom_interval_s
+        self.histograms = {}
+        self.turn_ids = itertools.count(1)
+        self.lock = threading.RLock()  # _write_prometheus re-enters via prometheus_text
+        self.trace_file = None
+        self.next_prom_write = 0.0
+        self.server = None
+        self.counters = {"turns": 0, "interrupted": 0, "abandoned": 0, "trace_errors": 0}
+
+    def start_turn(self):
+        return TurnTrace(next(self.turn_ids))
+
+    def finish(self, trace, status="ok"):
+        """Closes a turn: records its stage durations and writes the trace line. Idempotent."""
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        trace.first("end")
+        trace.attrs["status"] = status
+        record = trace.to_record()
+        with self.lock:
+            self.counters["turns"] += 1
+            if status in self.counters:
+                self.counters[status] += 1
+            for stage, ms in record["stages_ms"].items():
+                self._observe(stage, ms)
+            if "ttfa" in record["stages_ms"] and trace.attrs.get("path"):
+                # per answer path too: a cached or fast-path answer shouldn't hide a slow LLM (ttfa_llm, ...)
+                self._observe(f"ttfa_{trace.attrs['path']}", record["stages_ms"]["ttfa"])
+            for span in trace.sentences:
+                if "first_chunk" in span:
+                    self._observe("tts_sentence_first_chunk", (span["first_chunk"] - span["start"]) * 1000)
+                if "end" in span:
+                    self._observe("tts_sentence", (span["end"] - span["start"]) * 1000)
+            self._write_trace(record)
+            if self.prom_path and time.monotonic() >= self.next_prom_write:
+                self.next_prom_write = time.monotonic() + self.prom_interval
+                self._write_prometheus()
+
+    def observe(self, stage, ms):
+        with self.lock:
+            self._observe(stage, ms)
+
+    def percentiles(self, stage):
+        """Rolling {"p50", "p95", "p99", "count"} for one stage (ms)."""
+        with self.lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "count": 0}
+            q = hist.quantiles()
+            return {"p50": q[0.5], "p95": q[0.95], "p99": q[0.99], "count": int(hist.window_counts().sum())}
+
+    def stats(self):
+        return dict(self.counters, stages={stage: self.percentiles(stage) for stage in list(self.histograms)})
+
+    def prometheus_text(self):
+        with self.lock:
+            lines = [
+                "# HELP s2s_stage_latency_ms Per-stage turn latency; quantiles over the rolling window.",
+                "# TYPE s2s_stage_latency_ms summary",
+            ]
+            for stage, hist in sorted(self.histograms.items()):
+                for q, value in hist.quantiles().items():
+                    lines.append(f's2s_stage_latency_ms{{stage="{stage}",quantile="{q}"}} {value:.3f}')
+                lines.append(f's2s_stage_latency_ms_sum{{stage="{stage}"}} {hist.sum:.3f}')
+                lines.append(f's2s_stage_latency_ms_count{{stage="{stage}"}} {hist.total}')
+            lines.append("# TYPE s2s_turns_total counter")
+            for status in ("turns", "interrupted", "abandoned"):
+                lines.append(f's2s_turns_total{{status="{status}"}} {self.counters[status]}')
+            return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serves prometheus_text() on http://host:port/ from a daemon thread."""
+        handler = type("MetricsHandler", (_MetricsHandler,), {"tracer": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        threading.Thread(target=self.server.serve_forever, name="Metrics", daemon=True).start()
+        logger.info(f"Serving latency metrics on http://{host}:{port}/")
+
+    def close(self):
+        with self.lock:
+            if self.prom_path:
+                self._write_prometheus()
+            if self.trace_file:
+                self.trace_file.close()
+                self.trace_file = None
+        if self.server:
+            self.server.shutdown()
+            self.server = None
+
+    def _observe(self, stage, ms):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = RollingHistogram(self.window_s, self.slices)
+        hist.observe(ms)
+
+    def _write_trace(self, record):
+        if not self.trace_path:
+            return
+        try:
+            if self.trace_file is None:
+                os.makedirs(os.path.dirname(self.trace_path) or ".", exist_ok=True)
+                self.trace_file = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+            self.trace_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except OSError as e:
+            self.counters["trace_errors"] += 1
+            logger.error(f"Could not write trace: {e}")
+
+    def _write_prometheus(self):
+        text = self.prometheus_text()
+        try:
+            os.makedirs(os.path.dirname(self.prom_path) or ".", exist_ok=True)
+            tmp = self.prom_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self.prom_path)
+        except OSError as e:
+            self.counters["trace_errors"] += 1
+            logger.error(f"Could not write metrics file: {e}")
@@ -0,0 +1,118 @@
+"""
+Local voice-activity detection and endpointing for the mic path.
+
+Every mic buffer is cut into short frames; RMS energy and spectral flatness are
+computed for all frames at once with NumPy. A frame is speech when it is above
+an adaptive noise floor and not spectrally flat (broadband noise is flat, voiced
+speech is not). EnergyVAD gates what is sent to STT: silence is dropped, the
+last `preroll_ms` before speech onset are replayed so word onsets aren't
+clipped, and `hangover_ms` of trailing audio is still forwarded so the STT
+service can endpoint. The end of each speech run is timestamped locally, which
+gives the PRD's VAD -> final transcript delay.
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+
+def frame_view(pcm, frame_samples):
+    """int16 PCM -> (n_frames, frame_samples) float32, dropping any partial frame."""
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    usable = len(samples) - len(samples) % frame_samples
+    return samples[:usable].reshape(-1, frame_samples).astype(np.float32)
+
+
+def frame_rms(pcm, frame_samples):
+    """RMS of each complete int16 frame in a PCM buffer (vectorized)."""
+    frames = frame_view(pcm, frame_samples)
+    if len(frames) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def spectral_flatness(frames, window):
+    """Geometric / arithmetic mean of each frame's power spectrum (0 = tonal, 1 = white noise)."""
+    power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-10
+    return np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+
+class EnergyVAD:
+    def __init__(self, sample_rate=16000, frame_ms=20, start_ms=60, hangover_ms=600, preroll_ms=300,
+                 min_level=250.0, noise_factor=3.0, max_flatness=0.45):
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.frame_bytes = self.frame_samples * 2
+        self.frame_s = frame_ms / 1000.0
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_level = min_level
+        self.noise_factor = noise_factor
+        self.max_flatness = max_flatness
+        self.window = np.hanning(self.frame_samples).astype(np.float32)
+        self.preroll = deque(maxlen=max(1, preroll_ms // frame_ms))
+
+        self.noise_floor = min_level / noise_factor
+        self.partial = b""        # leftover bytes shorter than a frame
+        self.in_speech = False
+        self.run = 0              # consecutive speech frames while silent / silent frames while in speech
+        self.speech_started_at = 0.0
+        self.speech_ended_at = 0.0  # local end-of-speech timestamp of the last completed utterance
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def process(self, pcm, now=None):
+        """Feed one mic buffer; returns the list of PCM frames to forward to STT."""
+        now = time.time() if now is None else now
+        self.bytes_in += len(pcm)
+        data = self.partial + bytes(pcm)
+        usable = len(data) - len(data) % self.frame_bytes
+        self.partial = data[usable:]
+        if usable == 0:
+            return []
+
+        frames = frame_view(data[:usable], self.frame_samples)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        flatness = spectral_flatness(frames, self.window)
+        threshold = max(self.min_level, self.noise_floor * self.noise_factor)
+        is_speech = (rms > threshold) & (flatness < self.max_flatness)
+
+        out = []
+        n = len(frames)
+        for i in range(n):
+            chunk = data[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            frame_end = now - (n - 1 - i) * self.frame_s
+            if rms[i] < self.noise_floor or flatness[i] >= self.max_flatness:
+                # Learn the floor only from noise-like frames; quiet voiced frames must not ratchet it up
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(rms[i])
+
+            if self.in_speech:
+                out.append(chunk)
+                if is_speech[i]:
+                    self.run = 0
+                else:
+                    self.run += 1
+                    if self.run >= self.hangover_frames:
+                        self.in_speech = False
+                        self.run = 0
+                        self.speech_ended_at = frame_end - self.hangover_frames * self.frame_s
+                continue
+
+            self.preroll.append(chunk)
+            self.run = self.run + 1 if is_speech[i] else 0
+            if self.run >= self.start_frames:
+                self.in_speech = True
+                self.run = 0
+                self.speech_started_at = frame_end - self.start_frames * self.frame_s
+                out.extend(self.preroll)
+                self.preroll.clear()
+
+        self.bytes_out += sum(len(c) for c in out)
+        return out
+
+    def stats(self):
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_sent": self.bytes_out,
+            "saved_ratio": 1 - self.bytes_out / self.bytes_in if self.bytes_in else 0.0,
+        }